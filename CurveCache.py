@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from MetricsCache import canonicalOutputName, fileFingerprint
+
+#----------------------------------------------------------------------
+
+# suffix of the files with persisted ROC curves (deliberately
+# not ending in .npz so that they are not picked up
+# as output files)
+sidecarSuffix = ".cached-roc"
+
+# suffix of the files with persisted bootstrap bands
+bootstrapSidecarSuffix = ".cached-bootstrap"
+
+# suffix of the files with persisted histograms of the outputs
+histogramSidecarSuffix = ".cached-histogram"
+
+#----------------------------------------------------------------------
+
+# names of the quantities stored for a (full) ROC curve
+curveFields = ('auc', 'numEvents', 'fpr', 'tpr', 'thresholds')
+
+#----------------------------------------------------------------------
+
+def sidecarFname(outputFname, suffix = sidecarSuffix):
+    # the name of the file with the persisted curve is
+    # derived from the uncompressed output file name
+    # so that it survives compressing the output file
+    return os.path.join(os.path.dirname(outputFname),
+                        canonicalOutputName(outputFname) + suffix)
+
+#----------------------------------------------------------------------
+
+class CurveCache:
+    """ bounded least-recently-used in-memory cache of full ROC curves with
+        optional persistence next to the output file """
+
+    #----------------------------------------
+
+    def __init__(self, maxSize = 8, persist = False, suffix = sidecarSuffix, fields = curveFields):
+        # @param maxSize is the maximum number of curves kept in memory
+        # @param persist if True, curves are also written to/read from
+        #        a file next to the output file
+        # @param suffix is appended to the output file name for the
+        #        persisted curves
+        # @param fields are the names of the quantities making up
+        #        one curve (e.g. for bootstrap bands instead of curves)
+
+        self.maxSize = maxSize
+        self.persist = persist
+        self.suffix = suffix
+        self.fields = fields
+
+        # maps from key to curve, least recently used first
+        self.curves = OrderedDict()
+
+    #----------------------------------------
+
+    def __getstate__(self):
+        # do not send the curves to other processes
+        state = self.__dict__.copy()
+        state['curves'] = OrderedDict()
+        return state
+
+    #----------------------------------------
+
+    def __readSidecar(self, outputFname, weightsVariant):
+        fname = sidecarFname(outputFname, self.suffix)
+
+        if not os.path.exists(fname):
+            return None
+
+        try:
+            data = np.load(fname)
+
+            if str(data['weightsVariant']) != weightsVariant:
+                return None
+
+            # check that the output file did not change
+            # since the curve was calculated (unless it has been
+            # deleted or compressed in the meantime)
+            if os.path.basename(outputFname) == str(data['sourceName']):
+                fingerprint = fileFingerprint(outputFname)
+                if fingerprint is not None and fingerprint != (int(data['sourceSize']), float(data['sourceMtime'])):
+                    return None
+
+            curve = []
+            for field in self.fields:
+                value = data[field]
+                if value.ndim == 0:
+                    # scalars such as the AUC
+                    value = value.item()
+                curve.append(value)
+
+            return tuple(curve)
+
+        except Exception:
+            # e.g. a partially written file
+            return None
+
+    #----------------------------------------
+
+    def __writeSidecar(self, outputFname, weightsVariant, curve):
+        fingerprint = fileFingerprint(outputFname)
+        if fingerprint is None:
+            # e.g. an entry of an epoch store (see EpochStore.py)
+            # which is not a file on its own
+            fingerprint = (-1, -1)
+
+        fname = sidecarFname(outputFname, self.suffix)
+
+        # write to a temporary file first so that concurrent
+        # readers never see a partially written file
+        tmpFname = fname + ".tmp%d" % os.getpid()
+
+        fout = open(tmpFname, "wb")
+        np.savez(fout,
+                 weightsVariant = weightsVariant,
+                 sourceName = os.path.basename(outputFname),
+                 sourceSize = fingerprint[0],
+                 sourceMtime = fingerprint[1],
+                 **dict(zip(self.fields, curve)))
+        fout.close()
+
+        os.rename(tmpFname, fname)
+
+    #----------------------------------------
+
+    def __insert(self, key, curve):
+        # (re)insert as most recently used
+        self.curves[key] = curve
+
+        while len(self.curves) > self.maxSize:
+            self.curves.popitem(last = False)
+
+    #----------------------------------------
+
+    def lookup(self, outputFname, isTrain, weightsVariant):
+        # @return the curve for the given output file if it is
+        # in memory or persisted, None otherwise
+
+        key = (canonicalOutputName(outputFname), isTrain, weightsVariant)
+
+        curve = self.curves.pop(key, None)
+
+        if curve is None and self.persist:
+            curve = self.__readSidecar(outputFname, weightsVariant)
+
+        if curve is not None:
+            self.__insert(key, curve)
+
+        return curve
+
+    #----------------------------------------
+
+    def get(self, outputFname, isTrain, weightsVariant, calculate):
+        # returns the curve for the given output file,
+        # calling calculate() if it is neither in memory
+        # nor persisted
+        #
+        # @param weightsVariant identifies the weights and any other
+        #   settings the curve depends on
+        #
+        # @return auc, numEvents, fpr, tpr, thresholds
+        #   (or the quantities given in the fields parameter
+        #   of the constructor)
+
+        curve = self.lookup(outputFname, isTrain, weightsVariant)
+
+        if curve is None:
+            curve = calculate()
+
+            if self.persist:
+                self.__writeSidecar(outputFname, weightsVariant, curve)
+
+            self.__insert((canonicalOutputName(outputFname), isTrain, weightsVariant), curve)
+
+        return curve
+
+#----------------------------------------------------------------------
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+import glob, json, os, re, time
+
+import numpy as np
+
+#----------------------------------------------------------------------
+
+# suffix of the names which refer to one epoch within a store
+# (e.g. roc-data-test-0012.npz.epochstore), used in place of the
+# name of the original output file
+entrySuffix = ".epochstore"
+
+#----------------------------------------------------------------------
+
+class EpochStore:
+    """ consolidated store of the network outputs of all epochs of one sample
+        (train or test) of a result directory.
+
+        The outputs are kept as an append only epochs x events matrix
+        (one row per epoch, float32 or float16) in one file
+        (roc-data-<sample>.epochs) with an index file
+        (roc-data-<sample>.epochs-index.json) mapping the epoch numbers
+        to rows. Reading a range of epochs is a sequential read
+        of consecutive rows instead of opening one file per epoch.
+    """
+
+    #----------------------------------------
+
+    def __init__(self, inputDir, sample):
+        self.inputDir = inputDir
+        self.sample = sample
+
+        self.dataFname  = os.path.join(inputDir, "roc-data-%s.epochs" % sample)
+        self.indexFname = os.path.join(inputDir, "roc-data-%s.epochs-index.json" % sample)
+
+        # memory mapped matrix (see getMatrix())
+        self.matrix = None
+
+        self.__readIndex()
+
+    #----------------------------------------
+
+    def __readIndex(self):
+        if os.path.exists(self.indexFname):
+            # modification time of the index when it was read (see openStore())
+            self.indexMtime = os.stat(self.indexFname).st_mtime
+
+            index = json.load(open(self.indexFname))
+            self.dtype = np.dtype(str(index['dtype']))
+            self.numEvents = index['numEvents']
+
+            # epoch number for each row (in the order of the rows)
+            self.rowEpochs = index['rowEpochs']
+
+            # time at which each row was appended (not present
+            # in stores written by earlier versions)
+            self.rowTimes = index.get('rowTimes', [ None ] * len(self.rowEpochs))
+        else:
+            self.indexMtime = None
+            self.dtype = None
+            self.numEvents = None
+            self.rowEpochs = []
+            self.rowTimes = []
+
+        # maps from epoch to row. If an epoch was appended
+        # more than once, the last row is used
+        self.epochToRow = dict((epoch, row) for row, epoch in enumerate(self.rowEpochs))
+
+    #----------------------------------------
+
+    def __writeIndex(self):
+        # write to a temporary file first so that readers
+        # never see a partially written index
+        tmpFname = self.indexFname + ".tmp%d" % os.getpid()
+
+        fout = open(tmpFname, "w")
+        json.dump(dict(dtype = self.dtype.str,
+                       numEvents = self.numEvents,
+                       rowEpochs = self.rowEpochs,
+                       rowTimes = self.rowTimes), fout)
+        fout.close()
+
+        os.rename(tmpFname, self.indexFname)
+
+        self.indexMtime = os.stat(self.indexFname).st_mtime
+
+    #----------------------------------------
+
+    def exists(self):
+        return os.path.exists(self.indexFname)
+
+    #----------------------------------------
+
+    def getEpochs(self):
+        return sorted(self.epochToRow.keys())
+
+    #----------------------------------------
+
+    def hasEpoch(self, epoch):
+        return epoch in self.epochToRow
+
+    #----------------------------------------
+
+    def append(self, epoch, outputs, dtype = 'float32'):
+        # adds the outputs of the given epoch
+        #
+        # @param dtype is only used when creating the store
+
+        outputs = np.asarray(outputs).ravel()
+
+        if self.numEvents is None:
+            self.dtype = np.dtype(dtype)
+            self.numEvents = len(outputs)
+
+        if len(outputs) != self.numEvents:
+            raise Exception("number of events (%d) for epoch %d differs from the one in %s (%d)" % (
+                    len(outputs), epoch, self.dataFname, self.numEvents))
+
+        rowBytes = self.numEvents * self.dtype.itemsize
+
+        fout = open(self.dataFname, "ab")
+
+        # a previous append may have been interrupted after
+        # writing (part of) the row but before updating the index
+        fout.truncate(len(self.rowEpochs) * rowBytes)
+
+        fout.write(outputs.astype(self.dtype).tobytes())
+        fout.close()
+
+        # only now the row becomes visible to readers
+        self.rowEpochs.append(epoch)
+        self.rowTimes.append(time.time())
+        self.epochToRow[epoch] = len(self.rowEpochs) - 1
+
+        self.__writeIndex()
+
+    #----------------------------------------
+
+    def getMatrix(self):
+        # @return a memory mapped (read only) matrix with one row per
+        # row in the store (see rowEpochs for the corresponding epochs)
+
+        # mapped again only when rows were appended
+        if self.matrix is None or len(self.matrix) != len(self.rowEpochs):
+            self.matrix = np.memmap(self.dataFname, dtype = self.dtype, mode = 'r',
+                                    shape = (len(self.rowEpochs), self.numEvents))
+
+        return self.matrix
+
+    #----------------------------------------
+
+    def getOutputs(self, epoch):
+        # @return the outputs for the given epoch
+        return self.getMatrix()[self.epochToRow[epoch]]
+
+    #----------------------------------------
+
+    def iterBlocks(self, epochs = None, maxBytes = 512 * 1024 * 1024):
+        # iterates over blocks of epochs, reading consecutive rows
+        # together
+        #
+        # @param epochs is the list of epochs to read (all if None)
+        # @param maxBytes maximum size of the rows of one block
+        #
+        # @return an iterator over (list of epochs, 2D array with
+        #   one row per epoch)
+
+        if epochs is None:
+            epochs = self.getEpochs()
+
+        # sort by row number to read sequentially
+        epochs = sorted(epochs, key = lambda epoch: self.epochToRow[epoch])
+
+        rowBytes = self.numEvents * self.dtype.itemsize
+        blockSize = max(1, maxBytes // rowBytes)
+
+        matrix = self.getMatrix()
+
+        for start in range(0, len(epochs), blockSize):
+            blockEpochs = epochs[start:start + blockSize]
+            rows = [ self.epochToRow[epoch] for epoch in blockEpochs ]
+
+            if rows == list(range(rows[0], rows[-1] + 1)):
+                # contiguous rows: no fancy indexing needed
+                yield blockEpochs, matrix[rows[0]:rows[-1] + 1]
+            else:
+                yield blockEpochs, matrix[rows]
+
+    #----------------------------------------
+
+    def getFingerprint(self, epoch):
+        # @return (end offset, append time) of the row of the given
+        # epoch. Changes when the epoch is appended again but not
+        # when other epochs are appended.
+        row = self.epochToRow[epoch]
+
+        return (row + 1) * self.numEvents * self.dtype.itemsize, self.rowTimes[row]
+
+    #----------------------------------------
+
+    def entryName(self, epoch):
+        # @return the name identifying the given epoch in this store
+        # (named after the original output file)
+        return os.path.join(self.inputDir, "roc-data-%s-%04d.npz%s" % (self.sample, epoch, entrySuffix))
+
+#----------------------------------------------------------------------
+
+def findStores(inputDir):
+    # @return a list of EpochStore objects found in the given directory
+
+    result = []
+
+    for indexFname in sorted(glob.glob(os.path.join(inputDir, "roc-data-*.epochs-index.json"))):
+        mo = re.match("roc-data-(\S+)\.epochs-index\.json$", os.path.basename(indexFname))
+        if mo:
+            result.append(EpochStore(inputDir, mo.group(1)))
+
+    return result
+
+#----------------------------------------------------------------------
+
+# open stores by (directory, sample), reread when the index changes
+_openStores = {}
+
+def isEntryName(fname):
+    return fname.endswith(entrySuffix)
+
+def parseEntryName(entryName):
+    # @return inputDir, sample, epoch for the given entry (see EpochStore.entryName)
+
+    mo = re.match("roc-data-(\S+)-(\d+)\.npz" + re.escape(entrySuffix) + "$", os.path.basename(entryName))
+    if not mo:
+        raise Exception("not an epoch store entry: " + entryName)
+
+    return os.path.dirname(entryName), mo.group(1), int(mo.group(2), 10)
+
+#----------------------------------------------------------------------
+
+def _getMtime(fname):
+    try:
+        return os.stat(fname).st_mtime
+    except OSError:
+        return None
+
+#----------------------------------------------------------------------
+
+def openStore(inputDir, sample, epochs = ()):
+    # @return the (possibly previously opened) store for the given
+    # directory and sample containing all the given epochs
+
+    key = (inputDir, sample)
+    store = _openStores.get(key, None)
+
+    if store is None or not all(store.hasEpoch(epoch) for epoch in epochs) or \
+            store.indexMtime != _getMtime(store.indexFname):
+        store = EpochStore(inputDir, sample)
+        _openStores[key] = store
+
+    return store
+
+#----------------------------------------------------------------------
+
+def loadEntry(entryName):
+    # @return the outputs for the given entry (see EpochStore.entryName)
+
+    inputDir, sample, epoch = parseEntryName(entryName)
+
+    return openStore(inputDir, sample, [ epoch ]).getOutputs(epoch)
+
+#----------------------------------------------------------------------
+
+def entryFingerprint(entryName):
+    # @return the fingerprint (see EpochStore.getFingerprint) of the given
+    # entry or None if the store does not contain the epoch (any more)
+
+    inputDir, sample, epoch = parseEntryName(entryName)
+
+    store = openStore(inputDir, sample)
+
+    if not store.hasEpoch(epoch):
+        return None
+
+    return store.getFingerprint(epoch)
+
+#----------------------------------------------------------------------
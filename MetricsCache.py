@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+import os, re, sqlite3, threading
+
+import EpochStore
+
+#----------------------------------------------------------------------
+
+def canonicalOutputName(fname):
+    # returns the name under which values calculated from the given
+    # output file are stored, i.e. the base name without
+    # compression suffix (so that values survive compressing
+    # the output file or moving it to an epoch store)
+    basename = os.path.basename(fname)
+
+    return re.sub("\.npz\.(bz2|xz|gz|epochstore)$", ".npz", basename)
+
+#----------------------------------------------------------------------
+
+def fileFingerprint(fname):
+    # @return (size, modification time) of the given file
+    # or None if it does not exist
+    #
+    # For entries of epoch stores, which have no file of their
+    # own, the position and append time of the row are used instead.
+    if EpochStore.isEntryName(fname):
+        return EpochStore.entryFingerprint(fname)
+
+    try:
+        stat = os.stat(fname)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime
+
+#----------------------------------------------------------------------
+
+class MetricsCache:
+    """ single per result directory store of values (such as the AUC) calculated
+        from the network output files. Replaces the one .cached-auc.py file
+        per output file """
+
+    #----------------------------------------
+
+    # name of the database file within the result directory
+    defaultFname = "metrics-cache.sqlite"
+
+    #----------------------------------------
+
+    def __init__(self, inputDir, fname = None):
+        self.inputDir = inputDir
+
+        if fname is None:
+            fname = self.defaultFname
+
+        self.fname = os.path.join(inputDir, fname)
+
+        # opened on first use (and not pickled when
+        # passed to other processes)
+        self.conn = None
+
+        # process and thread which opened the connection
+        self.connOwner = None
+
+    #----------------------------------------
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['conn'] = None
+        return state
+
+    #----------------------------------------
+
+    def exists(self):
+        return os.path.exists(self.fname)
+
+    #----------------------------------------
+
+    def __getConnection(self):
+        owner = (os.getpid(), threading.current_thread().ident)
+
+        if self.connOwner != owner:
+            # connections must neither be used across a fork
+            # (e.g. when this object was created in plotDaemon.py)
+            # nor from other threads (e.g. the warm up threads
+            # of plotDaemon.py)
+            self.conn = None
+
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.fname, timeout = 60)
+            self.connOwner = owner
+
+            with self.conn:
+                # the output file name and its fingerprint (size and
+                # modification time) at the time the value was
+                # calculated are kept to detect stale entries
+                self.conn.execute("""CREATE TABLE IF NOT EXISTS metrics (
+                                     outputName     TEXT NOT NULL,
+                                     sample         TEXT NOT NULL,
+                                     weightsVariant TEXT NOT NULL,
+                                     metric         TEXT NOT NULL,
+                                     value          REAL,
+                                     fname          TEXT NOT NULL,
+                                     size           INTEGER,
+                                     mtime          REAL,
+                                     PRIMARY KEY (outputName, sample, weightsVariant, metric)
+                                     )""")
+
+        return self.conn
+
+    #----------------------------------------
+
+    def __isValid(self, fname, size, mtime):
+        # an entry is stale if the output file it was calculated from
+        # still exists but has been modified. Entries for output
+        # files which have been deleted in the meantime are kept.
+
+        fingerprint = fileFingerprint(os.path.join(self.inputDir, fname))
+
+        if fingerprint is None:
+            return True
+
+        return fingerprint == (size, mtime)
+
+    #----------------------------------------
+
+    def getAll(self, sample, weightsVariant, metric):
+        # bulk read of all valid values for the given sample,
+        # weights variant and metric
+        #
+        # @return a dict mapping from the canonical output name
+        # to the value
+
+        if not self.exists():
+            return {}
+
+        retval = {}
+
+        staleEntries = []
+
+        for outputName, value, fname, size, mtime in self.__getConnection().execute(
+            "SELECT outputName, value, fname, size, mtime FROM metrics WHERE sample = ? AND weightsVariant = ? AND metric = ?",
+            (sample, weightsVariant, metric)):
+
+            if self.__isValid(fname, size, mtime):
+                retval[outputName] = value
+            else:
+                staleEntries.append((outputName, sample, weightsVariant, metric))
+
+        if staleEntries:
+            with self.__getConnection() as conn:
+                conn.executemany("DELETE FROM metrics WHERE outputName = ? AND sample = ? AND weightsVariant = ? AND metric = ?",
+                                 staleEntries)
+
+        return retval
+
+    #----------------------------------------
+
+    def get(self, outputFname, sample, weightsVariant, metric):
+        # @return the cached value or None if not found or stale
+
+        if not self.exists():
+            return None
+
+        row = self.__getConnection().execute(
+            "SELECT value, fname, size, mtime FROM metrics WHERE outputName = ? AND sample = ? AND weightsVariant = ? AND metric = ?",
+            (canonicalOutputName(outputFname), sample, weightsVariant, metric)).fetchone()
+
+        if row is None:
+            return None
+
+        value, fname, size, mtime = row
+
+        if not self.__isValid(fname, size, mtime):
+            return None
+
+        return value
+
+    #----------------------------------------
+
+    def putMany(self, entries):
+        # stores values in one single transaction
+        #
+        # @param entries is a list of tuples
+        #   (outputFname, sample, weightsVariant, metric, value)
+
+        rows = []
+
+        for outputFname, sample, weightsVariant, metric, value in entries:
+            fingerprint = fileFingerprint(outputFname)
+            if fingerprint is None:
+                fingerprint = (None, None)
+
+            rows.append((canonicalOutputName(outputFname), sample, weightsVariant, metric, value,
+                         os.path.basename(outputFname)) + fingerprint)
+
+        if not rows:
+            return
+
+        with self.__getConnection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    #----------------------------------------
+
+    def put(self, outputFname, sample, weightsVariant, metric, value):
+        self.putMany([ (outputFname, sample, weightsVariant, metric, value) ])
+
+#----------------------------------------------------------------------
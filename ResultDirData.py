@@ -1,8 +1,169 @@
 #!/usr/bin/env python
 
 import os
+from collections import OrderedDict
 import numpy as np
 from plotROCutils import readDescription
+from MetricsCache import fileFingerprint, canonicalOutputName
+from npzIO import findNpzFile, loadNpz
+
+#----------------------------------------------------------------------
+
+# arrays attached in this process, by file name
+_attachedArrays = {}
+
+def _attachSharedArray(spec):
+    # maps the given .npy file read only into memory
+    # (only once per process)
+    #
+    # @param spec is either the name of a .npy file or a tuple
+    #   (file name, dtype, shape, offset, order) of an array in
+    #   another file (e.g. an uncompressed .npz file)
+
+    if not spec in _attachedArrays:
+        if isinstance(spec, tuple):
+            fname, dtype, shape, offset, order = spec
+            _attachedArrays[spec] = np.memmap(fname, dtype = dtype, mode = 'r', offset = offset,
+                                              shape = shape, order = order)
+        else:
+            _attachedArrays[spec] = np.load(spec, mmap_mode = 'r')
+
+    return _attachedArrays[spec]
+
+#----------------------------------------------------------------------
+
+def _memmapSpec(array):
+    # @return the specification for _attachSharedArray(..) if
+    # array is a memory mapped file (as opposed to a view of it)
+    # or None otherwise
+
+    if not isinstance(array, np.memmap) or getattr(array, 'filename', None) is None:
+        return None
+
+    if array.flags['C_CONTIGUOUS']:
+        order = 'C'
+    elif array.flags['F_CONTIGUOUS']:
+        order = 'F'
+    else:
+        return None
+
+    if isinstance(array.base, np.ndarray):
+        # a view of a mapped array
+        return None
+
+    return (array.filename, array.dtype.str, array.shape, array.offset, order)
+
+#----------------------------------------------------------------------
+
+# arrays loaded so far by (key of the file (see _fileKey(..)), member name).
+# Result directories of trainings on the same samples
+# share the same weights and labels arrays.
+_loadedArrays = {}
+
+# files seen by _fileKey(..) so far by (file name, size, modification time)
+_loadedFiles = {}
+
+def _fileDigest(fname, blockSize = 8 * 1024 * 1024):
+    # @return a digest of the contents of the given file
+    import hashlib
+
+    digest = hashlib.sha1()
+
+    fin = open(fname, "rb")
+    while True:
+        block = fin.read(blockSize)
+        if not block:
+            break
+        digest.update(block)
+    fin.close()
+
+    return digest.hexdigest()
+
+#----------------------------------------------------------------------
+
+def _fileKey(fname):
+    # @return the key under which the arrays of the given file are
+    # kept in _loadedArrays. Files with the same name (without
+    # compression suffix), size and contents share the same key.
+    #
+    # The contents are only compared (hashed) for files whose
+    # name and size match the ones of a file seen before.
+
+    size, mtime = fileFingerprint(fname)
+    fingerprint = (os.path.abspath(fname), size, mtime)
+
+    if fingerprint in _loadedFiles:
+        return _loadedFiles[fingerprint]['key']
+
+    entry = dict(name = canonicalOutputName(fname), size = size, digest = None, key = fingerprint)
+
+    for otherFingerprint, other in _loadedFiles.items():
+        if other['name'] != entry['name'] or other['size'] != size:
+            continue
+
+        if other['digest'] is None:
+            if fileFingerprint(otherFingerprint[0]) != otherFingerprint[1:]:
+                # modified or removed in the meantime
+                continue
+
+            other['digest'] = _fileDigest(otherFingerprint[0])
+
+        if entry['digest'] is None:
+            entry['digest'] = _fileDigest(fname)
+
+        if other['digest'] == entry['digest']:
+            entry['key'] = other['key']
+            break
+
+    _loadedFiles[fingerprint] = entry
+
+    return entry['key']
+
+#----------------------------------------------------------------------
+
+def _loadArrays(fname, members, optionalMembers = ()):
+    # @return the list of arrays for the given members of the given
+    # file. Files with identical contents are only read once.
+    #
+    # @param optionalMembers are the members which may be missing
+    #   in the file (None is returned for these)
+
+    fileKey = _fileKey(fname)
+
+    data = None
+    retval = []
+
+    for member in members:
+        key = (fileKey, member)
+
+        if not key in _loadedArrays:
+            if data is None:
+                data = loadNpz(fname)
+
+            if member in optionalMembers and not data.hasMember(member):
+                _loadedArrays[key] = None
+            else:
+                _loadedArrays[key] = data[member]
+
+        retval.append(_loadedArrays[key])
+
+    return retval
+
+#----------------------------------------------------------------------
+
+# shared array files (see ResultDirData.shareArrays) by id of the
+# array they were created from (the array itself is kept
+# as well so that its id is not reused)
+_sharedArraySpecs = {}
+
+#----------------------------------------------------------------------
+
+def _defaultScratchDir():
+    # prefer a memory backed file system if available
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    else:
+        return None
 
 #----------------------------------------------------------------------
 
@@ -19,54 +180,164 @@ class ResultDirData:
         # self.trainWeightsBeforePtEtaReweighting = None
 
         # check for dedicated weights and labels file
+        # (uncompressed or compressed)
+        #
+        # the arrays are only read when first accessed (see __getattr__)
+        # so that nothing is read when all values are
+        # taken from the caches.
+        #
+        # list of (file name, members, attribute names, attribute name for the targets)
+        self.arraySources = []
+        self.arraysLoaded = False
+
+        # keys (see _fileKey(..)) of the files the arrays were read from
+        self.fileKeys = set()
+
+        # (absolute file names such that the arrays can also be read after
+        # changing the working directory, e.g. in plotDaemon.py)
+        absInputDir = os.path.abspath(inputDir)
+
         # train dataset
-        fname = os.path.join(inputDir, "weights-labels-train.npz")
+        fname = findNpzFile(os.path.join(absInputDir, "weights-labels-train.npz"))
 
-        if os.path.exists(fname):
-            data = np.load(fname)
-            self.origTrainWeights = data['origTrainWeights']
+        if fname is not None:
+            self.trainWeightsFname = fname
+            self.arraySources.append((fname, [ 'origTrainWeights', 'label' ], [ 'origTrainWeights', 'trainLabels' ],
+                                      'trainTargets'))
             # self.trainWeightsBeforePtEtaReweighting = data['weightBeforePtEtaReweighting']
-            self.trainLabels = data['label']
         else:
-            fname = os.path.join(inputDir, "weights-labels-train.npz.bz2")
-            if os.path.exists(fname):
-                import bz2
-                data = np.load(bz2.BZ2File(fname))
-                self.origTrainWeights = data['origTrainWeights']
-                # self.trainWeightsBeforePtEtaReweighting = data['weightBeforePtEtaReweighting']
-                self.trainLabels = data['label']
-            else:
-                # try the BDT file (but we don't have weights before eta/pt reweighting there)
-                fname = os.path.join(inputDir, "roc-data-%s-mva.npz" % "train")
-                data = np.load(fname)
-                self.trainWeights = data['weight']
-                self.trainLabels = data['label']
-                self.trainWeightsBeforePtEtaReweighting = None
+            # try the BDT file (but we don't have weights before eta/pt reweighting there)
+            fname = findNpzFile(os.path.join(absInputDir, "roc-data-%s-mva.npz" % "train"))
+            self.trainWeightsFname = fname
+            self.arraySources.append((fname, [ 'weight', 'label' ], [ 'trainWeights', 'trainLabels' ], 'trainTargets'))
+            self.trainWeightsBeforePtEtaReweighting = None
             
         #----------
         # test dataset
         #----------
 
-        fname = os.path.join(inputDir, "weights-labels-test.npz")
-        if os.path.exists(fname):
-            data = np.load(fname)
-            self.testWeights = data['weight']
-            self.testLabels = data['label']
-
+        fname = findNpzFile(os.path.join(absInputDir, "weights-labels-test.npz"))
+        if fname is not None:
+            self.testWeightsFname = fname
         else:
-            fname = os.path.join(inputDir, "weights-labels-test.npz.bz2")
+            # try the BDT file
+            fname = findNpzFile(os.path.join(absInputDir, "roc-data-%s-mva.npz" % "test"))
+            self.testWeightsFname = fname
 
-            if os.path.exists(fname):
-                import bz2
-                data = np.load(bz2.BZ2File(fname))
-                self.testWeights = data['weight']
-                self.testLabels = data['label']
-            else:
-                # try the BDT file
-                fname = os.path.join(inputDir, "roc-data-%s-mva.npz" % "test")
-                data = np.load(fname)
-                self.testWeights = data['weight']
-                self.testLabels = data['label']
+        self.arraySources.append((fname, [ 'weight', 'label' ], [ 'testWeights', 'testLabels' ], 'testTargets'))
+
+    #----------------------------------------
+
+    def __loadArrays(self):
+        for fname, members, attrs, targetsAttr in self.arraySources:
+            self.fileKeys.add(_fileKey(fname))
+
+            # the targets are read together with the other arrays
+            # (from the same, possibly decompressed, file)
+            values = _loadArrays(fname, members + [ 'target' ], optionalMembers = [ 'target' ])
+
+            for attr, value in zip(attrs, values):
+                setattr(self, attr, value)
+
+            targets = values[-1]
+            if targets is None:
+                # not a regression training
+                targets = values[members.index('label')]
+
+            setattr(self, targetsAttr, targets)
+
+        # only set when all arrays are there (plotDaemon.py may
+        # fork while the arrays are being loaded in another thread)
+        self.arraysLoaded = True
+
+    #----------------------------------------
+
+    def __getattr__(self, name):
+        # only called for attributes which are not set (yet)
+        if name in ResultDirData.arrayAttributes and not self.__dict__.get('arraysLoaded', True):
+            self.__loadArrays()
+            return getattr(self, name)
+
+        raise AttributeError(name)
+
+    #----------------------------------------
+
+    # names of the attributes holding per event arrays
+    arrayAttributes = ('origTrainWeights', 'trainWeights', 'trainLabels',
+                       'testWeights', 'testLabels',
+                       'trainTargets', 'testTargets')
+
+    #----------------------------------------
+
+    def shareArrays(self, scratchDir = None):
+        # moves the weights and labels arrays to memory mapped
+        # files in a scratch directory. When this object is then sent
+        # to another process (e.g. multiprocessing workers), only the
+        # file names are pickled and the receiving process maps the
+        # same files instead of receiving a private copy.
+        #
+        # the files are removed when this process exits.
+
+        if hasattr(self, 'sharedArrayFnames'):
+            # already shared
+            return
+
+        import tempfile, atexit, shutil
+
+        if scratchDir is None:
+            scratchDir = _defaultScratchDir()
+
+        self.sharedArrayDir = tempfile.mkdtemp(prefix = "ResultDirData-", dir = scratchDir)
+        atexit.register(shutil.rmtree, self.sharedArrayDir, True)
+
+        # maps from attribute name to file name
+        self.sharedArrayFnames = {}
+
+        for attr in self.arrayAttributes:
+            value = getattr(self, attr, None)
+
+            if not isinstance(value, np.ndarray) or value.dtype == object:
+                continue
+
+            spec = _memmapSpec(value)
+
+            if spec is None and id(value) in _sharedArraySpecs:
+                # shared already by another directory using the same samples
+                spec = _sharedArraySpecs[id(value)][1]
+
+            if spec is None:
+                spec = os.path.join(self.sharedArrayDir, attr + ".npy")
+                np.save(spec, value)
+                _sharedArraySpecs[id(value)] = (value, spec)
+
+            # otherwise this is already mapped from the
+            # weights file, other processes can map the same part
+            # of the file
+
+            self.sharedArrayFnames[attr] = spec
+
+            # also use the mapped version in this process
+            # (releasing the private copy)
+            setattr(self, attr, _attachSharedArray(spec))
+
+    #----------------------------------------
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        # only send the names of shared arrays
+        for attr in getattr(self, 'sharedArrayFnames', {}):
+            del state[attr]
+
+        return state
+
+    #----------------------------------------
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        for attr, fname in getattr(self, 'sharedArrayFnames', {}).items():
+            setattr(self, attr, _attachSharedArray(fname))
 
     #----------------------------------------
 
@@ -96,6 +367,29 @@ class ResultDirData:
 
     #----------------------------------------
 
+    def getWeightsVariant(self, isTrain):
+        # returns a string identifying the weights returned by getWeights(..),
+        # including the modification time of the file they were
+        # read from. Used as key for cached values so that these
+        # are recalculated when the weights change.
+        #
+        # The file name is taken without compression suffix and the
+        # modification time in seconds (both are kept when the file is
+        # compressed by npzIO.compressFile or the command line tools,
+        # the size is not) such that compressing the weights file does
+        # not invalidate the cached values.
+
+        if isTrain:
+            varName = 'origTrainWeights'
+            fname = self.trainWeightsFname
+        else:
+            varName = 'weight'
+            fname = self.testWeightsFname
+
+        return "%s@%s:%d" % (varName, canonicalOutputName(fname), int(os.stat(fname).st_mtime))
+
+    #----------------------------------------
+
     def getLabels(self, isTrain):
         if isTrain:
             return self.trainLabels
@@ -103,8 +397,109 @@ class ResultDirData:
             return self.testLabels
 
     #----------------------------------------
+
+    def getTargets(self, isTrain):
+        # returns the values the outputs are compared to for the
+        # per event metrics such as the RMSE (see rocUtils.pointwiseMetrics):
+        # the 'target' member of the weights and labels file if
+        # present (regression trainings), the labels otherwise
+
+        if isTrain:
+            return self.trainTargets
+        else:
+            return self.testTargets
+
+    #----------------------------------------
             
     def hasTrainWeightsBeforePtEtaReweighting(self):
         return self.trainWeightsBeforePtEtaReweighting.shape != ()
 
 #----------------------------------------------------------------------
+
+# recently used ResultDirData objects by (absolute directory,
+# directory as given, useWeightsAfterPtEtaReweighting), least recently
+# used first. Used by long lived processes (see plotDaemon.py)
+# to avoid reloading the weights and labels.
+_instances = OrderedDict()
+
+# maximum number of objects kept in _instances
+maxInstances = 8
+
+#----------------------------------------------------------------------
+
+def _dataFingerprint(inputDir):
+    # @return the names and (size, modification time) of the
+    # files a ResultDirData object for the given directory
+    # would be built from
+
+    result = []
+
+    for sample in ('train', 'test'):
+        for fname in ("weights-labels-%s.npz" % sample, "roc-data-%s-mva.npz" % sample):
+            fname = findNpzFile(os.path.join(inputDir, fname))
+            if fname is not None:
+                result.append((fname, fileFingerprint(fname)))
+
+    fname = os.path.join(inputDir, "samples.txt")
+    result.append((fname, fileFingerprint(fname)))
+
+    return result
+
+#----------------------------------------------------------------------
+
+def getResultDirData(inputDir, useWeightsAfterPtEtaReweighting):
+    # returns a (possibly previously created) ResultDirData
+    # object for the given directory. Objects are recreated when
+    # the weights, labels or description files have changed.
+
+    key = (os.path.abspath(inputDir), inputDir, useWeightsAfterPtEtaReweighting)
+
+    fingerprint = _dataFingerprint(inputDir)
+
+    entry = _instances.pop(key, None)
+
+    # objects which are no longer kept
+    dropped = []
+
+    if entry is None or entry[0] != fingerprint:
+        if entry is not None:
+            dropped.append(entry[1])
+
+        entry = (fingerprint, ResultDirData(inputDir, useWeightsAfterPtEtaReweighting))
+
+    # (re)insert as most recently used
+    _instances[key] = entry
+
+    while len(_instances) > maxInstances:
+        dropped.append(_instances.popitem(last = False)[1][1])
+
+    for resultDirData in dropped:
+        _releaseArrays(resultDirData)
+
+    return entry[1]
+
+#----------------------------------------------------------------------
+
+def _releaseArrays(resultDirData):
+    # removes the arrays read for the given object from _loadedArrays
+    # unless they are also used by one of the objects in _instances
+    # (such that the memory used by long lived processes is
+    # limited by maxInstances)
+
+    usedKeys = set()
+    for fingerprint, other in _instances.values():
+        usedKeys.update(other.fileKeys)
+
+    releasedKeys = resultDirData.fileKeys - usedKeys
+
+    if not releasedKeys:
+        return
+
+    for key in [ key for key in _loadedArrays.keys() if key[0] in releasedKeys ]:
+        del _loadedArrays[key]
+
+    for fingerprint in [ fingerprint for fingerprint, fileEntry in _loadedFiles.items()
+                         if fileEntry['key'] in releasedKeys ]:
+        del _loadedFiles[fingerprint]
+
+#----------------------------------------------------------------------
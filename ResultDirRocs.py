@@ -3,6 +3,16 @@
 #----------------------------------------------------------------------
 
 import glob, os, re, sys
+from collections import OrderedDict
+
+import numpy as np
+
+from MetricsCache import MetricsCache, canonicalOutputName
+from CurveCache import CurveCache, bootstrapSidecarSuffix, histogramSidecarSuffix
+from rocUtils import sortedCumulativeSums, compactROCcurve, benchmarkEfficiencies, weightedMetrics, batchedMetrics, batchedAUCbytesPerEvent, bootstrapROC, isPointwiseMetric, outputHistograms
+from executors import autoNumWorkers, getExecutor
+from npzIO import compressedSuffixes, loadNpz
+import EpochStore
 
 #----------------------------------------------------------------------
 
@@ -12,44 +22,240 @@ def _readROCfilesLambda(fname, isTrain):
 
 #----------------------------------------------------------------------
 
-class Func:
-    # function wrapper used with the multiprocessing module
-    def __init__(self, func):
-        self.func = func
+def _callFunction(func, args):
+    # used to run different functions on the same executor
+    return func(*args)
+
+#----------------------------------------------------------------------
+
+class _TaskFailure:
+    # returned by _tryCallFunction instead of the result
+    # of a task which raised an exception
+    def __init__(self, message):
+        self.message = message
+
+#----------------------------------------------------------------------
+
+def _tryCallFunction(func, args):
+    # like _callFunction but does not raise such that the tasks
+    # of the other directories on the same executor continue
+    try:
+        return func(*args)
+    except Exception, ex:
+        return _TaskFailure(str(ex))
+
+#----------------------------------------------------------------------
+
+def _getCallFunction(errors):
+    # @return the function to run the tasks with (see the errors
+    # parameter of readROCfilesMulti)
+    if errors is None:
+        return _callFunction
+    else:
+        return _tryCallFunction
 
-    def __call__(self, args):
-        return self.func(*args)
+#----------------------------------------------------------------------
+
+class ReadROCbatchHelper:
+    def __init__(self, resultDirRocs, metricNames):
+        self.resultDirRocs = resultDirRocs
+        self.metricNames = metricNames
+
+    def __call__(self, fnames, isTrain):
+        return self.resultDirRocs.computeMetricsBatched(fnames, isTrain, self.metricNames)
+
+#----------------------------------------------------------------------
 
 class ReadROChelper:
-    def __init__(self, resultDirRocs):
+    def __init__(self, resultDirRocs, metricNames = None):
+        # @param metricNames are the metrics to calculate in addition
+        #   to the default metrics of resultDirRocs (see getDefaultMetricNames())
+
         self.resultDirRocs = resultDirRocs
+
+        self.metricNames = resultDirRocs.getDefaultMetricNames()
+        for metricName in metricNames or []:
+            if not metricName in self.metricNames:
+                self.metricNames.append(metricName)
+
+        # determine the BDT working points once in this process
+        # (they are sent along with resultDirRocs to the workers)
+        resultDirRocs.prepareBenchmarkWorkingPoints()
+
+        if any(isPointwiseMetric(metricName) for metricName in self.metricNames):
+            # same for the targets
+            for isTrain in (True, False):
+                resultDirRocs.resultDirData.getTargets(isTrain)
         
-    def __call__(self, *args):
-        return self.resultDirRocs.readROC(*args)
+    def __call__(self, fname, isTrain):
+        # the values are written to the cache
+        # by the calling process in one go
+        #
+        # @return a dict mapping from metric name to value
+
+        if fname.endswith(".cached-auc.py"):
+            return dict(auc = self.resultDirRocs.readROC(fname, isTrain, updateCache = False))
+
+        return self.resultDirRocs.readMetrics(fname, isTrain, self.metricNames, updateCache = False)
+
+#----------------------------------------------------------------------
+
+class FullROCcurveHelper:
+    def __init__(self, resultDirRocs):
+        self.resultDirRocs = resultDirRocs
+
+    def __call__(self, epoch, isTrain):
+        return self.resultDirRocs.calculateFullROCcurve(epoch, isTrain)
+
+#----------------------------------------------------------------------
+
+class OutputHistogramHelper:
+    def __init__(self, resultDirRocs, numBins, outputRange):
+        self.resultDirRocs = resultDirRocs
+        self.numBins = numBins
+        self.outputRange = outputRange
+
+    def __call__(self, epoch, isTrain):
+        return self.resultDirRocs.calculateOutputHistogram(epoch, isTrain, self.numBins, self.outputRange)
+
+#----------------------------------------------------------------------
+
+class BootstrapHelper:
+    def __init__(self, resultDirRocs, numReplicas):
+        self.resultDirRocs = resultDirRocs
+        self.numReplicas = numReplicas
+
+    def __call__(self, fname, isTrain):
+        return self.resultDirRocs.readBootstrapAUCstd(fname, isTrain, self.numReplicas, updateCache = False)
+
+#----------------------------------------------------------------------
+
+# false positive rates at which the bootstrap bands are evaluated
+# (finer at low false positive rates for the zoomed plots)
+bootstrapFprGrid = np.unique(np.r_[np.linspace(0, 1, 201), np.linspace(0, 0.05, 101)])
+
+# fixed seed such that the bootstrap replicas are reproducible
+# (and the same for all epochs)
+bootstrapSeed = 1
+
+def bootstrapMetricName(numReplicas):
+    # name of the AUC uncertainty in the metrics cache
+    return "aucBootstrapStd:%d" % numReplicas
+
+#----------------------------------------------------------------------
+
+# metrics calculated (and cached) together with the AUC
+# (see rocUtils.parseMetricName)
+defaultWorkingPointMetrics = ( 'tprAtFpr:0.01', 'tprAtFpr:0.05', 'pAUC:0.05' )
+
+# metrics calculated (and cached) for the outputs of regression trainings
+defaultRegressionMetrics = ( 'rmse', 'mae' )
 
 #----------------------------------------------------------------------
 
 class ResultDirRocs:
-    """ caches ROC values from a result directory """
+    """ caches ROC values (or other metrics, e.g. the RMSE for
+        regression trainings) from a result directory """
     #----------------------------------------
 
     def __init__(self, resultDirData, minEpoch = None, maxEpoch = None, 
                  excludedEpochs = None,
-                 maxNumThreads = 8):
+                 maxNumThreads = 8,
+                 executorBackend = 'process',
+                 batchMemoryBudget = 1024**3,
+                 curveCacheSize = 8,
+                 persistCurves = False,
+                 compactCurves = True,
+                 benchmarkThresholds = None,
+                 workingPointMetrics = defaultWorkingPointMetrics,
+                 regression = False):
+        # @param regression if True, the outputs are read from the
+        #   rmse-data-* files (instead of roc-data-*) and
+        #   compared to the targets (see ResultDirData.getTargets)
+
         # to keep weights
         self.resultDirData = resultDirData
+
+        self.regression = regression
+
+        # beginning of the names of the output files
+        if regression:
+            self.outputPrefix = "rmse-data"
+        else:
+            self.outputPrefix = "roc-data"
         self.minEpoch = minEpoch
         self.maxEpoch = maxEpoch
         self.excludedEpochs = excludedEpochs
 
+        # maximum number of workers (None for running
+        # everything in the current thread) and type of workers
+        # (see executors.backends)
         self.maxNumThreads = maxNumThreads
+        self.executorBackend = executorBackend
+
+        # total memory (in bytes) for evaluating the AUCs of
+        # blocks of epochs together (None to evaluate each file
+        # separately)
+        self.batchMemoryBudget = batchMemoryBudget
+
+        self.metricsCache = MetricsCache(resultDirData.inputDir)
+
+        # metrics (besides the AUC) calculated from the same
+        # sorted outputs when scanning the epochs
+        self.workingPointMetrics = workingPointMetrics
+
+        # maps from (cut, isTrain) to (fpr, tpr) of the BDT
+        # for the benchmark thresholds
+        self.bdtWorkingPoints = {}
+
+        # full ROC curves calculated so far
+        self.curveCache = CurveCache(maxSize = curveCacheSize, persist = persistCurves)
+
+        # bootstrap bands calculated so far (always persisted
+        # as they are expensive to calculate)
+        self.bootstrapCache = CurveCache(maxSize = curveCacheSize, persist = True,
+                                         suffix = bootstrapSidecarSuffix,
+                                         fields = ('aucStd', 'fpr', 'tprLow', 'tprMedian', 'tprHigh'))
+
+        # histograms of the outputs for signal and background
+        # (always persisted so that the evolution over all epochs
+        # can be plotted without reading the output files again)
+        self.histogramCache = CurveCache(maxSize = curveCacheSize, persist = True,
+                                         suffix = histogramSidecarSuffix,
+                                         fields = ('edges', 'sigCounts', 'bkgCounts'))
+
+        # if True, full ROC curves are reduced to a subset of points
+        # (see rocUtils.compactROCcurve) keeping the points around
+        # the given cut values for benchmarks
+        self.compactCurves = compactCurves
+        self.benchmarkThresholds = benchmarkThresholds
 
         # read only the file names
+        self.refresh()
+
+    #----------------------------------------
+
+    def refresh(self):
+        # (re)reads the names of the output files, e.g. when
+        # this object is reused after more epochs have been written
         self.mvaROCfnames, self.rocFnames = self.readROCfiles()
 
+        # results of getAllMetrics(..) by metric
+        self.allMetricValues = {}
+
     #----------------------------------------
 
-    def readROCfiles(self, transformation = None, includeCached = False):
+    def getDefaultMetricNames(self):
+        # @return the list of metrics which are calculated (and
+        # cached) whenever an output file is read
+        if self.regression:
+            return list(defaultRegressionMetrics)
+
+        return [ 'auc' ] + list(self.workingPointMetrics) + self.getBenchmarkMetricNames()
+
+    #----------------------------------------
+
+    def readROCfiles(self, transformation = None, includeCached = False, metric = 'auc'):
         # returns mvaROC, rocValues
         # which are dicts of 'test'/'train' to the single value
         # (for MVAid) or a dict epoch -> values (rocValues)
@@ -58,24 +264,68 @@ class ResultDirRocs:
         # which is run on each file
         # found and stored in the return values. If None,
         # just the name is stored.
+        #
+        # metric is the name of the value produced by the
+        # transformation in the metrics cache (only used
+        # if includeCached is True). Transformations may also
+        # return a dict of metric name to value in which case
+        # the value for metric is returned and all values
+        # are cached.
 
-        if transformation == None:
-            transformation = _readROCfilesLambda
+        return readROCfilesMulti([ (self, transformation) ], includeCached = includeCached, metric = metric)[0]
+
+    #----------------------------------------
+
+    def _collectTasks(self, transformation, includeCached, metric):
+        # first part of readROCfiles(..): finds the output files
+        # and takes the values from the metrics cache
+        #
+        # @return mvaROC, rocValues, tasks where tasks is the list of
+        # files on which the transformation must still be run
 
         inputDir = self.resultDirData.inputDir
 
         #----------
-        inputFiles = []
+        # values from the metrics cache. These are
+        # used directly (i.e. the transformation is not applied)
+        # and take priority over all other files
+        #----------
+
+        # list of (output file name, value)
+        cachedValues = []
+
+        # canonical names of output files for which a cached value exists
+        cachedNames = set()
 
         if includeCached:
-            # read cached version first
-            inputFiles += glob.glob(os.path.join(inputDir, "roc-data-*.npz.cached-auc.py")) 
+            for sampleType in ('train', 'test'):
+                isTrain = sampleType == 'train'
 
-        inputFiles += glob.glob(os.path.join(inputDir, "roc-data-*.npz.bz2")) 
-        inputFiles += glob.glob(os.path.join(inputDir, "roc-data-*.npz")) 
+                for outputName, value in self.metricsCache.getAll(sampleType, self.resultDirData.getWeightsVariant(isTrain), metric).items():
+                    cachedValues.append((os.path.join(inputDir, outputName), value))
+                    cachedNames.add(outputName)
+
+        #----------
+        inputFiles = []
 
-        if not inputFiles:
-            print >> sys.stderr,"no files roc-data-* found, exiting"
+        if includeCached and metric == 'auc':
+            # legacy per file caches. These are imported
+            # into the metrics cache once read
+            inputFiles += [ fname for fname in glob.glob(os.path.join(inputDir, self.outputPrefix + "-*.npz.cached-auc.py"))
+                            if not canonicalOutputName(fname[:-len(".cached-auc.py")]) in cachedNames ]
+
+        for suffix in compressedSuffixes:
+            inputFiles += glob.glob(os.path.join(inputDir, self.outputPrefix + "-*.npz" + suffix)) 
+        inputFiles += glob.glob(os.path.join(inputDir, self.outputPrefix + "-*.npz")) 
+
+        # epochs in consolidated stores (after the individual files
+        # which take priority)
+        if not self.regression:
+            for store in EpochStore.findStores(inputDir):
+                inputFiles += [ store.entryName(epoch) for epoch in store.getEpochs() ]
+
+        if not inputFiles and not cachedValues:
+            print >> sys.stderr,"no files %s-* found, exiting" % self.outputPrefix
             sys.exit(1)
 
         # ROCs values and epoch numbers for training and test
@@ -93,32 +343,52 @@ class ResultDirRocs:
         # the full file even though the cached file is present
         scheduledTasks = dict(train = set(), test = set())
 
-        for inputFname in inputFiles:
+        for inputFname, cachedValue in cachedValues + [ (fname, None) for fname in inputFiles ]:
 
             basename = os.path.basename(inputFname)
 
+            if cachedValue is None and includeCached and canonicalOutputName(basename) in cachedNames:
+                # value already taken from the metrics cache
+                continue
+
             # example names:
             #  roc-data-test-mva.npz
             #  roc-data-train-0002.npz
+            #  rmse-data-train-0002.npz
+
+            mo = re.match(self.outputPrefix + "-(\S+)-mva\.npz(\.bz2|\.xz|\.gz)?$", basename)
 
-            mo = re.match("roc-data-(\S+)-mva\.npz(\.bz2)?$", basename)
+            if not mo and includeCached:
+                mo = re.match(self.outputPrefix + "-(\S+)-mva\.npz\.cached-auc\.py$", basename)
 
             if mo:
                 sampleType = mo.group(1)
 
                 assert mvaROC.has_key(sampleType)
-                assert mvaROC[sampleType] == None
 
                 isTrain = sampleType == 'train'
 
-                mvaROC[sampleType] = transformation(inputFname, isTrain)
+                if cachedValue is not None:
+                    mvaROC[sampleType] = cachedValue
+                    continue
+
+                if 'mva' in scheduledTasks[sampleType]:
+                    # e.g. legacy cached and original file
+                    continue
+
+                tasks.append(dict(
+                        sampleType = sampleType,
+                        epoch = 'mva',
+                        args = (inputFname, isTrain),
+                        ))
+                scheduledTasks[sampleType].add('mva')
 
                 continue
 
-            mo = re.match("roc-data-(\S+)-(\d+)\.npz(\.bz2)?$", basename)
+            mo = re.match(self.outputPrefix + "-(\S+)-(\d+)\.npz(\.bz2|\.xz|\.gz|\.epochstore)?$", basename)
 
             if not mo and includeCached:
-                mo = re.match("roc-data-(\S+)-(\d+)\.npz\.cached-auc\.py$", basename)
+                mo = re.match(self.outputPrefix + "-(\S+)-(\d+)\.npz\.cached-auc\.py$", basename)
 
             if mo:
                 sampleType = mo.group(1)
@@ -137,6 +407,10 @@ class ResultDirRocs:
                             # already scheduled, no need to schedule twice
                             continue
 
+                    if cachedValue is not None:
+                        rocValues[sampleType][epoch] = cachedValue
+                        continue
+
                     tasks.append(dict(
                             sampleType = sampleType,
                             epoch = epoch,
@@ -148,27 +422,171 @@ class ResultDirRocs:
 
             print >> sys.stderr,"WARNING: unmatched filename",inputFname
 
-        # calculate the AUC values
-        from multiprocessing import Process, Pool
+        return mvaROC, rocValues, tasks
 
-        if self.maxNumThreads != None:
-            # multiprocessing enabled
-            procPool = Pool(processes = self.maxNumThreads)
-
-            results = procPool.map(Func(transformation), [ task['args'] for task in tasks ])
+    #----------------------------------------
 
-            # wait for processes to complete
-            procPool.close()
-            procPool.join()
+    def _makeTaskGroups(self, transformation, tasks, numWorkers):
+        # @return taskGroups, groupArgs where taskGroups is a list of
+        # lists of task indices and groupArgs the corresponding
+        # arguments for _callFunction
 
+        if isinstance(transformation, ReadROChelper) and self.batchMemoryBudget is not None:
+            # evaluate the AUCs of several epochs of the same sample together
+            taskGroups = self.__groupTasks(tasks, numWorkers)
         else:
-            # run in the current thread only
-            results = [ Func(transformation)(task['args']) for task in tasks ]
+            taskGroups = [ [ index ] for index in range(len(tasks)) ]
+
+        groupArgs = []
+        for group in taskGroups:
+            if len(group) == 1:
+                groupArgs.append((transformation, tasks[group[0]]['args']))
+            else:
+                groupArgs.append((ReadROCbatchHelper(self, transformation.metricNames),
+                                  ([ tasks[index]['args'][0] for index in group ], tasks[group[0]]['args'][1])))
+
+        return taskGroups, groupArgs
+
+    #----------------------------------------
+
+    def _storeResults(self, tasks, results, mvaROC, rocValues, includeCached, metric):
+        # last part of readROCfiles(..): fills the results of the
+        # tasks into mvaROC and rocValues and updates the cache
 
         for task, res in zip(tasks, results):
-            rocValues[task['sampleType']][task['epoch']] = res
+            if isinstance(res, dict):
+                # e.g. benchmark metrics are not available
+                # for samples without BDT
+                res = res.get(metric, None)
+
+            if task['epoch'] == 'mva':
+                mvaROC[task['sampleType']] = res
+            else:
+                rocValues[task['sampleType']][task['epoch']] = res
 
-        return mvaROC, rocValues
+        if includeCached:
+            # store the newly calculated values in one go
+            self.__updateCache([ (task['args'][0], task['args'][1], res) for task, res in zip(tasks, results) ], metric)
+
+    #----------------------------------------
+
+    def __groupTasks(self, tasks, numWorkers):
+        # groups the tasks for epochs of the same sample into
+        # blocks such that each block's outputs and temporary arrays
+        # fit into the memory budget per worker
+        #
+        # @return a list of lists of task indices
+
+        groups = []
+
+        # maps from sample type to list of task indices
+        batchable = dict(train = [], test = [])
+
+        for index, task in enumerate(tasks):
+            if task['epoch'] == 'mva' or task['args'][0].endswith(".cached-auc.py"):
+                groups.append([ index ])
+            else:
+                batchable[task['sampleType']].append(index)
+
+        for sampleType, indices in batchable.items():
+            if not indices:
+                continue
+
+            numEvents = len(self.resultDirData.getLabels(sampleType == 'train'))
+
+            rowsPerBlock = int(self.batchMemoryBudget / numWorkers / (numEvents * batchedAUCbytesPerEvent))
+
+            # keep all workers busy
+            rowsPerBlock = min(rowsPerBlock, (len(indices) + numWorkers - 1) // numWorkers)
+            rowsPerBlock = max(1, rowsPerBlock)
+
+            # consecutive epochs (e.g. neighbouring rows in an epoch store)
+            indices = sorted(indices, key = lambda index: tasks[index]['epoch'])
+
+            for start in range(0, len(indices), rowsPerBlock):
+                groups.append(indices[start:start + rowsPerBlock])
+
+        return groups
+
+    #----------------------------------------
+
+    def computeMetricsBatched(self, fnames, isTrain, metricNames):
+        # calculates the given metrics for the output files of several
+        # epochs of the same sample in one vectorized pass
+        # (see rocUtils.batchedMetrics)
+        #
+        # @return a list of dicts mapping from metric name to value
+        #   (in the same order as fnames)
+
+        weights = self.resultDirData.getWeights(isTrain)
+        labels  = self.resultDirData.getLabels(isTrain)
+
+        outputs = None
+
+        # maps from (directory, sample) of an epoch store
+        # to the list of (epoch, row) read from it
+        storeRows = {}
+
+        for row, fname in enumerate(fnames):
+            if fname.endswith(EpochStore.entrySuffix):
+                inputDir, sample, epoch = EpochStore.parseEntryName(fname)
+                storeRows.setdefault((inputDir, sample), []).append((epoch, row))
+                continue
+
+            thisOutputs = self.__readOutputs(fname)
+
+            if outputs is None:
+                outputs = np.empty((len(fnames), len(thisOutputs)), dtype = thisOutputs.dtype)
+
+            outputs[row] = thisOutputs
+
+        # read the epochs from the stores in blocks of consecutive rows
+        for (inputDir, sample), epochRows in storeRows.items():
+            store = EpochStore.openStore(inputDir, sample, [ epoch for epoch, row in epochRows ])
+
+            print "reading %d epochs from %s" % (len(epochRows), store.dataFname)
+
+            rowOfEpoch = dict(epochRows)
+
+            for blockEpochs, block in store.iterBlocks(rowOfEpoch.keys()):
+                if outputs is None:
+                    outputs = np.empty((len(fnames), block.shape[1]), dtype = block.dtype)
+
+                outputs[[ rowOfEpoch[epoch] for epoch in blockEpochs ]] = block
+
+        values = self.__resolveMetrics(metricNames, isTrain,
+                                       lambda computeNames: batchedMetrics(labels, outputs, weights, computeNames,
+                                                                           targets = self.__getTargets(computeNames, isTrain)))
+
+        return [ dict((metricName, value[row]) for metricName, value in values.items())
+                 for row in range(len(fnames)) ]
+
+    #----------------------------------------
+
+    def __updateCache(self, results, metric = 'auc'):
+        # @param results is a list of (input file name, isTrain, value)
+        #   where value can also be a dict mapping from metric name
+        #   to value
+
+        entries = []
+
+        for fname, isTrain, value in results:
+            if fname.endswith(".cached-auc.py"):
+                # import legacy cached value
+                fname = fname[:-len(".cached-auc.py")]
+
+            if isTrain:
+                sample = 'train'
+            else:
+                sample = 'test'
+
+            if isinstance(value, dict):
+                for thisMetric, thisValue in value.items():
+                    entries.append((fname, sample, self.resultDirData.getWeightsVariant(isTrain), thisMetric, thisValue))
+            else:
+                entries.append((fname, sample, self.resultDirData.getWeightsVariant(isTrain), metric, value))
+
+        self.metricsCache.putMany(entries)
 
     #----------------------------------------
 
@@ -193,11 +611,29 @@ class ResultDirRocs:
 
     #----------------------------------------
 
+    def __readOutputs(self, fname):
+        # @return the network outputs from the given file
+
+        print "reading",fname
+
+        assert fname.endswith(".npz") or fname.endswith(tuple(".npz" + suffix for suffix in compressedSuffixes + (EpochStore.entrySuffix,)))
+        try:
+            if fname.endswith(EpochStore.entrySuffix):
+                return EpochStore.loadEntry(fname)
+            else:
+                # memory mapped for uncompressed files
+                data = loadNpz(fname)
+                return data['output']
+        except Exception, ex:
+            raise Exception("error caught reading " + fname, ex)
+
+    #----------------------------------------
+
     def readROC(self, fname, isTrain, returnFullCurve = False, updateCache = True):
         # reads a torch/npz file and calculates the area under the ROC
         # curve for it
         # 
-        # also looks for a cached file
+        # also reads legacy .cached-auc.py files
 
         if fname.endswith(".cached-auc.py"):
             if returnFullCurve:
@@ -208,55 +644,64 @@ class ResultDirRocs:
             auc = float(open(fname).read())
             return auc
 
-        print "reading",fname
+        if returnFullCurve:
+            outputs = self.__readOutputs(fname)
 
-        assert fname.endswith(".npz") or fname.endswith(".npz.bz2")
-        try:
-            import numpy as np
-            if fname.endswith(".npz.bz2"):
-                import bz2
-                data = np.load(bz2.BZ2File(fname))
-            else:
-                data = np.load(fname)
-        except Exception, ex:
-            raise Exception("error caught reading " + fname, ex)
+            weights = self.resultDirData.getWeights(isTrain)
+            labels  = self.resultDirData.getLabels(isTrain)
 
-        weights = self.resultDirData.getWeights(isTrain)
-        labels  = self.resultDirData.getLabels(isTrain)
-        outputs = data['output']
+            from sklearn.metrics import roc_curve, auc
 
-        from sklearn.metrics import roc_curve, auc
+            fpr, tpr, thresholds = roc_curve(labels, outputs, sample_weight = weights)
 
-        fpr, tpr, thresholds = roc_curve(labels, outputs, sample_weight = weights)
+            aucValue = auc(fpr, tpr, reorder = True)
+            if updateCache:
+                # write to cache
+                self.__updateCache([ (fname, isTrain, aucValue) ])
 
-        aucValue = auc(fpr, tpr, reorder = True)
+            return aucValue, len(weights), fpr, tpr, thresholds
+        else:
+            # only the area and the working point metrics are needed,
+            # avoid building the curve and sorting a second time
+            return self.readMetrics(fname, isTrain, [ 'auc' ] + list(self.workingPointMetrics),
+                                    updateCache = updateCache)['auc']
 
-        #----------
+    #----------------------------------------
 
-        if updateCache:
-            # write to cache
-            cachedFname = fname + ".cached-auc.py"
-            fout = open(cachedFname,"w")
-            print >> fout,aucValue
-            fout.close()
-
-            # also copy the timestamp so that we can 
-            # use it for estimating the time elapsed
-            # for the plot
-            modTime = os.path.getmtime(fname)
-            os.utime(cachedFname, (modTime, modTime))
+    def __getTargets(self, metricNames, isTrain):
+        # @return the targets for the per event metrics or None
+        # if there are none among the given metrics
+        if any(isPointwiseMetric(metricName) for metricName in metricNames):
+            return self.resultDirData.getTargets(isTrain)
+        else:
+            return None
 
-        #----------
+    #----------------------------------------
 
-        if returnFullCurve:
-            return aucValue, len(weights), fpr, tpr, thresholds
-        else:
-            return aucValue
+    def readMetrics(self, fname, isTrain, metricNames, updateCache = True):
+        # calculates the given metrics (see rocUtils.parseMetricName)
+        # for the given output file with a single sort
+        #
+        # @return a dict mapping from metric name to value
+
+        outputs = self.__readOutputs(fname)
+
+        weights = self.resultDirData.getWeights(isTrain)
+        labels  = self.resultDirData.getLabels(isTrain)
+
+        values = self.__resolveMetrics(metricNames, isTrain,
+                                       lambda computeNames: weightedMetrics(labels, outputs, weights, computeNames,
+                                                                            targets = self.__getTargets(computeNames, isTrain)))
+
+        if updateCache:
+            self.__updateCache([ (fname, isTrain, values) ])
+
+        return values
 
     #----------------------------------------
 
 
-    def __getInputFname(self, epoch, isTrain):
+    def getInputFname(self, epoch, isTrain):
         # epoch can also be 'BDT', otherwise a number
 
         if isTrain:
@@ -267,8 +712,12 @@ class ResultDirRocs:
 
         if epoch == 'BDT':
             return self.mvaROCfnames[sample]
-        else:
+        elif epoch in self.rocFnames[sample]:
             return self.rocFnames[sample][epoch]
+        else:
+            # output file deleted (e.g. by cleanResults.py) but
+            # values derived from it may still be persisted
+            return os.path.join(self.resultDirData.inputDir, "%s-%s-%04d.npz" % (self.outputPrefix, sample, epoch))
 
     #----------------------------------------
 
@@ -277,18 +726,352 @@ class ResultDirRocs:
         #
         # epoch can also be 'BDT', otherwise a number
 
-        # for the moment, just rerun the ROC curve calculation 
-        # every time this is called
-        # TODO: cache
+        # curves are calculated only once, recently
+        # used ones are kept in memory
 
-        inputFname = self.__getInputFname(epoch, isTrain)
+        inputFname = self.getInputFname(epoch, isTrain)
 
-        auc, numEvents, fpr, tpr, thresholds = self.readROC(inputFname, isTrain, returnFullCurve = True)
+        auc, numEvents, fpr, tpr, thresholds = self.curveCache.get(
+            inputFname, isTrain, self.__getCurveVariant(isTrain),
+            lambda: self.__calculateROCcurve(inputFname, isTrain))
 
         return auc, numEvents, fpr, tpr, thresholds
 
     #----------------------------------------
 
+    def __getCurveVariant(self, isTrain):
+        # @return the string identifying the weights and settings
+        # a full ROC curve depends on
+
+        curveVariant = self.resultDirData.getWeightsVariant(isTrain)
+        if self.compactCurves:
+            curveVariant += "|compact"
+            if self.benchmarkThresholds is not None:
+                curveVariant += ":" + ",".join(str(cut) for cut in self.benchmarkThresholds)
+
+        return curveVariant
+
+    #----------------------------------------
+
+    def _lookupFullROCcurve(self, epoch, isTrain):
+        # @return the curve from the curve cache or None if
+        # it has not been calculated yet
+        return self.curveCache.lookup(self.getInputFname(epoch, isTrain), isTrain,
+                                      self.__getCurveVariant(isTrain))
+
+    #----------------------------------------
+
+    def _storeFullROCcurve(self, epoch, isTrain, curve):
+        # adds a curve calculated elsewhere (see calculateFullROCcurve(..))
+        # to the curve cache and its AUC to the metrics cache
+        inputFname = self.getInputFname(epoch, isTrain)
+
+        self.__updateCache([ (inputFname, isTrain, curve[0]) ])
+
+        return self.curveCache.get(inputFname, isTrain,
+                                   self.__getCurveVariant(isTrain), lambda: curve)
+
+    #----------------------------------------
+
+    def calculateFullROCcurve(self, epoch, isTrain):
+        # calculates the curve without going through the curve cache
+        #
+        # this runs on the workers of the executors (which may be threads
+        # sharing the connection to the metrics cache) so the AUC is
+        # written by _storeFullROCcurve(..) in the calling thread
+        return self.__calculateROCcurve(self.getInputFname(epoch, isTrain), isTrain, updateCache = False)
+
+    #----------------------------------------
+
+    def __calculateROCcurve(self, inputFname, isTrain, updateCache = True):
+        # @return auc, numEvents, fpr, tpr, thresholds
+
+        auc, numEvents, fpr, tpr, thresholds = self.readROC(inputFname, isTrain, returnFullCurve = True,
+                                                            updateCache = updateCache)
+
+        if self.compactCurves:
+            # the AUC is still the one of the full curve
+            fpr, tpr, thresholds = compactROCcurve(fpr, tpr, thresholds,
+                                                   keepThresholds = self.benchmarkThresholds)
+
+        return auc, numEvents, fpr, tpr, thresholds
+    #----------------------------------------
+
+    def getBenchmarkMetricNames(self):
+        # @return the names of the metrics for the signal efficiency
+        # at the background efficiency of the BDT for each of the
+        # benchmark thresholds (empty if there is no BDT)
+
+        if self.benchmarkThresholds is None or not (self.hasBDTroc(True) or self.hasBDTroc(False)):
+            return []
+
+        return [ "tprAtBdtCut:%g" % cut for cut in self.benchmarkThresholds ]
+
+    #----------------------------------------
+
+    def getBDTworkingPoint(self, cut, isTrain):
+        # @return fpr, tpr of the BDT for the given cut on its output
+        #
+        # calculated from the BDT outputs (without building the
+        # full curve) once per directory and kept in the metrics cache
+
+        key = (cut, isTrain)
+
+        if not key in self.bdtWorkingPoints:
+            inputFname = self.getInputFname('BDT', isTrain)
+
+            if isTrain:
+                sample = 'train'
+            else:
+                sample = 'test'
+
+            weightsVariant = self.resultDirData.getWeightsVariant(isTrain)
+
+            fprName = "bdtFprAtCut:%g" % cut
+            tprName = "bdtTprAtCut:%g" % cut
+
+            fpr = self.metricsCache.get(inputFname, sample, weightsVariant, fprName)
+            tpr = self.metricsCache.get(inputFname, sample, weightsVariant, tprName)
+
+            if fpr is None or tpr is None:
+                outputs = self.__readOutputs(inputFname)
+
+                tps, fps, thresholds = sortedCumulativeSums(self.resultDirData.getLabels(isTrain),
+                                                            outputs,
+                                                            self.resultDirData.getWeights(isTrain))
+
+                fprs, tprs, dummy = benchmarkEfficiencies(fps / fps[-1], tps / tps[-1], thresholds, [ cut ], [])
+                fpr, tpr = float(fprs[0]), float(tprs[0])
+
+                self.metricsCache.putMany([ (inputFname, sample, weightsVariant, fprName, fpr),
+                                            (inputFname, sample, weightsVariant, tprName, tpr) ])
+
+            self.bdtWorkingPoints[key] = (fpr, tpr)
+
+        return self.bdtWorkingPoints[key]
+
+    #----------------------------------------
+
+    def prepareBenchmarkWorkingPoints(self):
+        # determines the BDT working points for all benchmark thresholds
+        # and samples with a BDT output file
+        for isTrain in (True, False):
+            if self.benchmarkThresholds is not None and self.hasBDTroc(isTrain):
+                for cut in self.benchmarkThresholds:
+                    self.getBDTworkingPoint(cut, isTrain)
+
+    #----------------------------------------
+
+    def __resolveMetrics(self, metricNames, isTrain, calculate):
+        # translates the benchmark metrics ('tprAtBdtCut:<cut>')
+        # into true positive rates at the BDT's false positive rate
+        # for the given sample and calls calculate with the list
+        # of metrics understood by rocUtils.parseMetricName
+        #
+        # @return a dict mapping from the original metric names
+        #   to the values (benchmark metrics are left out for
+        #   samples without BDT)
+
+        # pairs of (requested name, name to calculate)
+        namePairs = []
+
+        for metricName in metricNames:
+            if metricName.startswith("tprAtBdtCut:"):
+                if not self.hasBDTroc(isTrain):
+                    continue
+
+                fpr, tpr = self.getBDTworkingPoint(float(metricName.split(':')[1]), isTrain)
+                namePairs.append((metricName, "tprAtFpr:%r" % fpr))
+            else:
+                namePairs.append((metricName, metricName))
+
+        values = calculate(sorted(set(computeName for metricName, computeName in namePairs)))
+
+        return dict((metricName, values[computeName]) for metricName, computeName in namePairs)
+
+    #----------------------------------------
+
+    def getBenchmarkEfficiencies(self, cuts, isTrain, candidates, refEpoch = 'BDT'):
+        # calculates the working points for the given cuts on the
+        # output of refEpoch (the BDT or an epoch of this directory)
+        # and the signal efficiencies of the candidates at the same
+        # background efficiencies from the cached (full) ROC curves
+        #
+        # note that with compact curves, the working points are exact
+        # only for the cuts given in benchmarkThresholds, other cuts
+        # are interpolated between the retained points
+        #
+        # @param candidates is a list of (ResultDirRocs, epoch)
+        #
+        # @return refFprs, refTprs, tprs (see rocUtils.benchmarkEfficiencies)
+
+        auc, numEvents, refFpr, refTpr, refThresholds = self.getFullROCcurve(refEpoch, isTrain)
+
+        curves = []
+        for resultDirRocs, epoch in candidates:
+            auc, numEvents, fpr, tpr, thresholds = resultDirRocs.getFullROCcurve(epoch, isTrain)
+            curves.append((fpr, tpr))
+
+        return benchmarkEfficiencies(refFpr, refTpr, refThresholds, cuts, curves)
+
+    #----------------------------------------
+
+    def __calculateBootstrap(self, inputFname, isTrain, numReplicas):
+        # @return aucStd, fpr, tprLow, tprMedian, tprHigh
+        # where the band corresponds to the central 68% of the replicas
+
+        outputs = self.__readOutputs(inputFname)
+
+        weights = self.resultDirData.getWeights(isTrain)
+        labels  = self.resultDirData.getLabels(isTrain)
+
+        aucs, tprs = bootstrapROC(labels, outputs, weights, numReplicas = numReplicas,
+                                  seed = bootstrapSeed, fprGrid = bootstrapFprGrid)
+
+        tprLow, tprMedian, tprHigh = np.percentile(tprs, [ 16, 50, 84 ], axis = 0)
+
+        return np.std(aucs), bootstrapFprGrid, tprLow, tprMedian, tprHigh
+
+    #----------------------------------------
+
+    def readBootstrapAUCstd(self, fname, isTrain, numReplicas, updateCache = True):
+        # calculates the uncertainty on the AUC for the given output file
+        # from bootstrap replicas (without the bands)
+
+        outputs = self.__readOutputs(fname)
+
+        weights = self.resultDirData.getWeights(isTrain)
+        labels  = self.resultDirData.getLabels(isTrain)
+
+        aucs, tprs = bootstrapROC(labels, outputs, weights, numReplicas = numReplicas,
+                                  seed = bootstrapSeed)
+
+        aucStd = np.std(aucs)
+
+        if updateCache:
+            self.__updateCache([ (fname, isTrain, aucStd) ], bootstrapMetricName(numReplicas))
+
+        return aucStd
+
+    #----------------------------------------
+
+    def getBootstrapBand(self, epoch, isTrain, numReplicas = 200):
+        # @return aucStd, fpr, tprLow, tprMedian, tprHigh
+        # for the given epoch (can also be 'BDT')
+        #
+        # the bands are persisted next to the output files
+
+        inputFname = self.getInputFname(epoch, isTrain)
+
+        variant = self.resultDirData.getWeightsVariant(isTrain) + "|bootstrap:%d:%d" % (numReplicas, bootstrapSeed)
+
+        return self.bootstrapCache.get(
+            inputFname, isTrain, variant,
+            lambda: self.__calculateBootstrap(inputFname, isTrain, numReplicas))
+
+    #----------------------------------------
+
+    def getAllBootstrapAUCstds(self, numReplicas = 200):
+        # calculates the bootstrap uncertainties of the AUC for all
+        # non-excluded epochs. The values are kept in the
+        # metrics cache.
+        #
+        # @return mvaStd, stdValues with the same structure as
+        # the return values of getAllROCs()
+
+        return self.readROCfiles(BootstrapHelper(self, numReplicas),
+                                 includeCached = True,
+                                 metric = bootstrapMetricName(numReplicas))
+
+    #----------------------------------------
+
+    def __getHistogramVariant(self, isTrain, numBins, outputRange):
+        # @return the string identifying the weights and binning
+        # an output histogram depends on
+        return self.resultDirData.getWeightsVariant(isTrain) + "|histogram:%d:%r:%r" % (numBins, float(outputRange[0]), float(outputRange[1]))
+
+    #----------------------------------------
+
+    def calculateOutputHistogram(self, epoch, isTrain, numBins, outputRange):
+        # calculates the histograms of the outputs of the given epoch
+        # (can also be 'BDT') without going through the histogram cache
+        #
+        # @return edges, sigCounts, bkgCounts (see rocUtils.outputHistograms)
+
+        outputs = self.__readOutputs(self.getInputFname(epoch, isTrain))
+
+        weights = self.resultDirData.getWeights(isTrain)
+        labels  = self.resultDirData.getLabels(isTrain)
+
+        sigCounts, bkgCounts = outputHistograms(labels, outputs, weights, numBins, outputRange)
+
+        return np.linspace(outputRange[0], outputRange[1], numBins + 1), sigCounts, bkgCounts
+
+    #----------------------------------------
+
+    def getOutputHistogram(self, epoch, isTrain, numBins = 100, outputRange = (0, 1)):
+        # @return edges, sigCounts, bkgCounts for the given epoch
+        #
+        # the histograms are persisted next to the output files
+
+        return self.histogramCache.get(
+            self.getInputFname(epoch, isTrain), isTrain, self.__getHistogramVariant(isTrain, numBins, outputRange),
+            lambda: self.calculateOutputHistogram(epoch, isTrain, numBins, outputRange))
+
+    #----------------------------------------
+
+    def _lookupOutputHistogram(self, epoch, isTrain, numBins, outputRange):
+        # @return the histograms from the histogram cache or None if
+        # they have not been calculated yet
+        return self.histogramCache.lookup(self.getInputFname(epoch, isTrain), isTrain,
+                                          self.__getHistogramVariant(isTrain, numBins, outputRange))
+
+    #----------------------------------------
+
+    def _storeOutputHistogram(self, epoch, isTrain, numBins, outputRange, histogram):
+        # adds histograms calculated elsewhere (see calculateOutputHistogram(..))
+        # to the histogram cache
+        return self.histogramCache.get(self.getInputFname(epoch, isTrain), isTrain,
+                                       self.__getHistogramVariant(isTrain, numBins, outputRange),
+                                       lambda: histogram)
+
+    #----------------------------------------
+
+    def getHistogramOnlyEpochs(self, isTrain, numBins = 100, outputRange = (0, 1)):
+        # @return the epochs (within the selected range) whose output
+        # files no longer exist but for which histograms with the
+        # given binning are persisted (see cleanResults.py --histograms)
+
+        if isTrain:
+            sample = 'train'
+        else:
+            sample = 'test'
+
+        retval = []
+
+        for fname in glob.glob(os.path.join(self.resultDirData.inputDir, "%s-%s-*.npz%s" % (self.outputPrefix, sample, histogramSidecarSuffix))):
+            mo = re.match(self.outputPrefix + "-" + sample + "-(\d+)\.npz" + re.escape(histogramSidecarSuffix) + "$", os.path.basename(fname))
+            if not mo:
+                continue
+
+            epoch = int(mo.group(1), 10)
+
+            if epoch in self.rocFnames[sample]:
+                continue
+
+            if (self.minEpoch != None and epoch < self.minEpoch) or (self.maxEpoch != None and epoch > self.maxEpoch):
+                continue
+
+            if self.excludedEpochs != None and epoch in self.excludedEpochs:
+                continue
+
+            if self._lookupOutputHistogram(epoch, isTrain, numBins, outputRange) is not None:
+                retval.append(epoch)
+
+        return sorted(retval)
+
+    #----------------------------------------
+
     def hasBDTroc(self, isTrain):
         if isTrain:
             return self.mvaROCfnames['train'] != None
@@ -311,10 +1094,287 @@ class ResultDirRocs:
         # gets all non-exlucded roc values
         # calculates them if not in the cache
 
-        # TODO: caching of the results
+        return self.getAllMetrics('auc')
+
+    #----------------------------------------
+
+    def getAllMetrics(self, metric):
+        # gets the values of the given metric (see rocUtils.parseMetricName)
+        # for all non-excluded epochs, calculates them if not in the cache
+        # (together with the metrics of getDefaultMetricNames())
+        #
+        # @return mvaValues, values with the same structure
+        # as the return values of readROCfiles(..)
+
+        return getAllMetricsMulti([ self ], metric)[0]
+
+#----------------------------------------------------------------------
+
+def _getSharedExecutor(resultDirRocsList, fnames):
+    # returns an executor for running tasks for all the given
+    # directories (the backend is taken from the first directory)
+    # or a serial executor if none of them allows parallel execution
+    #
+    # @param fnames are the names of the files read by the tasks
+
+    resultDirRocsList = [ resultDirRocs for resultDirRocs in resultDirRocsList
+                          if resultDirRocs.maxNumThreads != None ]
+
+    if not resultDirRocsList or not fnames:
+        return getExecutor('serial')
+
+    backend = resultDirRocsList[0].executorBackend
+
+    if backend == 'process':
+        # avoid sending a copy of the weights and labels
+        # with each task
+        for resultDirRocs in resultDirRocsList:
+            resultDirRocs.resultDirData.shareArrays()
+
+    numWorkers = autoNumWorkers(fnames, maxWorkers = max(resultDirRocs.maxNumThreads for resultDirRocs in resultDirRocsList))
+
+    return getExecutor(backend, numWorkers)
+
+#----------------------------------------------------------------------
+
+def readROCfilesMulti(requests, includeCached = False, metric = 'auc', errors = None):
+    # runs readROCfiles(..) for several result directories with one
+    # common queue of tasks such that the workers are kept busy
+    # until the last file of all directories has been processed
+    # (instead of waiting for the slowest file of each directory)
+    #
+    # @param requests is a list of (ResultDirRocs, transformation)
+    #
+    # @param errors if not None, a dict to which the directories
+    #   for which a file could not be read are added (with the
+    #   error message) instead of raising an exception.
+    #
+    # @return a list of (mvaROC, rocValues), one per request
+    #   (None for the directories added to errors)
+
+    jobs = []
+
+    for resultDirRocs, transformation in requests:
+        if transformation == None:
+            transformation = _readROCfilesLambda
+
+        error = None
+
+        try:
+            mvaROC, rocValues, tasks = resultDirRocs._collectTasks(transformation, includeCached, metric)
+        except (Exception, SystemExit), ex:
+            if errors is None:
+                raise
+
+            # e.g. no output files
+            error = str(ex)
+            mvaROC, rocValues, tasks = None, None, []
+
+        jobs.append(dict(resultDirRocs = resultDirRocs,
+                         transformation = transformation,
+                         mvaROC = mvaROC,
+                         rocValues = rocValues,
+                         tasks = tasks,
+                         results = [ None ] * len(tasks),
+                         error = error))
+
+    # only the file names are collected in the current thread
+    serialJobs   = [ job for job in jobs if job['transformation'] is _readROCfilesLambda ]
+    parallelJobs = [ job for job in jobs if job['transformation'] is not _readROCfilesLambda ]
+
+    executor = _getSharedExecutor([ job['resultDirRocs'] for job in parallelJobs if job['tasks'] ],
+                                  [ task['args'][0] for job in parallelJobs for task in job['tasks'] ])
+
+    for theseJobs, thisExecutor in ((serialJobs, getExecutor('serial')), (parallelJobs, executor)):
+
+        # one list of groups of tasks for all directories
+        groupOwners = []
+        allGroupArgs = []
+
+        for job in theseJobs:
+            if not job['tasks']:
+                continue
+
+            taskGroups, groupArgs = job['resultDirRocs']._makeTaskGroups(job['transformation'], job['tasks'], thisExecutor.numWorkers)
+
+            groupOwners += [ (job, group) for group in taskGroups ]
+            allGroupArgs += groupArgs
+
+        for groupIndex, res in thisExecutor.imapUnordered(_getCallFunction(errors), allGroupArgs):
+            job, group = groupOwners[groupIndex]
+
+            if isinstance(res, _TaskFailure):
+                if job['error'] is None:
+                    job['error'] = res.message
+                continue
+
+            if len(group) == 1:
+                job['results'][group[0]] = res
+            else:
+                for index, value in zip(group, res):
+                    job['results'][index] = value
+
+    retval = []
+
+    for job in jobs:
+        if job['error'] is not None:
+            errors.setdefault(job['resultDirRocs'].getInputDir(), job['error'])
+            retval.append(None)
+            continue
+
+        job['resultDirRocs']._storeResults(job['tasks'], job['results'], job['mvaROC'], job['rocValues'],
+                                           includeCached, metric)
+        retval.append((job['mvaROC'], job['rocValues']))
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def getAllMetricsMulti(resultDirRocsList, metric = 'auc', errors = None):
+    # like ResultDirRocs.getAllMetrics(..) for several directories,
+    # the missing values are calculated on one common executor
+    #
+    # @param errors see readROCfilesMulti(..)
+    #
+    # @return a list of (mvaValues, values), one per directory
+    #   (None for the directories added to errors)
+
+    # the values are read only once per directory
+    # (e.g. for the different plots)
+    missing = [ resultDirRocs for resultDirRocs in resultDirRocsList
+                if not metric in resultDirRocs.allMetricValues ]
+
+    results = readROCfilesMulti([ (resultDirRocs, ReadROChelper(resultDirRocs, [ metric ]))
+                                  for resultDirRocs in missing ],
+                                includeCached = True,
+                                metric = metric,
+                                errors = errors)
+
+    for resultDirRocs, result in zip(missing, results):
+        if result is not None:
+            resultDirRocs.allMetricValues[metric] = result
+
+    return [ resultDirRocs.allMetricValues.get(metric, None) for resultDirRocs in resultDirRocsList ]
+
+#----------------------------------------------------------------------
+
+def getFullROCcurvesMulti(requests, errors = None):
+    # calculates the full ROC curves which are not yet in the
+    # curve caches on one common executor
+    #
+    # @param requests is a list of (ResultDirRocs, epoch, isTrain)
+    #
+    # @param errors see readROCfilesMulti(..)
+    #
+    # @return the list of curves (see ResultDirRocs.getFullROCcurve)
+
+    retval = [ None ] * len(requests)
+
+    # indices of the requests which must be calculated
+    missing = []
+
+    for index, (resultDirRocs, epoch, isTrain) in enumerate(requests):
+        retval[index] = resultDirRocs._lookupFullROCcurve(epoch, isTrain)
+
+        if retval[index] is None:
+            missing.append(index)
+
+    executor = _getSharedExecutor([ requests[index][0] for index in missing ],
+                                  [ requests[index][0].getInputFname(requests[index][1], requests[index][2])
+                                    for index in missing ])
+
+    argsList = [ (FullROCcurveHelper(requests[index][0]), requests[index][1:]) for index in missing ]
+
+    for missingIndex, curve in executor.imapUnordered(_getCallFunction(errors), argsList):
+        index = missing[missingIndex]
+        resultDirRocs, epoch, isTrain = requests[index]
+
+        if isinstance(curve, _TaskFailure):
+            # the curve stays None
+            errors.setdefault(resultDirRocs.getInputDir(), curve.message)
+            continue
+
+        retval[index] = resultDirRocs._storeFullROCcurve(epoch, isTrain, curve)
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def getOutputHistogramsMulti(requests, numBins = 100, outputRange = (0, 1), errors = None):
+    # calculates the output histograms which are not yet in the
+    # histogram caches on one common executor
+    #
+    # @param requests is a list of (ResultDirRocs, epoch, isTrain)
+    #
+    # @param errors see readROCfilesMulti(..)
+    #
+    # @return the list of histograms (see ResultDirRocs.getOutputHistogram)
+
+    retval = [ None ] * len(requests)
+
+    # indices of the requests which must be calculated
+    missing = []
+
+    for index, (resultDirRocs, epoch, isTrain) in enumerate(requests):
+        retval[index] = resultDirRocs._lookupOutputHistogram(epoch, isTrain, numBins, outputRange)
+
+        if retval[index] is None:
+            missing.append(index)
+
+    executor = _getSharedExecutor([ requests[index][0] for index in missing ],
+                                  [ requests[index][0].getInputFname(requests[index][1], requests[index][2])
+                                    for index in missing ])
+
+    argsList = [ (OutputHistogramHelper(requests[index][0], numBins, outputRange), requests[index][1:])
+                 for index in missing ]
+
+    for missingIndex, histogram in executor.imapUnordered(_getCallFunction(errors), argsList):
+        index = missing[missingIndex]
+        resultDirRocs, epoch, isTrain = requests[index]
+
+        if isinstance(histogram, _TaskFailure):
+            # the histogram stays None
+            errors.setdefault(resultDirRocs.getInputDir(), histogram.message)
+            continue
+
+        retval[index] = resultDirRocs._storeOutputHistogram(epoch, isTrain, numBins, outputRange, histogram)
+
+    return retval
+
+#----------------------------------------------------------------------
+
+# recently used ResultDirRocs objects, least recently used first
+# (see getResultDirRocs)
+_instances = OrderedDict()
+
+# maximum number of objects kept in _instances
+maxInstances = 8
+
+#----------------------------------------------------------------------
+
+def getResultDirRocs(resultDirData, **kwargs):
+    # returns a (possibly previously created) ResultDirRocs object
+    # for the given ResultDirData object (see ResultDirData.getResultDirData)
+    # and constructor arguments. Reused objects keep the values and curves
+    # they have calculated so far but look again for output files.
+
+    key = (id(resultDirData),) + tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in kwargs.items()))
+
+    entry = _instances.pop(key, None)
+
+    if entry is not None and entry[0] is resultDirData:
+        entry[1].refresh()
+    else:
+        entry = (resultDirData, ResultDirRocs(resultDirData, **kwargs))
+
+    # (re)insert as most recently used
+    _instances[key] = entry
+
+    while len(_instances) > maxInstances:
+        _instances.popitem(last = False)
 
-        mvaROC, rocValues = self.readROCfiles(ReadROChelper(self), 
-                                         includeCached = True)
-        return mvaROC, rocValues
+    return entry[1]
 
 #----------------------------------------------------------------------
@@ -2,6 +2,41 @@
 
 import sys, os, re, time, glob
 
+from MetricsCache import MetricsCache, canonicalOutputName
+import CurveCache
+import gradientSummaries
+from npzIO import codecSuffixes, compressFiles
+
+#---------------------------------------------------------------------- 
+
+def getCachedOutputNames(dirname, metric):
+    # @return a dict mapping from sample to the set of canonical
+    # output names for which the given metric is cached for
+    # the current weights of the sample
+
+    from ResultDirData import getResultDirData
+
+    metricsCache = MetricsCache(dirname)
+
+    retval = dict(train = set(), test = set())
+
+    try:
+        resultDirData = getResultDirData(dirname, False)
+    except (SystemExit, Exception):
+        # without weights, no cached value can be used
+        return retval
+
+    for isTrain, sample, fname in ((True, 'train', resultDirData.trainWeightsFname),
+                                   (False, 'test', resultDirData.testWeightsFname)):
+        if fname is None:
+            continue
+
+        weightsVariant = resultDirData.getWeightsVariant(isTrain)
+
+        retval[sample] = set(metricsCache.getAll(sample, weightsVariant, metric).keys())
+
+    return retval
+
 #---------------------------------------------------------------------- 
 # main
 #---------------------------------------------------------------------- 
@@ -18,10 +53,14 @@ parser = OptionParser("""
    - network model files older than minimum age and before the most recent one
   
    - test/train output data older minimum age and before the most recent
-     one and only if a corresponding cached AUC file exists
+     one and only if a corresponding cached AUC value exists
+     (with --compute-missing, missing AUC values are calculated first)
 
      will also delete compressed files
 
+  and to compress the remaining .npz files (on a pool of
+  worker processes common to all given directories)
+
 """
 )
 
@@ -55,6 +94,52 @@ parser.add_option("--keep",
                   metavar = "n"
                   )
 
+parser.add_option("--compute-missing",
+                  dest = "computeMissing",
+                  default = False,
+                  action = "store_true",
+                  help="calculate the AUC and working point values which are not yet cached (on a pool of workers common to all directories) such that the output files can be deleted. Also done with -n.",
+                  )
+
+parser.add_option("--histograms",
+                  default = False,
+                  action = "store_true",
+                  help="with --compute-missing, also keep histograms of the outputs of each epoch (for plotNNoutput.py --all-epochs)",
+                  )
+
+parser.add_option("--executor",
+                  dest = 'executorBackend',
+                  default = 'process',
+                  choices = [ 'serial', 'thread', 'process' ],
+                  help="how to run the calculations for --compute-missing: serial, thread or process",
+                  )
+
+parser.add_option("--codec",
+                  default = "bz2",
+                  choices = sorted(codecSuffixes.keys()),
+                  help="codec for compressing the remaining .npz files: " + ", ".join(sorted(codecSuffixes.keys())) + " (default: %default, none to not compress)",
+                  )
+
+parser.add_option("--level",
+                  default = 9,
+                  type = int,
+                  help="compression level (default: %default)",
+                  )
+
+parser.add_option("--jobs",
+                  dest = "numJobs",
+                  default = None,
+                  type = int,
+                  help="number of files to compress at the same time (default: determined from the number of CPUs and the available memory)",
+                  )
+
+parser.add_option("--max-io-rate",
+                  dest = "maxIoRate",
+                  default = None,
+                  type = float,
+                  help="maximum rate (in MByte/s, all workers together) at which the files to be compressed are read (default: no limit)",
+                  )
+
 (options, ARGV) = parser.parse_args()
 
 if len(ARGV) < 1:
@@ -68,11 +153,73 @@ if options.keepEpochList != None:
     options.keepEpochList = [ int(x) for x in options.keepEpochList.split(',') ]
 
 #----------------------------------------
+# calculate missing cached values first
+#----------------------------------------
+
+# directories for which the missing values could not
+# be calculated (and which are therefore not cleaned)
+failedDirs = set()
+
+if options.computeMissing:
+    from ResultDirData import getResultDirData
+    from ResultDirRocs import ResultDirRocs, getAllMetricsMulti, getOutputHistogramsMulti
+    from plotROCs import officialPhotonIdCut
+
+    resultDirRocsList = []
+
+    for dirname in ARGV:
+        try:
+            # same settings as the default ones of plotROCs.py
+            resultDirRocsList.append(ResultDirRocs(getResultDirData(dirname, False),
+                                                   executorBackend = options.executorBackend,
+                                                   benchmarkThresholds = [ officialPhotonIdCut ]))
+        except SystemExit:
+            # the reason was printed already
+            print >> sys.stderr,"WARNING: not calculating missing values for",dirname
+            failedDirs.add(dirname)
+        except Exception, ex:
+            print >> sys.stderr,"WARNING: not calculating missing values for %s: %s" % (dirname, str(ex))
+            failedDirs.add(dirname)
+
+    # maps from directory to error message
+    errors = {}
+
+    # the AUC, working point and benchmark values are calculated together
+    getAllMetricsMulti(resultDirRocsList, 'auc', errors)
+
+    if options.histograms:
+        getOutputHistogramsMulti([ (resultDirRocs, epoch, sample == 'train')
+                                   for resultDirRocs in resultDirRocsList
+                                   if not resultDirRocs.getInputDir() in errors
+                                   for sample in ('train', 'test')
+                                   for epoch in sorted(resultDirRocs.rocFnames[sample].keys()) ],
+                                 errors = errors)
+
+    for resultDirRocs in resultDirRocsList:
+        dirname = resultDirRocs.getInputDir()
+
+        if dirname in errors:
+            print >> sys.stderr,"WARNING: failed to calculate missing values for %s: %s" % (dirname, errors[dirname])
+            failedDirs.add(dirname)
+
+#----------------------------------------
+
+# .npz files of all directories to be compressed
+# at the end
+filesToCompress = []
 
 for dirname in ARGV:
 
+    if dirname in failedDirs:
+        print >> sys.stderr,"WARNING: skipping",dirname
+        continue
+
     allFnames = set(os.listdir(dirname))
 
+    # output files for which the AUC is in the metrics cache
+    # (by sample)
+    cachedOutputNames = getCachedOutputNames(dirname, 'auc')
+
     # list of  (number, full filename) 
     modelFiles = []
 
@@ -115,6 +262,23 @@ for dirname in ARGV:
             filesToKeep.append(fullFname)
             continue
 
+        # persisted full ROC curves, bootstrap bands, output histograms
+        # and gradient magnitude summaries
+        if fname.endswith((".npz" + CurveCache.sidecarSuffix, ".npz" + CurveCache.bootstrapSidecarSuffix,
+                           ".npz" + CurveCache.histogramSidecarSuffix,
+                           ".npz" + gradientSummaries.summarySuffix)):
+            filesToKeep.append(fullFname)
+            continue
+
+        # consolidated output stores
+        if re.match("roc-data-(train|test)\.epochs(-index\.json)?$", fname):
+            filesToKeep.append(fullFname)
+            continue
+
+        if fname == MetricsCache.defaultFname:
+            filesToKeep.append(fullFname)
+            continue
+
         #----------
         # model files
         #----------
@@ -184,7 +348,7 @@ for dirname in ARGV:
                 keep = True
             
             cachedFname = fname + ".cached-auc.py"
-            if not cachedFname in filesToKeep:
+            if not cachedFname in filesToKeep and not canonicalOutputName(fname) in cachedOutputNames[sample]:
                 # we must keep this file, there is no cached version
                 keep = True
 
@@ -232,13 +396,56 @@ for dirname in ARGV:
             os.unlink(fname)
 
     # zip any remaining .npz files
-    fnames = glob.glob(dirname + "/*.npz")
-    for fname in fnames:
-        if options.dryRun:
-            if not fname in filesToDelete:
-                print "would zip",fname
-        else:
-            print "zipping",fname
-            os.system("bzip2 " + fname)
+    if options.codec != 'none':
+        fnames = glob.glob(dirname + "/*.npz")
+        for fname in fnames:
+            if options.dryRun:
+                if not fname in filesToDelete:
+                    print "would zip",fname
+            else:
+                filesToCompress.append(fname)
 
 # end of loop over directories
+
+#----------------------------------------
+# compress the remaining files of all directories
+#----------------------------------------
+
+if filesToCompress:
+    startTime = time.time()
+
+    totalInputSize = 0
+    totalOutputSize = 0
+    numFailed = 0
+
+    maxBytesPerSecond = None
+    if options.maxIoRate:
+        maxBytesPerSecond = options.maxIoRate * 1e6
+
+    for result in compressFiles(filesToCompress, codec = options.codec, level = options.level,
+                                numWorkers = options.numJobs,
+                                maxBytesPerSecond = maxBytesPerSecond):
+
+        if 'error' in result:
+            print >> sys.stderr,"WARNING: failed to compress %s: %s" % (result['fname'], result['error'])
+            numFailed += 1
+            continue
+
+        print "zipped %s (%.1f MB -> %.1f MB in %.1f s)" % (result['outputFname'], result['inputSize'] / 1e6,
+                                                            result['outputSize'] / 1e6, result['seconds'])
+
+        totalInputSize += result['inputSize']
+        totalOutputSize += result['outputSize']
+
+    elapsed = time.time() - startTime
+
+    print "compressed %d files: %.1f MB -> %.1f MB (%.1f%%) in %.1f s (%.1f MB/s)" % (
+        len(filesToCompress) - numFailed,
+        totalInputSize / 1e6, totalOutputSize / 1e6,
+        100. * totalOutputSize / max(totalInputSize, 1),
+        elapsed,
+        totalInputSize / 1e6 / max(elapsed, 1e-6))
+
+    if numFailed > 0:
+        print >> sys.stderr,"failed to compress %d files" % numFailed
+        sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# copies the network outputs of the individual per epoch files
+# (roc-data-{train,test}-NNNN.npz[.bz2]) of result directories
+# into consolidated per sample epoch stores (see EpochStore.py)
+
+import sys, os, re, glob
+
+from EpochStore import EpochStore
+from npzIO import loadNpz
+
+#----------------------------------------------------------------------
+
+def convertDirectory(inputDir, sample, dtype, deleteOriginals = False, dryRun = False):
+    # @return the number of epochs added
+
+    # maps from epoch to output file name
+    epochFiles = {}
+
+    for fname in glob.glob(os.path.join(inputDir, "roc-data-%s-*.npz*" % sample)):
+        mo = re.match("roc-data-" + sample + "-(\d+)\.npz(\.bz2|\.xz|\.gz)?$", os.path.basename(fname))
+        if mo:
+            epochFiles[int(mo.group(1), 10)] = fname
+
+    store = EpochStore(inputDir, sample)
+
+    numAdded = 0
+
+    for epoch in sorted(epochFiles.keys()):
+        fname = epochFiles[epoch]
+
+        if store.hasEpoch(epoch):
+            print "epoch %d already in store, skipping %s" % (epoch, fname)
+        else:
+            print "adding",fname
+
+            if not dryRun:
+                store.append(epoch, loadNpz(fname)['output'], dtype = dtype)
+
+            numAdded += 1
+
+        if deleteOriginals:
+            print "deleting",fname
+            if not dryRun:
+                os.unlink(fname)
+
+    return numAdded
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser("""
+
+      usage: %prog [options] result-directory [ result-directory ... ]
+
+      copies the network outputs of all epochs into one consolidated
+      file per sample (roc-data-{train,test}.epochs) which is read
+      transparently by ResultDirRocs
+
+    """
+    )
+
+    parser.add_option("-n",
+                      dest = "dryRun",
+                      default = False,
+                      action = "store_true",
+                      help = "only print what would be done",
+                      )
+
+    parser.add_option("--dtype",
+                      default = "float32",
+                      choices = [ "float32", "float16" ],
+                      help = "data type for storing the outputs (only used when creating the store)",
+                      )
+
+    parser.add_option("--delete",
+                      dest = "deleteOriginals",
+                      default = False,
+                      action = "store_true",
+                      help = "delete the individual output files once they are in the store",
+                      )
+
+    (options, ARGV) = parser.parse_args()
+
+    if not ARGV:
+        print >> sys.stderr,"must specify at least one directory to work on"
+        sys.exit(1)
+
+    for inputDir in ARGV:
+        for sample in ('train', 'test'):
+            numAdded = convertDirectory(inputDir, sample, options.dtype,
+                                        deleteOriginals = options.deleteOriginals,
+                                        dryRun = options.dryRun)
+
+            print "added %d epochs to the %s store of %s" % (numAdded, sample, inputDir)
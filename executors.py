@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# long lived executors (serial, threads, processes) used to run
+# independent tasks such as the calculation of the AUC
+# for each output file
+
+import os, atexit, multiprocessing
+
+#----------------------------------------------------------------------
+
+def _preloadModules():
+    # worker initializer: import the heavy modules once
+    # when the worker starts instead of in the first task
+    import numpy
+    try:
+        import sklearn.metrics
+    except ImportError:
+        pass
+
+#----------------------------------------------------------------------
+
+class _IndexedCall:
+    # wraps a function such that it can be called with (index, args)
+    # and returns (index, result) to identify results which
+    # arrive out of order
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, indexAndArgs):
+        index, args = indexAndArgs
+        return index, self.func(*args)
+
+#----------------------------------------------------------------------
+
+class SerialExecutor:
+    """ runs the tasks in the current thread """
+
+    numWorkers = 1
+
+    def imapUnordered(self, func, argsList):
+        # @return an iterator over (index, result) in order of completion
+        for index, args in enumerate(argsList):
+            yield index, func(*args)
+
+    def close(self):
+        pass
+
+#----------------------------------------------------------------------
+
+class _PoolExecutor:
+    # common part for thread and process pools
+
+    def __init__(self, numWorkers):
+        self.numWorkers = numWorkers
+        self.pool = self._makePool(numWorkers)
+
+    def imapUnordered(self, func, argsList):
+        # @return an iterator over (index, result) in order of completion
+
+        argsList = list(argsList)
+
+        # a few chunks per worker to balance uneven task durations
+        chunkSize = max(1, len(argsList) // (4 * self.numWorkers))
+
+        return self.pool.imap_unordered(_IndexedCall(func), enumerate(argsList), chunkSize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+#----------------------------------------------------------------------
+
+class ThreadExecutor(_PoolExecutor):
+    """ runs the tasks in a pool of threads. Useful when the bulk
+        of the work is done in numpy functions which release the GIL
+        (e.g. sorting) and avoids sending data to other processes """
+
+    def _makePool(self, numWorkers):
+        from multiprocessing.pool import ThreadPool
+        return ThreadPool(processes = numWorkers)
+
+#----------------------------------------------------------------------
+
+class ProcessExecutor(_PoolExecutor):
+    """ runs the tasks in a pool of worker processes which have
+        numpy and sklearn already imported """
+
+    def _makePool(self, numWorkers):
+        return multiprocessing.Pool(processes = numWorkers, initializer = _preloadModules)
+
+#----------------------------------------------------------------------
+
+backends = dict(
+    serial = SerialExecutor,
+    thread = ThreadExecutor,
+    process = ProcessExecutor,
+    )
+
+# executors created so far, by backend (one per backend such that
+# pools are not piling up when different numbers of workers are requested)
+_executors = {}
+
+# process in which the executors were created
+_executorsPid = os.getpid()
+
+#----------------------------------------------------------------------
+
+def _closeExecutors():
+    if _executorsPid != os.getpid():
+        return
+
+    for executor in _executors.values():
+        executor.close()
+    _executors.clear()
+
+atexit.register(_closeExecutors)
+
+#----------------------------------------------------------------------
+
+# available memory when first asked for (see _availableMemory())
+_initialAvailableMemory = []
+
+def _availableMemory():
+    # @return the available physical memory in bytes or None if unknown.
+    #
+    # This is determined only once per process such that the number
+    # of workers (and therefore the pool to use) does not change with
+    # the momentary amount of free memory.
+
+    if not _initialAvailableMemory:
+        try:
+            _initialAvailableMemory.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES'))
+        except (ValueError, OSError, AttributeError):
+            _initialAvailableMemory.append(None)
+
+    return _initialAvailableMemory[0]
+
+#----------------------------------------------------------------------
+
+def autoNumWorkers(fnames = None, maxWorkers = None, memoryFraction = 0.5):
+    # determines the number of workers from the number of CPUs
+    # and, if given, the size of the files each task reads:
+    # the estimated memory needed per task for the largest file
+    # times the number of workers should not exceed the given
+    # fraction of the available memory
+    #
+    # @param maxWorkers upper limit on the number of workers (or None)
+
+    numWorkers = multiprocessing.cpu_count()
+
+    if maxWorkers is not None:
+        numWorkers = min(numWorkers, maxWorkers)
+
+    if fnames:
+        perTaskBytes = 0
+
+        for fname in fnames:
+            try:
+                size = os.path.getsize(fname)
+            except OSError:
+                continue
+
+            if fname.endswith((".bz2", ".xz", ".gz")):
+                # rough compression factor
+                size *= 5
+
+            # the loaded array plus the temporary arrays
+            # for sorting and cumulative sums
+            perTaskBytes = max(perTaskBytes, 4 * size)
+
+        availableMemory = _availableMemory()
+
+        if perTaskBytes > 0 and availableMemory is not None:
+            numWorkers = min(numWorkers, int(memoryFraction * availableMemory / perTaskBytes))
+
+    return max(1, numWorkers)
+
+#----------------------------------------------------------------------
+
+def getExecutor(backend = 'process', numWorkers = None):
+    # returns a long lived executor of the given type
+    # (one of the keys of 'backends'). Executors are created
+    # on first use and reused afterwards. There is one executor
+    # per backend, it is replaced (and the old one closed) when
+    # a different number of workers is requested.
+
+    if not backend in backends:
+        raise Exception("unknown executor backend '%s', supported are %s" % (backend, ", ".join(sorted(backends.keys()))))
+
+    if backend == 'serial':
+        numWorkers = 1
+    elif numWorkers is None:
+        numWorkers = autoNumWorkers()
+
+    global _executorsPid
+    if _executorsPid != os.getpid():
+        # we are in a forked process (e.g. a worker), the pools
+        # of the parent process can't be used here
+        _executors.clear()
+        _executorsPid = os.getpid()
+
+    executor = _executors.get(backend, None)
+
+    if executor is not None and executor.numWorkers != numWorkers:
+        executor.close()
+        executor = None
+
+    if executor is None:
+        if backend == 'serial':
+            executor = SerialExecutor()
+        else:
+            executor = backends[backend](numWorkers)
+
+        _executors[backend] = executor
+
+    return executor
+
+#----------------------------------------------------------------------
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+# per epoch summaries (moments, quantiles and a histogram) of the
+# gradient magnitudes written during the training
+# (gradient-magnitudes-NNNN.npz). Each epoch's file is reduced
+# once and the summary is persisted next to it so that
+# plots of the evolution do not need to read the full files again.
+
+import glob, os, re, sys
+
+import numpy as np
+
+from CurveCache import CurveCache
+from npzIO import compressedSuffixes, loadNpz
+
+#----------------------------------------------------------------------
+
+# suffix of the files with persisted summaries
+summarySuffix = ".cached-gradient-summary"
+
+# names of the quantities of one summary
+summaryFields = ('count', 'mean', 'std', 'min', 'max',
+                 'quantileLevels', 'quantiles',
+                 'histEdges', 'histCounts')
+
+defaultQuantileLevels = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# fixed logarithmic bins of the histograms. The first
+# and last bin collect the values below and above the range.
+histogramEdges = np.r_[0, np.logspace(-10, 5, 151), np.inf]
+
+#----------------------------------------------------------------------
+
+def findGradientFiles(inputDir):
+    # @return a dict mapping from epoch number to the
+    # gradient magnitudes file (possibly compressed)
+
+    retval = {}
+
+    inputFiles = glob.glob(os.path.join(inputDir, "gradient-magnitudes-*.npz"))
+    for suffix in compressedSuffixes:
+        inputFiles += glob.glob(os.path.join(inputDir, "gradient-magnitudes-*.npz" + suffix))
+
+    for inputFname in sorted(inputFiles):
+        mo = re.match("gradient-magnitudes-(\d+)\.npz(\.bz2|\.xz|\.gz)?$", os.path.basename(inputFname))
+
+        if not mo:
+            print >> sys.stderr,"warning: skipping",inputFname
+            continue
+
+        epoch = int(mo.group(1), 10)
+
+        if not epoch in retval or not mo.group(2):
+            # uncompressed files take priority
+            retval[epoch] = inputFname
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def readGradientMagnitudes(fname):
+    return loadNpz(fname)['gradientMagnitudes']
+
+#----------------------------------------------------------------------
+
+def calculateSummary(fname, quantileLevels = defaultQuantileLevels):
+    # reads the given gradient magnitudes file
+    #
+    # @return the summary as a tuple with the quantities
+    # listed in summaryFields
+
+    values = np.asarray(readGradientMagnitudes(fname), dtype = 'float64').ravel()
+
+    quantileLevels = np.asarray(quantileLevels, dtype = 'float64')
+
+    histCounts = np.histogram(values, bins = histogramEdges)[0]
+
+    if len(values) == 0:
+        nan = float('nan')
+        return (0, nan, nan, nan, nan,
+                quantileLevels, np.zeros(len(quantileLevels)) + nan,
+                histogramEdges, histCounts)
+
+    return (len(values),
+            float(values.mean()),
+            float(values.std()),
+            float(values.min()),
+            float(values.max()),
+            quantileLevels,
+            np.percentile(values, 100 * quantileLevels),
+            histogramEdges,
+            histCounts)
+
+#----------------------------------------------------------------------
+
+class SummaryHelper:
+    # calculates the summary for one file (on a worker)
+
+    def __init__(self, quantileLevels):
+        self.quantileLevels = quantileLevels
+
+    def __call__(self, fname):
+        return calculateSummary(fname, self.quantileLevels)
+
+#----------------------------------------------------------------------
+
+def summaryVariant(quantileLevels):
+    # identifies the settings a summary depends on
+    return "quantiles=%s;bins=%d" % (",".join("%g" % level for level in quantileLevels),
+                                     len(histogramEdges) - 1)
+
+#----------------------------------------------------------------------
+
+def getGradientSummaries(inputDir, quantileLevels = defaultQuantileLevels, executorBackend = 'process',
+                         maxWorkers = None):
+    # reads the persisted summaries of all epochs of the given
+    # directory and calculates the missing ones, one file at a time
+    # per worker
+    #
+    # @return a dict mapping from epoch number to a dict
+    #   with the quantities listed in summaryFields
+
+    from executors import autoNumWorkers, getExecutor
+
+    cache = CurveCache(maxSize = 0, persist = True, suffix = summarySuffix, fields = summaryFields)
+
+    variant = summaryVariant(quantileLevels)
+
+    epochFiles = findGradientFiles(inputDir)
+
+    summaries = {}
+
+    # epochs to calculate
+    missing = []
+
+    for epoch, fname in epochFiles.items():
+        summary = cache.lookup(fname, False, variant)
+
+        if summary is None:
+            missing.append(epoch)
+        else:
+            summaries[epoch] = summary
+
+    if missing:
+        fnames = [ epochFiles[epoch] for epoch in missing ]
+
+        if executorBackend == 'serial':
+            executor = getExecutor('serial')
+        else:
+            executor = getExecutor(executorBackend, autoNumWorkers(fnames, maxWorkers = maxWorkers))
+
+        helper = SummaryHelper(quantileLevels)
+
+        for index, summary in executor.imapUnordered(helper, [ (fname,) for fname in fnames ]):
+            epoch = missing[index]
+            summaries[epoch] = cache.get(epochFiles[epoch], False, variant, lambda: summary)
+
+    return dict((epoch, dict(zip(summaryFields, summary))) for epoch, summary in summaries.items())
+
+#----------------------------------------------------------------------
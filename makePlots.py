@@ -1,80 +1,14 @@
 #!/usr/bin/env python
 import os, sys
 
-#----------------------------------------------------------------------
-# main
-#----------------------------------------------------------------------
-
-# parse command line arguments
-import argparse
-
-parser = argparse.ArgumentParser(prog='drawSparseRecHits',
-                                 formatter_class = argparse.ArgumentDefaultsHelpFormatter,
-                                 )
-
-
-parser.add_argument('--legend-loc',
-                    metavar = "loc",
-                    type = str,
-                    default = None,
-                    help='legend location specification',
-                    dest = "legendLoc",
-                    )
-
-
-parser.add_argument('--nodate',
-                    default = False,
-                    action = 'store_true',
-                    help='suppress date label',
-                    )
-
-parser.add_argument('--tmva',
-                    default = False,
-                    action = 'store_true',
-                    help='make plots for TMVA trainings',
-                    )
-
-parser.add_argument("--min-epoch",
-                    dest = 'minEpoch',
-                    type = int,
-                    default = None,
-                    help="first epoch to plot (useful e.g. if the training was far off at the beginning)",
-                    )
-
-parser.add_argument("--max-epoch",
-                    dest = 'maxEpoch',
-                    type = int,
-                    default = None,
-                    help="last epoch to plot (useful e.g. if the training diverges at some point)",
-                    )
-
-parser.add_argument('dirs',
-                    metavar = "dir",
-                    type = str,
-                    nargs = "+",
-                    help='directories to make plots for',
-                    )
-
-options = parser.parse_args()
-#----------------------------------------
-
-if options.tmva:
-    if not options.legendLoc is None:
-        print >> sys.stderr,"--legend-loc is not supported with --tmva"
-        sys.exit(1)
-    
-    if not options.minEpoch is None:
-        print >> sys.stderr,"--min-epoch is not supported with --tmva"
-        sys.exit(1)
-
-    if not options.maxEpoch is None:
-        print >> sys.stderr,"--max-epoch is not supported with --tmva"
-        sys.exit(1)
-        
-
 scriptDir = os.path.dirname(__file__)
 
-for theDir in options.dirs:
+#----------------------------------------------------------------------
+
+def makeShellCommand(theDir, options):
+    # @return the shell command running the plotting scripts
+    # for the given directory in the background and sending
+    # the plots (used for TMVA trainings)
 
     cmdParts = []
 
@@ -99,28 +33,6 @@ for theDir in options.dirs:
         cmdParts.append("--nodate")
 
     if options.legendLoc != None:
-
-        validLegendLocs = [
-            "right",
-            "center left",
-            "upper right",
-            "lower right",
-            "best",
-            "center",
-            "lower left",
-            "center right",
-            "upper left",
-            "upper center",
-            "lower center",
-            ]
-
-        if not options.legendLoc in validLegendLocs:
-            print >> sys.stderr,"unsupported legend location '%s'. Supported are: %s" % (
-                options.legendLoc,
-                ", ".join(validLegendLocs)
-                )
-            sys.exit(1)
-
         cmdParts.append("--legend-loc '" + options.legendLoc + "'")
 
     cmdParts.append("&")
@@ -149,8 +61,274 @@ for theDir in options.dirs:
             "--subject " + theDir,
             theDir + "/*.pdf" ])
 
-    cmd = " ( " + " ".join(cmdParts) + " ) &"
+    return " ( " + " ".join(cmdParts) + " ) &"
+
+#----------------------------------------------------------------------
+
+def renderDirectory(resultDirRocs, plotOptions, maxEpoch):
+    # render job: draws and saves all plots for one directory.
+    # Runs on a worker process which has the plotting modules
+    # already imported.
+    #
+    # @return the list of pdf files in the directory or
+    #   None if plotting failed
+
+    import glob
+    import plotROCs, plotNNoutput
+
+    theDir = resultDirRocs.getInputDir()
+
+    try:
+        plotROCs.renderPlots(resultDirRocs, plotOptions)
+    except Exception, ex:
+        print >> sys.stderr,"failed to make plots for %s: %s" % (theDir, str(ex))
+        return None
+
+    if maxEpoch is None:
+        maxEpoch = 0
+
+    try:
+        plotNNoutput.plotNNoutput(theDir, maxEpoch, 'train', savePlots = True)
+    except Exception, ex:
+        # e.g. no individual output files
+        print >> sys.stderr,"failed to plot the network output for %s: %s" % (theDir, str(ex))
+
+    return sorted(glob.glob(os.path.join(theDir, "*.pdf")))
 
-    # print cmd
-    os.system(cmd)
+#----------------------------------------------------------------------
+
+def notify(theDir, pdfFiles):
+    # notify job: sends the plots of one directory
+    import pipes
+
+    os.system(" ".join([ "mailme", "--subject", pipes.quote(theDir) ] +
+                       [ pipes.quote(fname) for fname in pdfFiles ]))
+
+#----------------------------------------------------------------------
+
+def runInProcess(options):
+    # makes the plots for all directories from this process in three
+    # stages, each stage of a directory depending on the previous one:
+    #
+    #   compute: missing AUCs, working points and ROC curves of all
+    #            directories, as one queue of tasks on a common pool
+    #            of workers
+    #   render:  the plots of each directory on a pool of workers
+    #            (the data is read from the caches filled before)
+    #   notify:  send the plots of each directory as soon as
+    #            they are rendered
+    #
+    # Both pools are bounded by --max-workers and the available memory.
+    # A directory for which one of the stages fails is reported and
+    # skipped, the other directories are still plotted.
+
+    # the plots are only saved
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import plotROCs
+    from executors import getExecutor, autoNumWorkers
+
+    plotArgs = [ "--both", "--save-plots" ]
+
+    if not options.minEpoch is None:
+        plotArgs += [ "--min-epoch", str(options.minEpoch) ]
+
+    if not options.maxEpoch is None:
+        plotArgs += [ "--max-epoch", str(options.maxEpoch) ]
+
+    if options.nodate:
+        plotArgs.append("--nodate")
+
+    if options.legendLoc != None:
+        plotArgs += [ "--legend-loc", options.legendLoc ]
 
+    plotOptions, dummy = plotROCs.parseOptions(plotArgs)
+
+    # the render workers read the curves calculated
+    # in the compute stage from the files
+    plotOptions.persistCurves = True
+
+    # each directory is rendered by one worker
+    # (these can't start further processes)
+    plotOptions.renderWorkers = 1
+
+    if options.maxWorkers is None:
+        maxWorkers = autoNumWorkers()
+    else:
+        maxWorkers = options.maxWorkers
+
+    #----------
+    # compute
+    #----------
+    resultDirRocsList = []
+
+    for theDir in options.dirs:
+        try:
+            resultDirRocsList.append(plotROCs.makeResultDirRocs(theDir, plotOptions,
+                                                                maxNumThreads = maxWorkers,
+                                                                batchMemoryBudget = int(options.memoryBudget * 1024**3)))
+        except (Exception, SystemExit), ex:
+            print >> sys.stderr,"skipping %s: %s" % (theDir, str(ex))
+
+    # maps from directory to error message
+    errors = {}
+
+    plotROCs.computePlotData(resultDirRocsList, plotOptions, errors)
+
+    #----------
+    # render and notify
+    #----------
+
+    # the weights and labels are sent to the workers as file names
+    for resultDirRocs in resultDirRocsList:
+        if resultDirRocs.getInputDir() in errors:
+            continue
+
+        try:
+            resultDirRocs.resultDirData.shareArrays()
+        except Exception, ex:
+            errors[resultDirRocs.getInputDir()] = str(ex)
+
+    for theDir, message in sorted(errors.items()):
+        print >> sys.stderr,"failed to make plots for %s: %s" % (theDir, message)
+
+    resultDirRocsList = [ resultDirRocs for resultDirRocs in resultDirRocsList
+                          if not resultDirRocs.getInputDir() in errors ]
+
+    executor = getExecutor('process', min(maxWorkers, max(1, len(resultDirRocsList))))
+
+    for index, pdfFiles in executor.imapUnordered(renderDirectory,
+                                                  [ (resultDirRocs, plotOptions, options.maxEpoch)
+                                                    for resultDirRocs in resultDirRocsList ]):
+        theDir = resultDirRocsList[index].getInputDir()
+
+        if pdfFiles is None:
+            continue
+
+        print "finished plots for",theDir
+
+        if not options.noMail:
+            notify(theDir, pdfFiles)
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    # parse command line arguments
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='drawSparseRecHits',
+                                     formatter_class = argparse.ArgumentDefaultsHelpFormatter,
+                                     )
+
+
+    parser.add_argument('--legend-loc',
+                        metavar = "loc",
+                        type = str,
+                        default = None,
+                        help='legend location specification',
+                        dest = "legendLoc",
+                        )
+
+
+    parser.add_argument('--nodate',
+                        default = False,
+                        action = 'store_true',
+                        help='suppress date label',
+                        )
+
+    parser.add_argument('--tmva',
+                        default = False,
+                        action = 'store_true',
+                        help='make plots for TMVA trainings',
+                        )
+
+    parser.add_argument("--min-epoch",
+                        dest = 'minEpoch',
+                        type = int,
+                        default = None,
+                        help="first epoch to plot (useful e.g. if the training was far off at the beginning)",
+                        )
+
+    parser.add_argument("--max-epoch",
+                        dest = 'maxEpoch',
+                        type = int,
+                        default = None,
+                        help="last epoch to plot (useful e.g. if the training diverges at some point)",
+                        )
+
+    parser.add_argument("--max-workers",
+                        dest = 'maxWorkers',
+                        type = int,
+                        default = None,
+                        help="maximum number of worker processes for calculating and plotting (default: number of CPUs, also limited by the available memory)",
+                        )
+
+    parser.add_argument("--memory-budget",
+                        dest = 'memoryBudget',
+                        type = float,
+                        default = 1.0,
+                        help="total memory in GB for evaluating several epochs at once",
+                        )
+
+    parser.add_argument("--no-mail",
+                        dest = 'noMail',
+                        default = False,
+                        action = 'store_true',
+                        help="do not send the plots with mailme",
+                        )
+
+    parser.add_argument('dirs',
+                        metavar = "dir",
+                        type = str,
+                        nargs = "+",
+                        help='directories to make plots for',
+                        )
+
+    options = parser.parse_args()
+    #----------------------------------------
+
+    if options.tmva:
+        if not options.legendLoc is None:
+            print >> sys.stderr,"--legend-loc is not supported with --tmva"
+            sys.exit(1)
+    
+        if not options.minEpoch is None:
+            print >> sys.stderr,"--min-epoch is not supported with --tmva"
+            sys.exit(1)
+
+        if not options.maxEpoch is None:
+            print >> sys.stderr,"--max-epoch is not supported with --tmva"
+            sys.exit(1)
+
+    if options.legendLoc != None:
+
+        validLegendLocs = [
+            "right",
+            "center left",
+            "upper right",
+            "lower right",
+            "best",
+            "center",
+            "lower left",
+            "center right",
+            "upper left",
+            "upper center",
+            "lower center",
+            ]
+
+        if not options.legendLoc in validLegendLocs:
+            print >> sys.stderr,"unsupported legend location '%s'. Supported are: %s" % (
+                options.legendLoc,
+                ", ".join(validLegendLocs)
+                )
+            sys.exit(1)
+
+    if options.tmva:
+        # one shell pipeline per directory
+        for theDir in options.dirs:
+            os.system(makeShellCommand(theDir, options))
+    else:
+        runInProcess(options)
@@ -0,0 +1,709 @@
+#!/usr/bin/env python
+
+# reading (and writing) of possibly compressed .npz files
+#
+# supported are:
+#   .npz       uncompressed
+#   .npz.bz2   bzip2. Files consisting of several concatenated
+#              bzip2 streams (as written by compressFile(..) or pbzip2)
+#              are decompressed in parallel
+#   .npz.xz    lzma (needs the lzma or backports.lzma module on python 2)
+#   .npz.gz    gzip/zlib
+
+import os, re, struct, zipfile
+
+import numpy as np
+
+#----------------------------------------------------------------------
+
+# file name suffixes of compressed files
+compressedSuffixes = ('.bz2', '.xz', '.gz')
+
+# maps from codec name to file name suffix
+codecSuffixes = dict(bz2 = '.bz2', xz = '.xz', gz = '.gz', none = '')
+
+#----------------------------------------------------------------------
+
+def findNpzFile(fnameWithoutSuffix):
+    # returns the name of the uncompressed or
+    # compressed version of the given .npz file
+    # or None if none exists
+
+    for suffix in ('',) + compressedSuffixes:
+        fname = fnameWithoutSuffix + suffix
+        if os.path.exists(fname):
+            return fname
+
+    return None
+
+#----------------------------------------------------------------------
+
+def _importLzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise Exception("reading/writing .xz files needs the lzma module (backports.lzma on python 2)")
+
+    return lzma
+
+#----------------------------------------------------------------------
+# bzip2
+#----------------------------------------------------------------------
+
+# start of a bzip2 stream (header followed by the magic number
+# of the first block or of the end of stream)
+_bz2StreamStart = re.compile(b"BZh[1-9](?:\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)")
+
+#----------------------------------------------------------------------
+
+def _bz2StreamComplete(decompressor):
+    # returns True if the decompressor has seen the end of the stream
+
+    eof = getattr(decompressor, 'eof', None)
+    if eof is not None:
+        return eof
+
+    # python 2 has no eof attribute but raises EOFError
+    # when trying to decompress after the end of the stream
+    try:
+        decompressor.decompress(b"")
+    except EOFError:
+        return True
+
+    return False
+
+#----------------------------------------------------------------------
+
+def _decompressBz2Segment(data):
+    # decompresses a segment which should consist of exactly one
+    # bzip2 stream
+    #
+    # @return the decompressed data or None if the segment
+    # is not a complete stream
+
+    import bz2
+
+    decompressor = bz2.BZ2Decompressor()
+
+    try:
+        result = decompressor.decompress(data)
+    except (IOError, ValueError, EOFError):
+        return None
+
+    if decompressor.unused_data or not _bz2StreamComplete(decompressor):
+        return None
+
+    return result
+
+#----------------------------------------------------------------------
+
+def _decompressBz2Serial(data):
+    # decompresses all (possibly multiple) streams in data one after the other
+    #
+    # @return the decompressed data as a single buffer
+    import bz2
+
+    pieces = []
+
+    while data:
+        decompressor = bz2.BZ2Decompressor()
+        pieces.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+
+    if len(pieces) == 1:
+        return pieces[0]
+
+    return b"".join(pieces)
+
+#----------------------------------------------------------------------
+
+def _runOnThreads(func, argsList, maxNumThreads = None):
+    # runs func for each of the given argument tuples on a short lived
+    # pool of threads of its own. The shared executors of
+    # executors.getExecutor(..) can not be used here: this may be called
+    # from a task running on one of them (e.g. reading an output file
+    # with the thread backend) and waiting for tasks queued behind
+    # the calling one would never finish.
+    #
+    # @return the list of results (in the order of argsList)
+
+    from executors import ThreadExecutor, autoNumWorkers
+
+    if maxNumThreads is None:
+        maxNumThreads = autoNumWorkers()
+
+    numThreads = min(len(argsList), maxNumThreads)
+
+    if numThreads <= 1:
+        return [ func(*args) for args in argsList ]
+
+    executor = ThreadExecutor(numThreads)
+
+    results = [ None ] * len(argsList)
+    try:
+        for index, result in executor.imapUnordered(func, argsList):
+            results[index] = result
+    finally:
+        executor.close()
+
+    return results
+
+#----------------------------------------------------------------------
+
+class _Bz2SegmentWriter:
+    # decompresses a bzip2 stream directly into its
+    # place in the output buffer
+
+    def __init__(self, buf, pieceSize):
+        self.buf = buf
+        self.pieceSize = pieceSize
+
+    def __call__(self, index, segment):
+        # @return False if the segment could not be decompressed
+        # or does not have the expected uncompressed size
+
+        piece = _decompressBz2Segment(segment)
+
+        if piece is None or len(piece) != self.pieceSize:
+            return False
+
+        self.buf[index * self.pieceSize:(index + 1) * self.pieceSize] = piece
+
+        return True
+
+#----------------------------------------------------------------------
+
+def _decompressBz2(data, maxNumThreads = None):
+    # decompresses the streams of files with several bzip2 streams
+    # (as written by compressFile(..)) in parallel. Files with a single
+    # stream (e.g. written by the bzip2 command line tool) are
+    # decompressed serially.
+    #
+    # @return the decompressed data as a single buffer
+
+    # candidate stream start positions. These could also be false
+    # positives inside compressed data, in which case decoding the
+    # segments fails and we fall back to serial decompression.
+    starts = [ mo.start() for mo in _bz2StreamStart.finditer(data) ]
+
+    if len(starts) < 2 or starts[0] != 0:
+        return _decompressBz2Serial(data)
+
+    segments = [ data[start:end] for start, end in zip(starts, starts[1:] + [ len(data) ]) ]
+
+    # all streams but the last one are expected to have the same
+    # uncompressed size (the block size of compressFile(..)). The first and
+    # last one give the total size such that the other ones can be written
+    # directly into one buffer (instead of joining the pieces afterwards).
+    first, last = _runOnThreads(_decompressBz2Segment, [ (segments[0],), (segments[-1],) ], maxNumThreads)
+
+    if first is None or last is None:
+        return _decompressBz2Serial(data)
+
+    buf = bytearray(len(first) * (len(segments) - 1) + len(last))
+
+    buf[:len(first)] = first
+    buf[len(buf) - len(last):] = last
+
+    writer = _Bz2SegmentWriter(buf, len(first))
+    del first, last
+
+    # bz2 releases the GIL while decompressing
+    if not all(_runOnThreads(writer, [ (index, segments[index]) for index in range(1, len(segments) - 1) ],
+                             maxNumThreads)):
+        del buf
+        return _decompressBz2Serial(data)
+
+    return buf
+
+#----------------------------------------------------------------------
+
+def _compressBz2(data, level, blockSize, maxNumThreads = None):
+    # compresses each block of blockSize bytes into an independent bzip2
+    # stream so that it can be decompressed in parallel. The concatenated
+    # streams are a valid .bz2 file for the bzip2 command line tools.
+    import bz2
+
+    blocks = [ (data[start:start + blockSize], level) for start in range(0, max(len(data), 1), blockSize) ]
+
+    return _runOnThreads(bz2.compress, blocks, maxNumThreads)
+
+#----------------------------------------------------------------------
+
+def _readDecompressed(fname, maxNumThreads = None):
+    # @return the decompressed content of the given file as
+    # a single buffer
+
+    fin = open(fname, "rb")
+    data = fin.read()
+    fin.close()
+
+    if fname.endswith(".bz2"):
+        return _decompressBz2(data, maxNumThreads)
+    elif fname.endswith(".xz"):
+        return _importLzma().decompress(data)
+    elif fname.endswith(".gz"):
+        import zlib
+        # accept the gzip header
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    else:
+        return data
+
+#----------------------------------------------------------------------
+# parsing of .npz (zip) files
+#----------------------------------------------------------------------
+
+class _BufferFile:
+    # minimal read only file interface on top of a memory buffer
+    # (avoids the copy which io.BytesIO makes on python 2)
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def read(self, size = -1):
+        if size is None or size < 0:
+            end = len(self.buf)
+        else:
+            end = min(self.pos + size, len(self.buf))
+
+        result = bytes(self.buf[self.pos:end])
+        self.pos = end
+        return result
+
+    def seek(self, offset, whence = 0):
+        if whence == 0:
+            self.pos = offset
+        elif whence == 1:
+            self.pos += offset
+        else:
+            self.pos = len(self.buf) + offset
+
+    def tell(self):
+        return self.pos
+
+#----------------------------------------------------------------------
+
+def _memberLayout(fin, zipInfo):
+    # determines where the array data of a stored (uncompressed)
+    # zip member starts in the zip file
+    #
+    # @return dtype, shape, fortranOrder, offset or None
+    # if the member can't be accessed in place
+
+    if zipInfo.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    # local file header: the length of the file name and
+    # extra field are at offset 26
+    fin.seek(zipInfo.header_offset)
+    header = fin.read(30)
+    nameLength, extraLength = struct.unpack("<HH", header[26:30])
+
+    memberStart = zipInfo.header_offset + 30 + nameLength + extraLength
+
+    fin.seek(memberStart)
+    version = np.lib.format.read_magic(fin)
+
+    if version == (1, 0):
+        shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(fin)
+    else:
+        shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(fin)
+
+    if dtype.hasobject:
+        return None
+
+    return dtype, shape, fortranOrder, fin.tell()
+
+#----------------------------------------------------------------------
+
+def _memberName(zipName):
+    # strips the .npy suffix
+    if zipName.endswith(".npy"):
+        return zipName[:-4]
+    return zipName
+
+#----------------------------------------------------------------------
+
+def _parseNpzBuffer(buf):
+    # @return a dict of arrays. Arrays of stored zip members
+    # are views into buf (no copy)
+
+    fin = _BufferFile(buf)
+    zf = zipfile.ZipFile(fin)
+
+    result = {}
+
+    for zipInfo in zf.infolist():
+        name = _memberName(zipInfo.filename)
+
+        layout = _memberLayout(fin, zipInfo)
+
+        if layout is None:
+            # compressed member (np.savez_compressed) or object array
+            import io
+            result[name] = np.load(io.BytesIO(zf.read(zipInfo.filename)), allow_pickle = True)
+            continue
+
+        dtype, shape, fortranOrder, offset = layout
+
+        count = int(np.prod(shape))
+        array = np.frombuffer(buf, dtype = dtype, count = count, offset = offset)
+
+        if fortranOrder:
+            array = array.reshape(shape[::-1]).transpose()
+        else:
+            array = array.reshape(shape)
+
+        result[name] = array
+
+    return result
+
+#----------------------------------------------------------------------
+
+def _mapNpzMembers(fname):
+    # memory maps the arrays of stored members of an uncompressed
+    # .npz file (as written by np.savez). Other members
+    # (e.g. written by np.savez_compressed) are read into memory.
+    #
+    # @return a dict of name to array
+
+    result = {}
+
+    fin = open(fname, "rb")
+    zf = zipfile.ZipFile(fin)
+
+    for zipInfo in zf.infolist():
+        name = _memberName(zipInfo.filename)
+
+        layout = _memberLayout(fin, zipInfo)
+
+        if layout is None:
+            import io
+            result[name] = np.load(io.BytesIO(zf.read(zipInfo.filename)), allow_pickle = True)
+            continue
+
+        dtype, shape, fortranOrder, offset = layout
+
+        if int(np.prod(shape)) == 0:
+            # can't map zero bytes
+            result[name] = np.empty(shape, dtype = dtype)
+            continue
+
+        if fortranOrder:
+            order = 'F'
+        else:
+            order = 'C'
+
+        result[name] = np.memmap(fname, dtype = dtype, mode = 'r', offset = offset,
+                                 shape = shape, order = order)
+
+    zf.close()
+    fin.close()
+
+    return result
+
+#----------------------------------------------------------------------
+
+def _stripSuffixes(fname):
+    # removes the compression and .npz suffix
+    for suffix in compressedSuffixes:
+        if fname.endswith(".npz" + suffix):
+            return fname[:-len(".npz" + suffix)]
+
+    if fname.endswith(".npz"):
+        return fname[:-len(".npz")]
+
+    return fname
+
+#----------------------------------------------------------------------
+
+def sidecarFname(fname, member):
+    # name of the .npy file holding the given member
+    # of the given (possibly compressed) .npz file, e.g.
+    # weights-labels-test.weight.npy for weights-labels-test.npz.bz2
+    return _stripSuffixes(fname) + "." + member + ".npy"
+
+#----------------------------------------------------------------------
+
+class NpzData:
+    """ dict like access to the arrays in a (possibly compressed) .npz file.
+
+        Arrays are taken from .npy sidecar files (see sidecarFname)
+        if present, memory mapped from uncompressed .npz files and
+        otherwise decompressed once on first access. Memory mapped
+        arrays are read only and share the page cache with other
+        processes reading the same file.
+    """
+
+    def __init__(self, fname, maxNumThreads = None, mmap = True):
+        self.fname = fname
+        self.maxNumThreads = maxNumThreads
+        self.mmap = mmap
+
+        # name to array of the members of the .npz file
+        self.members = None
+
+        if not fname.endswith(compressedSuffixes):
+            # cheap, reads only the zip directory and
+            # array headers when memory mapping
+            self.__loadMembers()
+
+    #----------------------------------------
+
+    def __loadMembers(self):
+        if self.members is not None:
+            return self.members
+
+        if self.fname.endswith(compressedSuffixes):
+            self.members = _parseNpzBuffer(_readDecompressed(self.fname, self.maxNumThreads))
+        elif self.mmap:
+            self.members = _mapNpzMembers(self.fname)
+        else:
+            self.members = dict(np.load(self.fname).items())
+
+        return self.members
+
+    #----------------------------------------
+
+    def __getitem__(self, name):
+        if self.members is not None and name in self.members:
+            return self.members[name]
+
+        sidecar = sidecarFname(self.fname, name)
+
+        if os.path.exists(sidecar):
+            if self.mmap:
+                return np.load(sidecar, mmap_mode = 'r')
+            else:
+                return np.load(sidecar)
+
+        return self.__loadMembers()[name]
+
+    #----------------------------------------
+
+    def keys(self):
+        return self.__loadMembers().keys()
+
+    def hasMember(self, name):
+        # like 'name in self' but only decompresses the file
+        # if there is neither a sidecar file nor a list of the
+        # members (read from the zip directory for
+        # uncompressed files)
+        if self.members is not None:
+            return name in self.members
+
+        if os.path.exists(sidecarFname(self.fname, name)):
+            return True
+
+        return name in self.__loadMembers()
+
+    def items(self):
+        return [ (key, self[key]) for key in self.keys() ]
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+#----------------------------------------------------------------------
+
+def loadNpz(fname, maxNumThreads = None, mmap = True):
+    # gives access to the arrays of a .npz file which may be compressed
+    # (see compressedSuffixes and NpzData)
+    #
+    # @return a dict like object of name to array
+
+    return NpzData(fname, maxNumThreads = maxNumThreads, mmap = mmap)
+
+#----------------------------------------------------------------------
+
+def extractSidecars(fname, members = None):
+    # writes the given members (all if None) of the given
+    # .npz file to .npy sidecar files which are then
+    # memory mapped when reading
+    #
+    # @return the list of files written
+
+    data = NpzData(fname, mmap = False)
+
+    if members is None:
+        members = data.keys()
+
+    result = []
+
+    for member in members:
+        outputFname = sidecarFname(fname, member)
+        tmpFname = outputFname + ".tmp%d" % os.getpid()
+
+        fout = open(tmpFname, "wb")
+        np.save(fout, data[member])
+        fout.close()
+
+        os.rename(tmpFname, outputFname)
+        result.append(outputFname)
+
+    return result
+
+#----------------------------------------------------------------------
+
+def compressFile(fname, codec = 'bz2', level = 9, blockSize = 8 * 1024 * 1024,
+                 maxNumThreads = None, removeOriginal = True):
+    # compresses the given file with the given codec (see codecSuffixes)
+    # into fname + suffix. The output is first written to a temporary file
+    # which is then renamed so that readers never see a partially
+    # written file. The modification time of the original file is kept.
+    #
+    # @return the name of the compressed file
+
+    if not codec in codecSuffixes:
+        raise Exception("unsupported codec '%s', supported are %s" % (codec, ", ".join(sorted(codecSuffixes.keys()))))
+
+    if codec == 'none':
+        return fname
+
+    fin = open(fname, "rb")
+    data = fin.read()
+    fin.close()
+
+    if codec == 'bz2':
+        pieces = _compressBz2(data, level, blockSize, maxNumThreads)
+    elif codec == 'xz':
+        pieces = [ _importLzma().compress(data, preset = level) ]
+    elif codec == 'gz':
+        import zlib
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        pieces = [ compressor.compress(data), compressor.flush() ]
+
+    del data
+
+    outputFname = fname + codecSuffixes[codec]
+    tmpFname = outputFname + ".tmp%d" % os.getpid()
+
+    fout = open(tmpFname, "wb")
+    for piece in pieces:
+        fout.write(piece)
+    fout.close()
+
+    modTime = os.path.getmtime(fname)
+    os.utime(tmpFname, (modTime, modTime))
+
+    os.rename(tmpFname, outputFname)
+
+    if removeOriginal:
+        os.unlink(fname)
+
+    return outputFname
+
+class _CompressHelper:
+    # compresses one file (on a worker) and reports
+    # the sizes and the time taken
+
+    def __init__(self, codec, level, maxNumThreads, maxBytesPerSecond):
+        # @param maxBytesPerSecond is this worker's share of the
+        #   I/O budget (None for no limit)
+        self.codec = codec
+        self.level = level
+        self.maxNumThreads = maxNumThreads
+        self.maxBytesPerSecond = maxBytesPerSecond
+
+    def __call__(self, fname):
+        import time
+
+        startTime = time.time()
+
+        try:
+            inputSize = os.path.getsize(fname)
+
+            outputFname = compressFile(fname, codec = self.codec, level = self.level,
+                                       maxNumThreads = self.maxNumThreads)
+
+            outputSize = os.path.getsize(outputFname)
+
+        except Exception, ex:
+            # do not stop the other files
+            return dict(fname = fname, error = str(ex))
+
+        elapsed = time.time() - startTime
+
+        if self.maxBytesPerSecond:
+            # wait before taking the next file
+            delay = inputSize / float(self.maxBytesPerSecond) - elapsed
+            if delay > 0:
+                time.sleep(delay)
+
+        return dict(fname = fname, outputFname = outputFname,
+                    inputSize = inputSize, outputSize = outputSize,
+                    seconds = elapsed)
+
+#----------------------------------------------------------------------
+
+def compressFiles(fnames, codec = 'bz2', level = 9, numWorkers = None, maxBytesPerSecond = None):
+    # compresses the given files (see compressFile(..)) on a pool
+    # of worker processes, one file per worker at a time
+    #
+    # @param numWorkers is the number of files compressed at the
+    #   same time (None to determine it from the number of CPUs and
+    #   the file sizes, see executors.autoNumWorkers)
+    #
+    # @param maxBytesPerSecond limits the rate at which all
+    #   workers together read the input files (None for no limit)
+    #
+    # @return an iterator over dicts with the keys fname, outputFname,
+    #   inputSize, outputSize and seconds (or fname and error if
+    #   compressing the file failed) in order of completion
+
+    from executors import autoNumWorkers, getExecutor
+
+    if not fnames:
+        return
+
+    if numWorkers is None:
+        numWorkers = autoNumWorkers(fnames)
+
+    numWorkers = max(1, min(numWorkers, len(fnames)))
+
+    if maxBytesPerSecond:
+        maxBytesPerSecond = maxBytesPerSecond / float(numWorkers)
+
+    if numWorkers == 1:
+        # use the threads to compress the blocks of a bzip2 file in parallel
+        executor = getExecutor('serial')
+        helper = _CompressHelper(codec, level, None, maxBytesPerSecond)
+    else:
+        executor = getExecutor('process', numWorkers)
+        helper = _CompressHelper(codec, level, 1, maxBytesPerSecond)
+
+    for index, result in executor.imapUnordered(helper, [ (fname,) for fname in fnames ]):
+        yield result
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser("""
+
+      usage: %prog [options] file.npz[.bz2|.xz|.gz] [ ... ]
+
+      writes the arrays of the given files to .npy files next
+      to them which are then memory mapped when reading
+
+    """
+    )
+
+    parser.add_option("--members",
+                      default = None,
+                      help="comma separated list of arrays to extract (default: all)",
+                      )
+
+    (options, ARGV) = parser.parse_args()
+
+    if options.members is not None:
+        options.members = options.members.split(',')
+
+    for fname in ARGV:
+        for outputFname in extractSidecars(fname, options.members):
+            print "wrote",outputFname
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+# runs one of the plotting scripts (plotROCs.py, plotNNoutput.py,
+# plotRMSEs.py) in plotDaemon.py if it is running and directly
+# otherwise. Takes the same arguments, prints the same output
+# and returns the same exit code as the script itself.
+#
+# plots which are shown interactively (i.e. without --save-plots)
+# are always made by running the script directly.
+
+import sys
+
+import plotDaemon
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print >> sys.stderr,"usage: plotClient.py script [ script options and arguments ]"
+        sys.exit(1)
+
+    sys.exit(plotDaemon.runScript(sys.argv[1], sys.argv[2:]))
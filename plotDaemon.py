@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+
+# optional long lived server which keeps the modules needed for
+# plotting (pylab, sklearn, scipy) imported and recently used
+# result directories (ResultDirData and ResultDirRocs objects) loaded.
+#
+# Jobs (invocations of one of the plotting scripts) are sent
+# by plotClient.py over a local Unix socket. Each job runs in a forked
+# copy of the server, i.e. it starts with everything already imported
+# and loaded, and its output and exit code are sent back to the client.
+#
+# usage:
+#
+#   ./plotDaemon.py &
+#   ./plotClient.py plotROCs.py --save-plots results-directory
+
+import os, sys, socket, json, errno, select, signal, threading, Queue
+
+#----------------------------------------------------------------------
+
+# scripts which can be run through the daemon
+jobScripts = ('plotROCs.py', 'plotNNoutput.py', 'plotRMSEs.py')
+
+# directory where the scripts are
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+#----------------------------------------------------------------------
+
+def defaultSocketFname():
+    # @return the name of the socket the daemon listens on
+    # (can be set with the PLOTDAEMON_SOCKET environment variable)
+
+    fname = os.environ.get('PLOTDAEMON_SOCKET', None)
+
+    if fname:
+        return fname
+
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), "plotDaemon-%d.sock" % os.getuid())
+
+#----------------------------------------------------------------------
+# protocol: a sequence of frames, each consisting of
+# a one character channel, the length of the data
+# as eight hex digits and the data.
+#
+#  client to daemon: 'j' with the job (JSON encoded)
+#  daemon to client: 'o' standard output, 'e' standard error
+#                    and finally 'x' with the exit code
+#----------------------------------------------------------------------
+
+def sendFrame(sock, channel, data):
+    sock.sendall("%s%08x" % (channel, len(data)) + data)
+
+#----------------------------------------------------------------------
+
+def recvFrame(fin):
+    # @param fin is a file object made from the socket
+    # @return (channel, data) or None at the end of the stream
+
+    header = fin.read(9)
+    if len(header) < 9:
+        return None
+
+    data = fin.read(int(header[1:], 16))
+
+    return header[0], data
+
+#----------------------------------------------------------------------
+# client side
+#----------------------------------------------------------------------
+
+def connect(socketFname = None):
+    # @return a socket connected to the daemon or None
+    # if the daemon is not running
+
+    if socketFname is None:
+        socketFname = defaultSocketFname()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socketFname)
+    except socket.error:
+        sock.close()
+        return None
+
+    return sock
+
+#----------------------------------------------------------------------
+
+def runRemote(sock, script, args):
+    # sends the job to the daemon and copies its output
+    # to our standard output and error
+    #
+    # @return the exit code of the job
+
+    job = dict(script = script,
+               args = args,
+               cwd = os.getcwd(),
+               env = dict(os.environ))
+
+    sendFrame(sock, 'j', json.dumps(job))
+
+    fin = sock.makefile('rb')
+
+    outputs = dict(o = sys.stdout, e = sys.stderr)
+
+    while True:
+        frame = recvFrame(fin)
+
+        if frame is None:
+            print >> sys.stderr,"plotDaemon.py terminated before the job completed"
+            return 1
+
+        channel, data = frame
+
+        if channel == 'x':
+            return int(data)
+
+        outputs[channel].write(data)
+        outputs[channel].flush()
+
+#----------------------------------------------------------------------
+
+def runScript(script, args, socketFname = None):
+    # runs the given plotting script in the daemon if it is running
+    # and otherwise directly (replacing the current process)
+    #
+    # @return the exit code of the script
+
+    script = os.path.basename(script)
+
+    if not script in jobScripts:
+        print >> sys.stderr,"unsupported script '%s', supported are %s" % (script, ", ".join(jobScripts))
+        return 1
+
+    # plots shown interactively need the display
+    # of the calling process
+    if '--save-plots' in args:
+        sock = connect(socketFname)
+
+        if sock is not None:
+            try:
+                return runRemote(sock, script, args)
+            finally:
+                sock.close()
+
+    scriptPath = os.path.join(scriptDir, script)
+    os.execv(sys.executable, [ sys.executable, scriptPath ] + list(args))
+
+#----------------------------------------------------------------------
+# daemon side
+#----------------------------------------------------------------------
+
+def preloadModules():
+    # imports the modules the jobs need (this is what
+    # takes most of the time when running the scripts directly)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import numpy, pylab
+
+    for moduleName in ('sklearn.metrics', 'scipy.stats', 'scipy.interpolate',
+                       'plotROCs', 'plotNNoutput', 'plotRMSEs', 'plotAUCcorr',
+                       'ResultDirRocs'):
+        try:
+            __import__(moduleName)
+        except ImportError, ex:
+            print >> sys.stderr,"WARNING: could not import %s: %s" % (moduleName, str(ex))
+
+#----------------------------------------------------------------------
+
+# held by the warm up threads while they create or look up the
+# result directory objects and by the main thread while forking
+# (such that the jobs never see these half way updated)
+_stateLock = threading.Lock()
+
+#----------------------------------------------------------------------
+
+def _warmPlotROCs(cwd, args):
+    # loads the result directories given on the command line
+    # of plotROCs.py such that they are reused by this job
+    # and following ones
+    import plotROCs
+
+    options, ARGV = plotROCs.parseOptions(args)
+
+    inputDirs = list(ARGV)
+    if options.refdir is not None:
+        inputDirs.append(options.refdir)
+
+    resultDirRocsList = []
+
+    with _stateLock:
+        # the directories are given relative to the working
+        # directory of the job (shared by all warm up threads)
+        os.chdir(cwd)
+
+        for inputDir in inputDirs:
+            resultDirRocsList.append(plotROCs.makeResultDirRocs(inputDir, options))
+
+    # read the weights and labels (this loads all arrays of
+    # the directory) such that the forked jobs inherit them
+    for resultDirRocs in resultDirRocsList:
+        resultDirRocs.resultDirData.getLabels(False)
+
+# functions run in the daemon itself (on a separate thread) before
+# forking for a job, by script name. They are called with the
+# working directory and the command line arguments of the job.
+warmUpFunctions = {
+    'plotROCs.py': _warmPlotROCs,
+    }
+
+#----------------------------------------------------------------------
+
+def _runJob(job):
+    # runs the script of the given job in the current process
+    # as if it was run from the command line
+    #
+    # @return the exit code
+
+    import runpy, traceback
+
+    os.chdir(job['cwd'])
+    os.environ.clear()
+    os.environ.update(job['env'])
+
+    scriptPath = os.path.join(scriptDir, job['script'])
+    sys.argv = [ scriptPath ] + job['args']
+
+    try:
+        runpy.run_path(scriptPath, run_name = '__main__')
+        exitCode = 0
+
+    except SystemExit, ex:
+        if ex.code is None:
+            exitCode = 0
+        elif isinstance(ex.code, int):
+            exitCode = ex.code
+        else:
+            print >> sys.stderr, ex.code
+            exitCode = 1
+
+    except:
+        traceback.print_exc()
+        exitCode = 1
+
+    # e.g. removes temporary files (the handlers registered
+    # in the daemon itself check the process id)
+    exitfunc = getattr(sys, 'exitfunc', None)
+    if exitfunc is not None:
+        exitfunc()
+
+    return exitCode
+
+#----------------------------------------------------------------------
+
+def _handleConnection(conn):
+    # runs in a process forked from the daemon: reads the job, runs it
+    # in a further process with the standard output and error
+    # connected to pipes and forwards these to the client
+
+    job = recvFrame(conn.makefile('rb'))
+
+    if job is None or job[0] != 'j':
+        return
+
+    job = json.loads(job[1])
+
+    # json returns unicode strings
+    job['script'] = str(job['script'])
+    job['args'] = [ str(arg) for arg in job['args'] ]
+    job['cwd'] = str(job['cwd'])
+    job['env'] = dict((str(key), str(value)) for key, value in job['env'].items())
+
+    if not job['script'] in jobScripts:
+        sendFrame(conn, 'e', "unsupported script '%s'\n" % job['script'])
+        sendFrame(conn, 'x', "1")
+        return
+
+    outRead, outWrite = os.pipe()
+    errRead, errWrite = os.pipe()
+
+    pid = os.fork()
+
+    if pid == 0:
+        # job process
+        exitCode = 1
+        try:
+            conn.close()
+            os.close(outRead)
+            os.close(errRead)
+
+            devNull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devNull, 0)
+            os.dup2(outWrite, 1)
+            os.dup2(errWrite, 2)
+
+            # line buffered as on a terminal
+            sys.stdout = os.fdopen(1, 'w', 1)
+            sys.stderr = os.fdopen(2, 'w', 0)
+
+            exitCode = _runJob(job)
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exitCode)
+
+    os.close(outWrite)
+    os.close(errWrite)
+
+    channels = { outRead: 'o', errRead: 'e' }
+
+    try:
+        while channels:
+            readable = select.select(channels.keys() + [ conn ], [], [])[0]
+
+            if conn in readable and not conn.recv(1):
+                # the client went away
+                os.kill(pid, signal.SIGTERM)
+                break
+
+            for fd in readable:
+                if fd is conn:
+                    continue
+
+                data = os.read(fd, 65536)
+
+                if data:
+                    sendFrame(conn, channels[fd], data)
+                else:
+                    del channels[fd]
+
+    except socket.error:
+        # the client went away
+        os.kill(pid, signal.SIGTERM)
+
+    status = os.waitpid(pid, 0)[1]
+
+    if os.WIFSIGNALED(status):
+        exitCode = 128 + os.WTERMSIG(status)
+    else:
+        exitCode = os.WEXITSTATUS(status)
+
+    try:
+        sendFrame(conn, 'x', str(exitCode))
+    except socket.error:
+        pass
+
+#----------------------------------------------------------------------
+
+def _reapChildren(children, block = False):
+    # removes the finished job handling processes from the set of children
+
+    while children:
+        try:
+            pid = os.waitpid(-1, 0 if block else os.WNOHANG)[0]
+        except OSError, ex:
+            if ex.errno != errno.EINTR:
+                raise
+            continue
+
+        if pid == 0:
+            break
+
+        children.discard(pid)
+
+        if block:
+            break
+
+#----------------------------------------------------------------------
+
+def _warmUp(conn):
+    # peeks at the job sent over the given connection and loads
+    # the result directories it needs into the daemon itself (such
+    # that they are inherited by this and later jobs)
+
+    job = None
+
+    # do not wait forever for clients which do not send anything
+    conn.settimeout(5)
+    try:
+        data = conn.recv(65536, socket.MSG_PEEK)
+    except socket.error:
+        data = ""
+    conn.settimeout(None)
+
+    if data.startswith('j'):
+        try:
+            job = json.loads(data[9:])
+        except ValueError:
+            # incomplete, the job will still be run
+            pass
+
+    if job is None or not job.get('script') in warmUpFunctions:
+        return
+
+    try:
+        warmUpFunctions[job['script']](str(job['cwd']), [ str(arg) for arg in job['args'] ])
+    except (Exception, SystemExit), ex:
+        # the job itself will report the problem to the client
+        print >> sys.stderr,"WARNING: failed to preload data for job:",str(ex)
+
+#----------------------------------------------------------------------
+
+def _warmUpThread(conn, readyConns, wakeupFd):
+    # runs the warm up for the given connection (outside the
+    # accept loop such that other clients are not blocked
+    # by slow directories) and then passes the connection
+    # back to the main thread for forking the job
+    try:
+        _warmUp(conn)
+    finally:
+        readyConns.put(conn)
+        os.write(wakeupFd, 'w')
+
+#----------------------------------------------------------------------
+
+def _forkHandler(server, conn, otherFds = ()):
+    # handles the given connection in a child process
+    # @return the process id of the child
+
+    with _stateLock:
+        pid = os.fork()
+
+    if pid == 0:
+        exitCode = 0
+        try:
+            server.close()
+            for fd in otherFds:
+                os.close(fd)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _handleConnection(conn)
+        except:
+            import traceback
+            traceback.print_exc()
+            exitCode = 1
+        finally:
+            os._exit(exitCode)
+
+    return pid
+
+#----------------------------------------------------------------------
+
+def serve(socketFname, maxJobs):
+
+    if os.path.exists(socketFname):
+        sock = connect(socketFname)
+        if sock is not None:
+            sock.close()
+            print >> sys.stderr,"another daemon is already listening on",socketFname
+            sys.exit(1)
+
+        # left over from a daemon which did not terminate normally
+        os.unlink(socketFname)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # only the current user may connect
+    oldUmask = os.umask(0077)
+    server.bind(socketFname)
+    os.umask(oldUmask)
+
+    server.listen(16)
+
+    # make sure the socket is removed on kill
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print "listening on",socketFname
+    sys.stdout.flush()
+
+    # job handling processes
+    children = set()
+
+    # connections for which the warm up is done
+    readyConns = Queue.Queue()
+
+    # written to by the warm up threads to wake up the main loop
+    wakeupRead, wakeupWrite = os.pipe()
+
+    try:
+        while True:
+            if len(children) < maxJobs and not readyConns.empty():
+                conn = readyConns.get()
+                try:
+                    children.add(_forkHandler(server, conn, (wakeupRead, wakeupWrite)))
+                finally:
+                    conn.close()
+                continue
+
+            if len(children) >= maxJobs:
+                _reapChildren(children, block = True)
+                continue
+
+            # wake up regularly to reap finished children
+            readable = select.select([ server, wakeupRead ], [], [], 1.0)[0]
+
+            _reapChildren(children)
+
+            if wakeupRead in readable:
+                os.read(wakeupRead, 4096)
+
+            if server in readable:
+                thread = threading.Thread(target = _warmUpThread,
+                                          args = (server.accept()[0], readyConns, wakeupWrite))
+                thread.daemon = True
+                thread.start()
+
+    finally:
+        # (forked processes never get here)
+        os.unlink(socketFname)
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser("""
+
+      usage: %prog [options]
+
+      keeps the plotting modules and recently used result directories
+      in memory and runs the jobs sent by plotClient.py
+
+    """
+    )
+
+    parser.add_option("--socket",
+                      dest = 'socketFname',
+                      default = None,
+                      help="name of the Unix socket to listen on (default: $PLOTDAEMON_SOCKET or a per user file in the temporary directory)",
+                      )
+
+    parser.add_option("--max-jobs",
+                      dest = 'maxJobs',
+                      type = int,
+                      default = 4,
+                      help="maximum number of jobs running at the same time",
+                      )
+
+    parser.add_option("--max-dirs",
+                      dest = 'maxDirs',
+                      type = int,
+                      default = 16,
+                      help="maximum number of result directories to keep in memory",
+                      )
+
+    (options, ARGV) = parser.parse_args()
+
+    if ARGV:
+        parser.error("no positional arguments expected")
+
+    socketFname = options.socketFname
+    if socketFname is None:
+        socketFname = defaultSocketFname()
+
+    preloadModules()
+
+    import ResultDirData, ResultDirRocs
+    ResultDirData.maxInstances = options.maxDirs
+    ResultDirRocs.maxInstances = options.maxDirs
+
+    serve(socketFname, options.maxJobs)
@@ -4,15 +4,16 @@ import sys, os
 import numpy as np
 
 from plotROCutils import addTimestamp, addDirname, addNumEvents, readDescription
+from npzIO import findNpzFile, loadNpz
 
 #----------------------------------------------------------------------
 def findHighestEpoch(outputDir, sample):
     import glob, re
-    fnames = glob.glob(os.path.join(outputDir, "roc-data-%s-*.npz" % sample))
+    fnames = glob.glob(os.path.join(outputDir, "roc-data-%s-*.npz*" % sample))
     
     highest = -1
     for fname in fnames:
-        mo = re.match("roc-data-" + sample + "-(\d+).npz$", os.path.basename(fname))
+        mo = re.match("roc-data-" + sample + "-(\d+).npz(\.bz2|\.xz|\.gz)?$", os.path.basename(fname))
         if mo:
             # note that 'mva' can also appear where otherwise the epoch number
             # appears
@@ -24,80 +25,286 @@ def findHighestEpoch(outputDir, sample):
         return highest
 
 #----------------------------------------------------------------------
-# main
+
+def readWeightsLabels(outputDir, sample):
+    # @return weights, labels of the given sample. For the training
+    # sample, these are the weights before any reweighting, i.e. the
+    # same as for the ROC curves and plotNNoutputEvolution(..)
+    # (see ResultDirData.getWeights)
+
+    weightsLabels = loadNpz(findNpzFile(os.path.join(outputDir, "weights-labels-" + sample + ".npz")))
+
+    if sample == 'train':
+        weightVarName = "origTrainWeights"
+    else:
+        # test sample
+        weightVarName = "weight"
+
+    return weightsLabels[weightVarName], weightsLabels['label']
+
+#----------------------------------------------------------------------
+
+def plotNNoutput(outputDir, epoch, sample = 'test', savePlots = False):
+    # plots the distribution of the network output for signal
+    # and background for the given epoch (0 for the highest
+    # epoch number found)
+    #
+    # @return the name of the saved plot file (None if not saved)
+
+    if epoch == 0:
+        epoch = findHighestEpoch(outputDir, sample)
+
+    weights, labels = readWeightsLabels(outputDir, sample)
+
+    outputsFile = findNpzFile(os.path.join(outputDir, "roc-data-%s-%04d.npz" % (sample, epoch)))
+    outputsData = loadNpz(outputsFile)
+
+    output = outputsData['output']
+
+
+    import pylab
+    pylab.figure()
+    pylab.hist(output[labels == 1], weights = weights[labels == 1], bins = 100, label='signal', histtype = 'step')
+    pylab.hist(output[labels == 0], weights = weights[labels == 0], bins = 100, label='background', histtype = 'step')
+    pylab.legend()
+    pylab.xlabel('NN output')
+    pylab.title(sample + " epoch %d" % epoch)
+    pylab.grid()
+
+    addTimestamp(outputDir)
+    addDirname(outputDir)
+    # addNumEvents(numEvents.get('train', None), numEvents.get('test', None))
+
+    if savePlots:
+        outputFname = os.path.join(outputDir, "nn-output-" + sample + "-%04d.pdf" % epoch)
+        pylab.savefig(outputFname)
+        print >> sys.stderr,"wrote plots to",outputFname
+        pylab.close()
+        return outputFname
+    else:
+        return None
+
 #----------------------------------------------------------------------
 
-from optparse import OptionParser
-parser = OptionParser("""
+def plotNNoutputEvolution(outputDir, sample = 'test', savePlots = False,
+                          minEpoch = None, maxEpoch = None,
+                          numBins = 100, outputRange = (0, 1),
+                          numOverlayEpochs = 5,
+                          executorBackend = 'process'):
+    # plots the evolution of the distributions of the network output
+    # for signal and background over all epochs (or the given
+    # range of epochs): a heatmap of the distributions (normalized
+    # per epoch) versus the epoch and an overlay of the distributions
+    # of a few epochs
+    #
+    # the histograms of all epochs are calculated in parallel and
+    # kept next to the output files so that only new
+    # epochs are read when plotting again
+    #
+    # @return the list of names of the saved plot files
+
+    from ResultDirData import getResultDirData
+    from ResultDirRocs import getResultDirRocs, getOutputHistogramsMulti
+
+    isTrain = sample == 'train'
+
+    resultDirRocs = getResultDirRocs(getResultDirData(outputDir, False),
+                                     minEpoch = minEpoch,
+                                     maxEpoch = maxEpoch,
+                                     executorBackend = executorBackend)
+
+    # including epochs whose output files were deleted but
+    # whose histograms were kept (see cleanResults.py --histograms)
+    epochs = sorted(resultDirRocs.rocFnames[sample].keys() +
+                    resultDirRocs.getHistogramOnlyEpochs(isTrain, numBins, outputRange))
+
+    if not epochs:
+        print >> sys.stderr,"no %s output files found in %s" % (sample, outputDir)
+        return []
+
+    histograms = getOutputHistogramsMulti([ (resultDirRocs, epoch, isTrain) for epoch in epochs ],
+                                          numBins = numBins, outputRange = outputRange)
 
-  usage: %prog [options] result-directory epoch
+    edges = histograms[0][0]
 
-  use epoch = 0 for highest epoch number found
+    import pylab
 
-"""
-)
+    outputFnames = []
 
-parser.add_option("--save-plots",
-                  dest = 'savePlots',
-                  default = False,
-                  action="store_true",
-                  help="save plots in input directory",
-                  )
+    #----------
+    # heatmap: one row per epoch
+    #----------
+    pylab.figure(figsize = (12, 5))
 
-parser.add_option("--sample",
-                  dest = 'sample',
-                  default = "test",
-                  choices = [ "test", "train" ],
-                  help="sample to use (train or test)",
-                  )
+    for panel, (label, column) in enumerate((('signal', 1), ('background', 2))):
+        counts = np.array([ histogram[column] for histogram in histograms ], dtype = 'float64')
 
+        # normalize each epoch such that the shape
+        # can be compared across epochs
+        sums = counts.sum(axis = 1)
+        counts /= np.where(sums > 0, sums, 1)[:, np.newaxis]
 
-(options, ARGV) = parser.parse_args()
-assert len(ARGV) == 2, "usage: plotNNoutput.py result-directory epoch"
+        pylab.subplot(1, 2, panel + 1)
 
-outputDir, epoch = ARGV
-epoch = int(epoch)
-if epoch == 0:
-    epoch = findHighestEpoch(outputDir, options.sample)
+        # epochs may have gaps, give each epoch a row of height one
+        epochEdges = np.r_[epochs, epochs[-1] + 1] - 0.5
+        pylab.pcolormesh(edges, epochEdges, counts, cmap = 'viridis')
+        pylab.colorbar(label = 'fraction of events')
 
+        pylab.xlabel('NN output')
+        pylab.ylabel('epoch')
+        pylab.title(label)
 
-#----------------------------------------
+        if panel == 0:
+            addTimestamp(outputDir)
+        else:
+            addDirname(outputDir)
 
+    pylab.suptitle(sample)
 
-weightsLabelsFile = os.path.join(outputDir, "weights-labels-" + options.sample + ".npz")
+    if savePlots:
+        outputFname = os.path.join(outputDir, "nn-output-" + sample + "-evolution.pdf")
+        pylab.savefig(outputFname)
+        print >> sys.stderr,"wrote plots to",outputFname
+        pylab.close()
+        outputFnames.append(outputFname)
 
-weightsLabels = np.load(weightsLabelsFile)
+    #----------
+    # overlay of a few epochs (evenly spaced,
+    # always including the last one)
+    #----------
+    pylab.figure()
 
-if options.sample == 'train':
-    weightVarName = "trainWeight"
-else:
-    # test sample
-    weightVarName = "weight"
+    indices = sorted(set(np.linspace(0, len(epochs) - 1, num = min(numOverlayEpochs, len(epochs))).round().astype(int)))
 
-weights = weightsLabels[weightVarName]
-labels  = weightsLabels['label']
+    for colorIndex, index in enumerate(indices):
+        color = pylab.cm.viridis(colorIndex / float(max(1, len(indices) - 1)))
 
-outputsFile = os.path.join(outputDir, "roc-data-%s-%04d.npz" % (options.sample, epoch))
-outputsData = np.load(outputsFile)
+        edges, sigCounts, bkgCounts = histograms[index]
 
-output = outputsData['output']
+        pylab.step(edges, np.r_[sigCounts, sigCounts[-1]], where = 'post', color = color,
+                   label = 'epoch %d' % epochs[index])
+        pylab.step(edges, np.r_[bkgCounts, bkgCounts[-1]], where = 'post', color = color, linestyle = '--')
 
+    pylab.legend(title = 'solid: signal, dashed: background')
+    pylab.xlabel('NN output')
+    pylab.title(sample)
+    pylab.grid()
+
+    addTimestamp(outputDir)
+    addDirname(outputDir)
+
+    if savePlots:
+        outputFname = os.path.join(outputDir, "nn-output-" + sample + "-overlay.pdf")
+        pylab.savefig(outputFname)
+        print >> sys.stderr,"wrote plots to",outputFname
+        pylab.close()
+        outputFnames.append(outputFname)
+
+    return outputFnames
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser("""
+
+      usage: %prog [options] result-directory epoch
+             %prog [options] --all-epochs result-directory
+
+      use epoch = 0 for highest epoch number found
+
+    """
+    )
+
+    parser.add_option("--save-plots",
+                      dest = 'savePlots',
+                      default = False,
+                      action="store_true",
+                      help="save plots in input directory",
+                      )
+
+    parser.add_option("--sample",
+                      dest = 'sample',
+                      default = "test",
+                      choices = [ "test", "train" ],
+                      help="sample to use (train or test)",
+                      )
+
+
+    parser.add_option("--all-epochs",
+                      dest = 'allEpochs',
+                      default = False,
+                      action="store_true",
+                      help="plot the evolution of the output distributions over all epochs (a heatmap and an overlay of some epochs) instead of a single epoch",
+                      )
+
+    parser.add_option("--min-epoch",
+                      dest = 'minEpoch',
+                      type = int,
+                      default = None,
+                      help="first epoch to plot with --all-epochs",
+                      )
+
+    parser.add_option("--max-epoch",
+                      dest = 'maxEpoch',
+                      type = int,
+                      default = None,
+                      help="last epoch to plot with --all-epochs",
+                      )
+
+    parser.add_option("--bins",
+                      dest = 'numBins',
+                      type = int,
+                      default = 100,
+                      help="number of bins of the histograms with --all-epochs (default: %default)",
+                      )
+
+    parser.add_option("--range",
+                      dest = 'outputRange',
+                      default = "0,1",
+                      help="range of the histograms with --all-epochs, outputs outside are counted in the first and last bin (default: %default)",
+                      )
+
+    parser.add_option("--overlay-epochs",
+                      dest = 'numOverlayEpochs',
+                      type = int,
+                      default = 5,
+                      help="number of epochs shown in the overlay plot with --all-epochs (default: %default)",
+                      )
+
+    parser.add_option("--executor",
+                      dest = 'executorBackend',
+                      default = 'process',
+                      choices = [ 'serial', 'thread', 'process' ],
+                      help="how to run the calculation of the histograms of the individual epochs: serial, thread or process",
+                      )
+
+    (options, ARGV) = parser.parse_args()
+
+    if options.allEpochs:
+        assert len(ARGV) == 1, "usage: plotNNoutput.py --all-epochs result-directory"
+
+        outputRange = tuple(float(value) for value in options.outputRange.split(','))
+        assert len(outputRange) == 2 and outputRange[0] < outputRange[1], "--range must be low,high"
+
+        plotNNoutputEvolution(ARGV[0], options.sample, options.savePlots,
+                              minEpoch = options.minEpoch,
+                              maxEpoch = options.maxEpoch,
+                              numBins = options.numBins,
+                              outputRange = outputRange,
+                              numOverlayEpochs = options.numOverlayEpochs,
+                              executorBackend = options.executorBackend)
+    else:
+        assert len(ARGV) == 2, "usage: plotNNoutput.py result-directory epoch"
 
-import pylab
-pylab.hist(output[labels == 1], weights = weights[labels == 1], bins = 100, label='signal', histtype = 'step')
-pylab.hist(output[labels == 0], weights = weights[labels == 0], bins = 100, label='background', histtype = 'step')
-pylab.legend()
-pylab.xlabel('NN output')
-pylab.title(options.sample + " epoch %d" % epoch)
-pylab.grid()
+        outputDir, epoch = ARGV
+        epoch = int(epoch)
 
-addTimestamp(outputDir)
-addDirname(outputDir)
-# addNumEvents(numEvents.get('train', None), numEvents.get('test', None))
+        plotNNoutput(outputDir, epoch, options.sample, options.savePlots)
 
-if options.savePlots:
-    outputFname = os.path.join(outputDir, "nn-output-" + options.sample + "-%04d.pdf" % epoch)
-    pylab.savefig(outputFname)
-    print >> sys.stderr,"wrote plots to",outputFname
-else:
-    pylab.show()
+    if not options.savePlots:
+        import pylab
+        pylab.show()
@@ -10,7 +10,7 @@ import sys, os
 import glob, re
 import numpy as np
 
-from plotROCutils import addDirname, addNumEvents, readDescription
+from plotROCutils import addDirname, addNumEvents, readDescription, defaultDecimationTolerance
 import plotROCutils
 
 officialPhotonIdLabel = 'official photon id'
@@ -18,130 +18,145 @@ officialPhotonIdLabel = 'official photon id'
 # benchmark for official photon id cut
 officialPhotonIdCut = 0.23
 
-from ResultDirData import ResultDirData
+from ResultDirData import ResultDirData, getResultDirData
+
+# default file formats (suffixes) of saved plots
+defaultFormats = ('png', 'pdf', 'svg')
+
+#----------------------------------------------------------------------
+
+def saveFigure(outputFnameBase, formats = defaultFormats):
+    # saves the current figure in each of the given formats
+    for suffix in formats:
+        outputFname = outputFnameBase + "." + suffix
+        pylab.savefig(outputFname)
+        print "saved figure to",outputFname
 
 #----------------------------------------------------------------------
 
-def drawSingleROCcurve(resultDirRocs, epoch, isTrain, label, color, lineStyle, linewidth, label_args = {}):
+def drawSingleROCcurve(resultDirRocs, epoch, isTrain, label, color, lineStyle, linewidth, label_args = {},
+                       bootstrapReplicas = 0,
+                       xmax = None,
+                       decimationTolerance = defaultDecimationTolerance):
+    # @param bootstrapReplicas if > 0, the number of bootstrap replicas
+    #   for drawing a band around the curve
+    #
+    # @param xmax is the upper end of the visible false positive rates
+    #   (None for 1) and decimationTolerance the maximum deviation
+    #   in pixels of the drawn curve from the full one
+    #   (see plotROCutils.decimateForPlot)
+    #
+    # @return the full curve (not decimated)
 
     baseDir = os.path.basename(os.path.normpath(resultDirRocs.getInputDir()))
 
     auc, numEvents, fpr, tpr, thresholds = resultDirRocs.getFullROCcurve(epoch, isTrain)
 
+    if bootstrapReplicas > 0:
+        aucStd, bandFpr, tprLow, tprMedian, tprHigh = resultDirRocs.getBootstrapBand(epoch, isTrain, bootstrapReplicas)
+        pylab.fill_between(bandFpr, tprLow, tprHigh, color = color, alpha = 0.3, linewidth = 0)
+
+    if xmax is None:
+        xmax = 1
+    plotFpr, plotTpr = plotROCutils.decimateForPlot(fpr, tpr, 0, xmax, decimationTolerance)
+
     # TODO: we could add the area to the legend
-    pylab.plot(fpr, tpr, lineStyle, color = color, linewidth = linewidth, 
+    pylab.plot(plotFpr, plotTpr, lineStyle, color = color, linewidth = linewidth, 
                label = label.format(auc = auc, baseDir = baseDir, epoch = epoch, **label_args))
 
     return fpr, tpr, numEvents
 
 #----------------------------------------------------------------------
 
-def drawBenchmarkPoints(resultDirRocs, epoch, isTrain, color, benchmarkPoints):
+def drawBenchmarkPoints(resultDirRocs, epoch, isTrain, color, benchmarkPoints,
+                        refResultDirRocs = None, refEpoch = None):
     # draw benchmark points on single roc curves
     # for the reference sample and 
     # 
     # @param benchmarkPoints is a list of cuts on the BDT (official)
     # photon ID
+    #
+    # @param refResultDirRocs if not None, the efficiencies of refEpoch
+    # of this directory at the BDT working points are drawn
+    # instead of the ones of the BDT itself
 
-    auc, numEvents, fpr,    tpr,    thresholds    = resultDirRocs.getFullROCcurve(epoch, isTrain)
-
-    auc, numEvents, fprBDT, tprBDT, thresholdsBDT = resultDirRocs.getFullROCcurve("BDT", isTrain)
-
-    for benchmarkPoint in benchmarkPoints:
-
-            import bisect
-
-            # note that we use only thresholdsBDT to find the indices
-            # then we get the BDT fpr (background efficiency)
-            # and find the corresponding index for our training
-            # (we can't reuse the indices from the BDT training)
-
-            # note that thresholds is in decreasing order hence
-            # the left/right crossing
-            wpIndexRight = bisect.bisect_left(thresholdsBDT[::-1], benchmarkPoint)
-            wpIndexLeft  = bisect.bisect_right(thresholdsBDT[::-1], benchmarkPoint)
-
-            # assume the working point is away from the border
-            wpFPRbdt = 0.5 * (fprBDT[::-1][wpIndexRight] + fprBDT[::-1][wpIndexLeft])
-            wpTPRbdt = 0.5 * (tprBDT[::-1][wpIndexRight] + tprBDT[::-1][wpIndexLeft])
-
-            # now get the TPR corresponding to wpFPRbdt for our training
-            import scipy
-            wpTPR    = scipy.interpolate.interp1d(fpr[::-1], tpr[::-1])(wpFPRbdt)
-
-            # print "thresholds at working point: left=",thresholdsBDT[::-1][wpIndexLeft],"right=",thresholdsBDT[::-1][wpIndexRight], "bg eff=",wpFPRbdt, "sig eff bdt=",wpTPRbdt, "sig eff=",wpTPR
-
-            pylab.plot([wpFPRbdt], [wpTPRbdt], 'o', color = color)
+    candidates = [ (resultDirRocs, epoch) ]
+    if refResultDirRocs is not None:
+        candidates.append((refResultDirRocs, refEpoch))
 
-            xlim = pylab.xlim()
-            textOffset = 0.1 * (xlim[1] - xlim[0])
+    # all working points in one go
+    wpFPRbdt, wpTPRbdt, candidateTPRs = resultDirRocs.getBenchmarkEfficiencies(benchmarkPoints, isTrain, candidates)
 
-            pylab.text(wpFPRbdt + textOffset, wpTPRbdt, '%.1f %%' % (100*wpTPRbdt), va = 'center')
+    xlim = pylab.xlim()
+    textOffset = 0.1 * (xlim[1] - xlim[0])
 
+    if refResultDirRocs is None:
+        # the BDT curve is drawn only when not comparing to a reference directory
+        pointsToDraw = [ wpTPRbdt ] + candidateTPRs
+    else:
+        pointsToDraw = candidateTPRs
 
-            pylab.plot([wpFPRbdt], [wpTPR],    'o', color = color)
-            # pylab.gca().annotate('%.1f%%' % (100*wpTPR),    (wpFPRbdt, wpTPR))
-            pylab.text(wpFPRbdt + textOffset, wpTPR, '%.1f%%' % (100*wpTPR), va = 'center')
+    for wpTPRs in pointsToDraw:
+        pylab.plot(wpFPRbdt, wpTPRs, 'o', color = color)
 
-    
+        for wpFPR, wpTPR in zip(wpFPRbdt, wpTPRs):
+            pylab.text(wpFPR + textOffset, wpTPR, '%.1f%%' % (100*wpTPR), va = 'center')
 
 #----------------------------------------------------------------------
 
-def plotGradientMagnitudes(inputDir, mode):
+def plotGradientMagnitudes(inputDir, mode, decimationTolerance = defaultDecimationTolerance,
+                           quantileLevels = None, executorBackend = 'serial'):
 
     # @param mode can be 
-    #    'stat'   plot the median/mean and error bars
-    #    'detail' plot the actual gradient magnitude values
+    #    'stat'      plot the mean and standard deviation as error bars
+    #    'quantiles' plot bands between the quantiles and the median
+    #    'detail'    plot the actual gradient magnitude values
+    #
+    # @param decimationTolerance maximum deviation in pixels of the
+    #   drawn values from the full ones in 'detail' mode
+    #   (see plotROCutils.decimateMinMax)
+    #
+    # @param quantileLevels are the levels of the quantiles
+    #   in 'quantiles' mode (pairs of levels from the outside
+    #   to the inside make up the bands)
+    #
+    # @param executorBackend is used to calculate missing summaries
+    #   in 'stat' and 'quantiles' mode
     #
     # @return True if something was plotted
 
-    inputFiles = glob.glob(os.path.join(inputDir, "gradient-magnitudes-*.npz"))
-    
-    # maps from epoch number to gradient magnitudes
-    epochToGradientMagnitudes = {}
-
-    # sort by epoch number
-    for inputFname in inputFiles:
+    import gradientSummaries
 
-        basename = os.path.basename(inputFname)
+    if quantileLevels is None:
+        quantileLevels = gradientSummaries.defaultQuantileLevels
 
-        # example names:
-        #  roc-data-test-mva.t7
-        #  roc-data-train-0002.t7
-
-        mo = re.match("gradient-magnitudes-(\d+).npz$", basename)
-        if not mo:
-            print >> sys.stderr,"warning: skipping",inputFname
-            continue
-        epoch = int(mo.group(1))
-        
-        thisData = np.load(inputFname)['gradientMagnitudes']
-
-        assert not epoch in epochToGradientMagnitudes
-
-        epochToGradientMagnitudes[epoch] = thisData
-
-    # end of loop over input files
+    if mode == 'detail':
+        # maps from epoch number to gradient magnitudes file name
+        epochFiles = gradientSummaries.findGradientFiles(inputDir)
+        epochs = sorted(epochFiles.keys())
+    elif mode in ('stat', 'quantiles'):
+        # only the per epoch summaries are needed
+        summaries = gradientSummaries.getGradientSummaries(inputDir, quantileLevels,
+                                                           executorBackend = executorBackend)
+        epochs = sorted(summaries.keys())
+    else:
+        raise Exception("unsupported mode " + mode)
 
-    if not epochToGradientMagnitudes:
+    if not epochs:
         return False
 
     pylab.figure(facecolor='white')
 
-    # median number of gradient evaluations per epoch
-    # (for filling in missing ones)
-    # normally they should all be the same
-    medianLength = np.median(
-        [ len(x) for x in epochToGradientMagnitudes.values() ]
-        )
-
-    epochs = sorted(epochToGradientMagnitudes.keys())
-
-
     if mode == 'detail':
-        # plot epoch by epoch with different colors
+        if decimationTolerance:
+            columnWidth = plotROCutils.decimationColumnWidth(epochs[0], epochs[-1] + 1, decimationTolerance)
+        else:
+            columnWidth = 0
+
+        # plot epoch by epoch with different colors, reading
+        # one file at a time
         for epoch in epochs:
-            yvalues = epochToGradientMagnitudes[epoch]
+            yvalues = gradientSummaries.readGradientMagnitudes(epochFiles[epoch])
 
             # choose x axis normalization such that each epoch
             # corresponds to an interval of one
@@ -149,19 +164,39 @@ def plotGradientMagnitudes(inputDir, mode):
                                   num = len(yvalues),
                                   endpoint = False)
 
-            pylab.plot(xvalues, yvalues)
+            pylab.plot(*plotROCutils.decimateMinMax(xvalues, yvalues, columnWidth))
 
     elif mode == 'stat':
         # plot mean and standard deviations
         xvalues = epochs
 
-        yvalues = [ np.mean(epochToGradientMagnitudes[epoch]) for epoch in epochs ]
-        yerrs   = [ np.std(epochToGradientMagnitudes[epoch]) for epoch in epochs ]
+        yvalues = [ summaries[epoch]['mean'] for epoch in epochs ]
+        yerrs   = [ summaries[epoch]['std'] for epoch in epochs ]
 
         pylab.errorbar(xvalues, yvalues, yerr = yerrs)
 
     else:
-        raise Exception("unsupported mode " + mode)
+        # quantile bands
+        levels = list(summaries[epochs[0]]['quantileLevels'])
+
+        # one row per epoch, one column per quantile level
+        quantiles = np.array([ summaries[epoch]['quantiles'] for epoch in epochs ])
+
+        numBands = len(levels) // 2
+
+        for band in range(numBands):
+            low, high = band, len(levels) - 1 - band
+
+            pylab.fill_between(epochs, quantiles[:, low], quantiles[:, high],
+                               color = 'C0', alpha = 0.6 / numBands * (band + 1), linewidth = 0,
+                               label = '%g%% - %g%%' % (100 * levels[low], 100 * levels[high]))
+
+        if 0.5 in levels:
+            pylab.plot(epochs, quantiles[:, levels.index(0.5)], color = 'C0', label = 'median')
+        else:
+            pylab.plot(epochs, [ summaries[epoch]['mean'] for epoch in epochs ], color = 'C0', label = 'mean')
+
+        pylab.legend(loc = 'upper right')
 
     pylab.xlabel('epoch')
     pylab.ylabel('gradient magnitude')
@@ -173,9 +208,6 @@ def plotGradientMagnitudes(inputDir, mode):
     ax.set_xticks(epochs, minor = True)
     ax.grid(which='minor', alpha=0.2)                                                
 
-
-
-
     return True
 
 #----------------------------------------------------------------------
@@ -185,8 +217,10 @@ def updateHighestTPR(highestTPRs, fpr, tpr, maxfpr):
         return
 
     # find highest TPR for which the FPR is <= maxfpr
-    highestTPR = max([ thisTPR for thisTPR, thisFPR in zip(tpr, fpr) if thisFPR <= maxfpr])
-    highestTPRs.append(highestTPR)
+    # (fpr and tpr are both non-decreasing)
+    index = np.searchsorted(fpr, maxfpr, side = 'right')
+    if index > 0:
+        highestTPRs.append(tpr[index - 1])
 
 #----------------------------------------------------------------------
 def drawLast(resultDirRocs, xmax = None, ignoreTrain = False,
@@ -194,11 +228,17 @@ def drawLast(resultDirRocs, xmax = None, ignoreTrain = False,
              legendLocation = None,
              addTimestamp = True,
              refResultDirRocs = None,             
+             bootstrapReplicas = 0,
+             formats = defaultFormats,
+             decimationTolerance = defaultDecimationTolerance,
              ):
     # plot ROC curve for last epoch only
 
     # @param refResultDirRocs if not None, plot agains this reference data
     # instead of the BDT value
+    #
+    # @param bootstrapReplicas if > 0, draw bootstrap bands
+    # (central 68%) around the curves
 
     hasRef = refResultDirRocs is not None
 
@@ -250,7 +290,9 @@ def drawLast(resultDirRocs, xmax = None, ignoreTrain = False,
 
         # take the last epoch
         if epochNumber != None:
-            fpr, tpr, numEvents[sample] = drawSingleROCcurve(resultDirRocs, epochNumber, isTrain, labelTemplate, color, '-', 2, label_args = dict(sample = sample))
+            fpr, tpr, numEvents[sample] = drawSingleROCcurve(resultDirRocs, epochNumber, isTrain, labelTemplate, color, '-', 2, label_args = dict(sample = sample),
+                                                             bootstrapReplicas = bootstrapReplicas,
+                                                             xmax = xmax, decimationTolerance = decimationTolerance)
             updateHighestTPR(highestTPRs, fpr, tpr, xmax)
 
         #----------
@@ -259,17 +301,25 @@ def drawLast(resultDirRocs, xmax = None, ignoreTrain = False,
 
         if hasRef:
             # plot reference curve for comparison
-            fpr, tpr, numEvents[sample] = drawSingleROCcurve(refResultDirRocs, refEpochNumber, isTrain, labelTemplateRef, color, '--', 2, label_args = dict(sample = sample))
+            fpr, tpr, numEvents[sample] = drawSingleROCcurve(refResultDirRocs, refEpochNumber, isTrain, labelTemplateRef, color, '--', 2, label_args = dict(sample = sample),
+                                                             bootstrapReplicas = bootstrapReplicas,
+                                                             xmax = xmax, decimationTolerance = decimationTolerance)
             updateHighestTPR(highestTPRs, fpr, tpr, xmax)
 
+            # compare both at the BDT working points for the test sample
+            if not isTrain and resultDirRocs.hasBDTroc(isTrain):
+                drawBenchmarkPoints(resultDirRocs, epochNumber, isTrain, color, benchmarkPoints = [ officialPhotonIdCut ],
+                                    refResultDirRocs = refResultDirRocs, refEpoch = refEpochNumber)
+
         else:
             # draw the ROC curve for the MVA id if available
             if resultDirRocs.hasBDTroc(isTrain):
-                fpr, tpr, dummy = drawSingleROCcurve(resultDirRocs, 'BDT', isTrain, labelTemplateRef, color, '--', 1, label_args = dict(sample = sample))
+                fpr, tpr, dummy = drawSingleROCcurve(resultDirRocs, 'BDT', isTrain, labelTemplateRef, color, '--', 1, label_args = dict(sample = sample),
+                                                     bootstrapReplicas = bootstrapReplicas,
+                                                     xmax = xmax, decimationTolerance = decimationTolerance)
                 updateHighestTPR(highestTPRs, fpr, tpr, xmax)            
 
                 # draw comparison benchmark points for test sample
-                # TODO: we should also support this for arbitrary references
                 if not isTrain:
                     drawBenchmarkPoints(resultDirRocs, epochNumber, isTrain, color, benchmarkPoints = [ officialPhotonIdCut ])
 
@@ -309,16 +359,12 @@ def drawLast(resultDirRocs, xmax = None, ignoreTrain = False,
         pylab.title(title)
 
     if savePlots:
-        for suffix in (".png", ".pdf", ".svg"):
-            outputFname = os.path.join(inputDir, "last-auc")
+        outputFname = os.path.join(inputDir, "last-auc")
 
-            if xmax != None:
-                outputFname += "-%.2f" % xmax
+        if xmax != None:
+            outputFname += "-%.2f" % xmax
 
-            outputFname += suffix
-
-            pylab.savefig(outputFname)
-            print "saved figure to",outputFname
+        saveFigure(outputFname, formats)
 
 #----------------------------------------------------------------------
 
@@ -327,14 +373,24 @@ def plotAucEvolution(resultDirData, resultDirRocs,
                      ignoreTrain = False,
                      legendLocation = None,
                      nodate = False,
-                     savePlots = False):
+                     savePlots = False,
+                     bootstrapReplicas = 0,
+                     formats = defaultFormats):
     # plots the evolution of the ROCs vs. epoch
     #
     # if refResultDirData and refResultDirRocs are not None,
     # plots these instead of the BDT/MVA as reference
+    #
+    # if bootstrapReplicas > 0, the statistical uncertainties
+    # of the AUCs are shown as error bars
 
     mvaROC, rocValues = resultDirRocs.getAllROCs()
 
+    if bootstrapReplicas > 0:
+        mvaStds, stdValues = resultDirRocs.getAllBootstrapAUCstds(bootstrapReplicas)
+    else:
+        stdValues = None
+
     pylab.figure(facecolor='white')
 
     hasRef = refResultDirData is not None
@@ -348,13 +404,18 @@ def plotAucEvolution(resultDirData, resultDirRocs,
             continue
 
         #----------
-        def plotEvolution(rocValues, style, label, inputDir):
+        def plotEvolution(rocValues, style, label, inputDir, stdValues = None):
 
             # sorted by ascending epoch
             epochs = sorted(rocValues[sample].keys())
             aucs = [ rocValues[sample][epoch] for epoch in epochs ]
 
-            pylab.plot(epochs, aucs, style, 
+            if stdValues is not None:
+                yerr = [ stdValues[sample].get(epoch, 0) for epoch in epochs ]
+            else:
+                yerr = None
+
+            pylab.errorbar(epochs, aucs, yerr = yerr, fmt = style, 
                        label = label.format(
                          auc = aucs[-1], 
                          maxEpoch = max(epochs),
@@ -366,12 +427,18 @@ def plotAucEvolution(resultDirData, resultDirRocs,
 
         if hasRef:
             # plot comparison
-            plotEvolution(rocValues, '-o', "{baseDir} " + sample + " (last auc={auc:.3f}, epochs={maxEpoch})", resultDirData.inputDir)
-            plotEvolution(refResultDirRocs.getAllROCs()[1], '--', "{baseDir} " + sample + " (last auc={auc:.3f}, epochs={maxEpoch})", refResultDirData.inputDir)
+            plotEvolution(rocValues, '-o', "{baseDir} " + sample + " (last auc={auc:.3f}, epochs={maxEpoch})", resultDirData.inputDir, stdValues)
+
+            if bootstrapReplicas > 0:
+                refStdValues = refResultDirRocs.getAllBootstrapAUCstds(bootstrapReplicas)[1]
+            else:
+                refStdValues = None
+
+            plotEvolution(refResultDirRocs.getAllROCs()[1], '--', "{baseDir} " + sample + " (last auc={auc:.3f}, epochs={maxEpoch})", refResultDirData.inputDir, refStdValues)
 
         else:
             # plot single training vs. MVA/BDT
-            epochs = plotEvolution(rocValues, '-o', "NN " + sample + " (last auc={auc:.3f})", resultDirData.inputDir)
+            epochs = plotEvolution(rocValues, '-o', "NN " + sample + " (last auc={auc:.3f})", resultDirData.inputDir, stdValues)
         
             # draw a line for the MVA id ROC if available
             auc = mvaROC[sample]
@@ -403,28 +470,260 @@ def plotAucEvolution(resultDirData, resultDirRocs,
     #----------
 
     if savePlots:
-        for suffix in (".png", ".pdf", ".svg"):
-            # for comparisons the plot will go to the 
-            # non-ref output directory
+        # for comparisons the plot will go to the 
+        # non-ref output directory
 
-            outputFname = "auc-evolution"
-            if hasRef:
-                outputFname += "-comparison"
-            
-            outputFname = os.path.join(inputDir, outputFname + suffix)
-            pylab.savefig(outputFname)
-            print "saved figure to",outputFname
+        outputFname = "auc-evolution"
+        if hasRef:
+            outputFname += "-comparison"
+
+        saveFigure(os.path.join(resultDirData.inputDir, outputFname), formats)
 
 
 #----------------------------------------------------------------------
-# main
+
+def getComparisonColors(numColors):
+    # @return a list of distinguishable colors for comparing
+    # the given number of directories
+    if numColors <= 10:
+        return [ pylab.cm.tab10(index) for index in range(numColors) ]
+    else:
+        return [ pylab.cm.nipy_spectral(index / float(numColors)) for index in range(numColors) ]
+
 #----------------------------------------------------------------------
-if __name__ == '__main__':
 
+def plotAucEvolutionMulti(resultDirRocsList, outputDir,
+                          ignoreTrain = False,
+                          legendLocation = None,
+                          savePlots = False,
+                          formats = defaultFormats):
+    # overlays the evolution of the AUC vs. epoch for several
+    # directories. The values for all directories are
+    # calculated on one common pool of workers.
+    #
+    # @param outputDir is the directory where the plots are saved
+
+    from ResultDirRocs import getAllMetricsMulti
+
+    allValues = getAllMetricsMulti(resultDirRocsList, 'auc')
+
+    pylab.figure(facecolor='white')
+
+    for resultDirRocs, (mvaROC, rocValues), color in zip(resultDirRocsList, allValues, getComparisonColors(len(resultDirRocsList))):
+
+        baseDir = os.path.basename(os.path.normpath(resultDirRocs.getInputDir()))
+
+        for sample, style in (
+            ('train', '--'),
+            ('test', '-o'),
+            ):
+
+            if ignoreTrain and sample == 'train':
+                continue
+
+            if not rocValues[sample]:
+                continue
+
+            epochs = sorted(rocValues[sample].keys())
+            aucs = [ rocValues[sample][epoch] for epoch in epochs ]
+
+            pylab.plot(epochs, aucs, style, color = color, linewidth = 2,
+                       label = "%s %s (last auc=%.3f, epochs=%d)" % (baseDir, sample, aucs[-1], max(epochs)))
+
+    pylab.grid()
+    pylab.xlabel('training epoch')
+    pylab.ylabel('AUC')
+
+    pylab.legend(loc = legendLocation, fontsize = 'small')
+
+    if savePlots:
+        saveFigure(os.path.join(outputDir, "auc-evolution-multi"), formats)
+
+#----------------------------------------------------------------------
+
+def drawLastMulti(resultDirRocsList, outputDir, xmax = None,
+                  ignoreTrain = False,
+                  savePlots = False,
+                  legendLocation = None,
+                  formats = defaultFormats,
+                  decimationTolerance = defaultDecimationTolerance):
+    # overlays the ROC curves of the last epoch of several directories
+    # (and the BDT of the first directory). The curves
+    # are calculated on one common pool of workers.
+
+    from ResultDirRocs import getFullROCcurvesMulti
+
+    samples = [ 'test' ]
+    if not ignoreTrain:
+        samples.insert(0, 'train')
+
+    # (resultDirRocs, epoch, isTrain, style, color)
+    curvesToDraw = []
+
+    for resultDirRocs, color in zip(resultDirRocsList, getComparisonColors(len(resultDirRocsList))):
+        epochNumber = resultDirRocs.findLastCompleteEpoch(ignoreTrain)
+        if epochNumber is None:
+            continue
+
+        for sample in samples:
+            curvesToDraw.append((resultDirRocs, epochNumber, sample == 'train', { 'train': '--', 'test': '-' }[sample], color))
+
+    for sample in samples:
+        if resultDirRocsList[0].hasBDTroc(sample == 'train'):
+            curvesToDraw.append((resultDirRocsList[0], 'BDT', sample == 'train', { 'train': ':', 'test': '-.' }[sample], 'black'))
+
+    curves = getFullROCcurvesMulti([ item[:3] for item in curvesToDraw ])
+
+    pylab.figure(facecolor='white')
+
+    highestTPRs = []
+
+    for (resultDirRocs, epoch, isTrain, style, color), (auc, numEvents, fpr, tpr, thresholds) in zip(curvesToDraw, curves):
+
+        if isTrain:
+            sample = 'train'
+        else:
+            sample = 'test'
+
+        if epoch == 'BDT':
+            label = "%s (%s auc %.3f)" % (officialPhotonIdLabel, sample, auc)
+        else:
+            label = "%s %s (auc %.3f, epoch %d)" % (os.path.basename(os.path.normpath(resultDirRocs.getInputDir())), sample, auc, epoch)
+
+        if xmax is None:
+            plotXmax = 1
+        else:
+            plotXmax = xmax
+
+        plotFpr, plotTpr = plotROCutils.decimateForPlot(fpr, tpr, 0, plotXmax, decimationTolerance)
+
+        pylab.plot(plotFpr, plotTpr, style, color = color, linewidth = 2, label = label)
+        updateHighestTPR(highestTPRs, fpr, tpr, xmax)
+
+    pylab.xlabel('fraction of false positives')
+    pylab.ylabel('fraction of true positives')
+
+    if xmax != None:
+        pylab.xlim(xmax = xmax)
+        # adjust y scale
+        pylab.ylim(ymax = 1.1 * max(highestTPRs))
+
+    pylab.grid()
+    pylab.legend(loc = legendLocation, fontsize = 'small')
+
+    if savePlots:
+        outputFname = os.path.join(outputDir, "last-auc-multi")
+
+        if xmax != None:
+            outputFname += "-%.2f" % xmax
+
+        saveFigure(outputFname, formats)
+
+#----------------------------------------------------------------------
+
+def plotWorkingPointEvolution(resultDirData, resultDirRocs,
+                              refResultDirData = None, refResultDirRocs = None,
+                              ignoreTrain = False,
+                              legendLocation = None,
+                              nodate = False,
+                              savePlots = False,
+                              cut = officialPhotonIdCut,
+                              formats = defaultFormats):
+    # plots the signal efficiency at the background efficiency
+    # of the official photon id working point vs. epoch
+    #
+    # @return True if something was plotted (i.e. the BDT
+    # output is available)
+
+    metric = "tprAtBdtCut:%g" % cut
+
+    if not metric in resultDirRocs.getBenchmarkMetricNames():
+        return False
+
+    mvaValues, values = resultDirRocs.getAllMetrics(metric)
+
+    hasRef = refResultDirRocs is not None and metric in refResultDirRocs.getBenchmarkMetricNames()
+
+    pylab.figure(facecolor='white')
+
+    for sample, color in (
+        ('train', 'blue'),
+        ('test', 'red'),
+        ):
+
+        if ignoreTrain and sample == 'train':
+            continue
+
+        isTrain = sample == 'train'
+
+        if not resultDirRocs.hasBDTroc(isTrain):
+            continue
+
+        #----------
+        def plotEvolution(values, style, label, inputDir):
+            # sorted by ascending epoch
+            epochs = sorted(values[sample].keys())
+            effs = [ values[sample][epoch] for epoch in epochs ]
+
+            pylab.plot(epochs, effs, style,
+                       label = label.format(
+                         eff = 100 * effs[-1],
+                         maxEpoch = max(epochs),
+                         baseDir = os.path.basename(os.path.normpath(inputDir)),
+                    ), color = color, linewidth = 2)
+        #----------
+
+        if hasRef:
+            plotEvolution(values, '-o', "{baseDir} " + sample + " (last sig. eff.={eff:.1f}%, epochs={maxEpoch})", resultDirData.inputDir)
+            plotEvolution(refResultDirRocs.getAllMetrics(metric)[1], '--', "{baseDir} " + sample + " (last sig. eff.={eff:.1f}%, epochs={maxEpoch})", refResultDirData.inputDir)
+        else:
+            plotEvolution(values, '-o', "NN " + sample + " (last sig. eff.={eff:.1f}%)", resultDirData.inputDir)
+
+            # the BDT's own working point
+            fpr, tpr = resultDirRocs.getBDTworkingPoint(cut, isTrain)
+            pylab.plot(pylab.gca().get_xlim(), [ tpr, tpr ], '--', color = color,
+                       label = "%s (%s sig. eff.=%.1f%% at bg. eff.=%.1f%%)" % (officialPhotonIdLabel, sample, 100 * tpr, 100 * fpr))
+
+    pylab.grid()
+    pylab.xlabel('training epoch')
+    pylab.ylabel('signal efficiency at official photon id bg. efficiency')
+
+    pylab.legend(loc = legendLocation)
+
+    if not hasRef:
+        if resultDirData.description != None:
+            pylab.title(resultDirData.description)
+
+        if not nodate:
+            plotROCutils.addTimestamp(resultDirData.inputDir)
+
+        addDirname(resultDirData.inputDir)
+
+    if savePlots:
+        outputFname = "wp-evolution"
+        if hasRef:
+            outputFname += "-comparison"
+
+        saveFigure(os.path.join(resultDirData.inputDir, outputFname), formats)
+
+    return True
+
+#----------------------------------------------------------------------
+
+def importPylab():
+    # pylab is only imported when plotting (e.g. after the
+    # caller has selected a non-interactive backend)
+    global pylab
+    import pylab
+
+#----------------------------------------------------------------------
+
+def makeOptionParser():
     from optparse import OptionParser
     parser = OptionParser("""
 
       usage: %prog [options] result-directory
+             %prog [options] --compare result-directory [ result-directory ... ]
 
     """
     )
@@ -501,115 +800,442 @@ if __name__ == '__main__':
                       help="reference directory to compare to (instead of BDT)",
                       )
 
-    (options, ARGV) = parser.parse_args()
+    parser.add_option("--persist-curves",
+                      dest = 'persistCurves',
+                      default = False,
+                      action = 'store_true',
+                      help="store calculated full ROC curves next to the output files for later invocations",
+                      )
 
-    assert len(ARGV) == 1, "usage: plotROCs.py result-directory"
+    parser.add_option("--executor",
+                      dest = 'executorBackend',
+                      default = 'process',
+                      choices = [ 'serial', 'thread', 'process' ],
+                      help="how to run the calculation of the AUC for the individual output files: serial, thread or process",
+                      )
 
-    inputDir = ARGV.pop(0)
+    parser.add_option("--bootstrap",
+                      dest = 'bootstrapReplicas',
+                      type = int,
+                      default = 0,
+                      help="number of bootstrap replicas for estimating the statistical uncertainties of the AUCs and ROC curves (0 to disable, results are cached)",
+                      )
+
+    parser.add_option("--formats",
+                      default = ",".join(defaultFormats),
+                      help="comma separated list of file formats for saved plots (default: %default)",
+                      )
+
+    parser.add_option("--render-workers",
+                      dest = 'renderWorkers',
+                      type = int,
+                      default = None,
+                      help="maximum number of processes for rendering and saving the plots (default: one per CPU, 1 to render in the main process)",
+                      )
+
+    parser.add_option("--decimation-tolerance",
+                      dest = 'decimationTolerance',
+                      type = float,
+                      default = defaultDecimationTolerance,
+                      help="maximum deviation (in pixels of the saved figures) of the drawn ROC curves and gradient magnitudes from the full ones when reducing the number of points drawn, 0 to draw all points (default: %default)",
+                      )
+
+    parser.add_option("--gradient-plot",
+                      dest = 'gradientPlot',
+                      default = 'detail',
+                      choices = [ 'detail', 'stat', 'quantiles' ],
+                      help="how to plot the gradient magnitudes: detail (all values), stat (mean and standard deviation per epoch) or quantiles (quantile bands per epoch, from cached per epoch summaries) (default: %default)",
+                      )
+
+    parser.add_option("--gradient-quantiles",
+                      dest = 'gradientQuantiles',
+                      default = "0.05,0.25,0.5,0.75,0.95",
+                      help="comma separated list of quantile levels for --gradient-plot quantiles (default: %default)",
+                      )
+
+    parser.add_option("--compare",
+                      default = False,
+                      action = 'store_true',
+                      help="compare the AUC evolution and the last epoch ROC curves of all given result directories (plots are saved in the first one)",
+                      )
+
+    return parser
+
+#----------------------------------------------------------------------
+
+def parseOptions(args = None):
+    # @param args is the list of command line arguments
+    # (sys.argv[1:] if None)
+    #
+    # @return options, ARGV
+
+    (options, ARGV) = makeOptionParser().parse_args(args)
 
     if options.excludedEpochs != None:
         options.excludedEpochs = [ int(x) for x in options.excludedEpochs.split(',') ]
 
-    #----------
+    options.formats = [ suffix.strip() for suffix in options.formats.split(',') if suffix.strip() ]
 
-    resultDirData = ResultDirData(inputDir, options.useWeightsAfterPtEtaReweighting)
+    options.gradientQuantiles = sorted(float(level) for level in options.gradientQuantiles.split(','))
 
-    import pylab
+    return options, ARGV
 
-    from ResultDirRocs import ResultDirRocs
-    resultDirRocs = ResultDirRocs(resultDirData,
-                                  minEpoch = options.minEpoch,
-                                  maxEpoch = options.maxEpoch,
-                                  excludedEpochs = options.excludedEpochs)
+#----------------------------------------------------------------------
 
-    #----------
-    # get information from reference directory
-    #----------
-    if options.refdir is not None:
-        refResultDirData = ResultDirData(options.refdir, options.useWeightsAfterPtEtaReweighting)
-        refResultDirRocs = ResultDirRocs(refResultDirData,
-                                         minEpoch = options.minEpoch,
-                                         maxEpoch = options.maxEpoch,
-                                         excludedEpochs = options.excludedEpochs)
+def makeResultDirRocs(inputDir, options, **kwargs):
+    # @return a ResultDirRocs object for the given directory
+    # with the settings from the command line options
+    #
+    # @param kwargs are passed to the ResultDirRocs constructor
+
+    # (objects still in memory from a previous invocation
+    # in the same process, e.g. in plotDaemon.py, are reused)
+
+    from ResultDirRocs import getResultDirRocs
+
+    return getResultDirRocs(getResultDirData(inputDir, options.useWeightsAfterPtEtaReweighting),
+                            minEpoch = options.minEpoch,
+                            maxEpoch = options.maxEpoch,
+                            excludedEpochs = options.excludedEpochs,
+                            persistCurves = options.persistCurves,
+                            executorBackend = options.executorBackend,
+                            benchmarkThresholds = [ officialPhotonIdCut ],
+                            **kwargs)
+
+#----------------------------------------------------------------------
+
+def _forEachDirectory(resultDirRocsList, errors, func):
+    # calls func for each directory which has not failed so far
+    # (see computePlotData)
+
+    for resultDirRocs in resultDirRocsList:
+        if errors is None:
+            func(resultDirRocs)
+            continue
+
+        if resultDirRocs.getInputDir() in errors:
+            continue
+
+        try:
+            func(resultDirRocs)
+        except Exception, ex:
+            errors[resultDirRocs.getInputDir()] = str(ex)
+
+#----------------------------------------------------------------------
+
+def computePlotData(resultDirRocsList, options, errors = None):
+    # calculates the values and curves needed by renderPlots(..)
+    # for all given directories on one common pool of workers
+    # (filling the caches of the ResultDirRocs objects) such that
+    # drawing the plots needs no further calculations
+    #
+    # @param errors if not None, a dict to which the directories for
+    #   which the calculations failed are added (with the error message)
+    #   instead of raising an exception. The remaining directories
+    #   are still calculated.
+
+    from ResultDirRocs import getAllMetricsMulti, getFullROCcurvesMulti
+
+    if not options.last or options.both:
+        # AUCs and working point metrics
+        getAllMetricsMulti(resultDirRocsList, errors = errors)
+
+        # values for the working point evolution
+        wpMetric = "tprAtBdtCut:%g" % officialPhotonIdCut
+        getAllMetricsMulti([ resultDirRocs for resultDirRocs in resultDirRocsList
+                             if (errors is None or not resultDirRocs.getInputDir() in errors) and
+                                wpMetric in resultDirRocs.getBenchmarkMetricNames() ],
+                           wpMetric, errors = errors)
+
+        if options.bootstrapReplicas > 0:
+            _forEachDirectory(resultDirRocsList, errors,
+                              lambda resultDirRocs: resultDirRocs.getAllBootstrapAUCstds(options.bootstrapReplicas))
+
+    if options.last or options.both:
+        # full ROC curves of the last epoch and the BDT
+        requests = []
+
+        def addRequests(resultDirRocs):
+            epochNumber = resultDirRocs.findLastCompleteEpoch(options.ignoreTrain)
+
+            for isTrain in (True, False):
+                if options.ignoreTrain and isTrain:
+                    continue
+
+                if epochNumber is not None:
+                    requests.append((resultDirRocs, epochNumber, isTrain))
+
+                if resultDirRocs.hasBDTroc(isTrain):
+                    requests.append((resultDirRocs, 'BDT', isTrain))
+
+        _forEachDirectory(resultDirRocsList, errors, addRequests)
+
+        getFullROCcurvesMulti(requests, errors = errors)
+
+        if options.bootstrapReplicas > 0:
+            for resultDirRocs, epoch, isTrain in requests:
+                _forEachDirectory([ resultDirRocs ], errors,
+                                  lambda resultDirRocs: resultDirRocs.getBootstrapBand(epoch, isTrain, options.bootstrapReplicas))
+
+    # same timestamp on all plots of a directory
+    _forEachDirectory(resultDirRocsList, errors,
+                      lambda resultDirRocs: plotROCutils.getTimestampText(resultDirRocs.getInputDir()))
+
+    if options.gradientPlot != 'detail' and (not options.last or options.both):
+        # reduce the gradient magnitudes of epochs not seen before
+        import gradientSummaries
+        _forEachDirectory(resultDirRocsList, errors,
+                          lambda resultDirRocs: gradientSummaries.getGradientSummaries(resultDirRocs.getInputDir(), options.gradientQuantiles,
+                                                                                       executorBackend = options.executorBackend))
+
+#----------------------------------------------------------------------
+
+def _drawAucCorrelation(resultDirRocs, options, savePlots = False, formats = defaultFormats):
+    # plot correlation of train and test AUC
+    import plotAUCcorr
+
+    plotAUCcorr.doPlot(resultDirRocs, addTimestamp = not options.nodate)
+
+    if savePlots:
+        saveFigure(os.path.join(resultDirRocs.getInputDir(), "auc-corr"), formats)
+
+#----------------------------------------------------------------------
+
+def _drawGradientMagnitudes(resultDirRocs, options, savePlots = False, formats = defaultFormats):
+    inputDir = resultDirRocs.getInputDir()
+
+    plotted = plotGradientMagnitudes(inputDir, mode = options.gradientPlot,
+                                     decimationTolerance = options.decimationTolerance,
+                                     quantileLevels = options.gradientQuantiles)
+
+    if plotted and savePlots:
+        saveFigure(os.path.join(inputDir, "gradient-magnitude"), formats)
+
+#----------------------------------------------------------------------
+
+def getViews(resultDirRocs, options, refResultDirRocs = None):
+    # @return the list of plots to make for one directory as functions
+    # which draw the plot on a new figure when called with
+    # the keyword arguments savePlots and formats
+
+    from functools import partial
+
+    resultDirData = resultDirRocs.resultDirData
+
+    if refResultDirRocs is not None:
+        refResultDirData = refResultDirRocs.resultDirData
     else:
         refResultDirData = None
-        refResultDirRocs = None
 
-    #----------
+    views = []
 
     if options.last or options.both:
 
-        drawLast(resultDirRocs, ignoreTrain = options.ignoreTrain,
-                 savePlots = options.savePlots,
-                 legendLocation = options.legendLocation,
-                 addTimestamp = not options.nodate,
-                 refResultDirRocs = refResultDirRocs)
-
-        # zoomed version
+        # the second one is a zoomed version:
         # autoscaling in y with x axis range manually
         # set seems not to work, so we implement
         # something ourselves..
-        drawLast(resultDirRocs, xmax = 0.05, ignoreTrain = options.ignoreTrain,
-                 savePlots = options.savePlots,
-                 legendLocation = options.legendLocation,
-                 addTimestamp = not options.nodate,
-                 refResultDirRocs = refResultDirRocs)
-
+        for xmax in (None, 0.05):
+            views.append(partial(drawLast, resultDirRocs,
+                                 xmax = xmax,
+                                 ignoreTrain = options.ignoreTrain,
+                                 legendLocation = options.legendLocation,
+                                 addTimestamp = not options.nodate,
+                                 refResultDirRocs = refResultDirRocs,
+                                 bootstrapReplicas = options.bootstrapReplicas,
+                                 decimationTolerance = options.decimationTolerance))
 
     if not options.last or options.both:
         #----------
-        # plot evolution of area under ROC curve vs. epoch
+        # evolution of area under ROC curve vs. epoch
         #----------
-        print "plotting AUC evolution"
+        views.append(partial(plotAucEvolution,
+                             resultDirData,
+                             resultDirRocs,
+                             ignoreTrain = options.ignoreTrain,
+                             legendLocation = options.legendLocation,
+                             nodate = options.nodate,
+                             bootstrapReplicas = options.bootstrapReplicas,
+                             refResultDirData = refResultDirData, 
+                             refResultDirRocs = refResultDirRocs))
 
-        plotAucEvolution(
-            resultDirData,
-            resultDirRocs,
-            ignoreTrain = options.ignoreTrain,
-            legendLocation = options.legendLocation,
-            nodate = options.nodate,
-            savePlots = options.savePlots,
+        #----------
+        # evolution of the signal efficiency at the
+        # official photon id working point
+        #----------
+        views.append(partial(plotWorkingPointEvolution,
+                             resultDirData,
+                             resultDirRocs,
+                             ignoreTrain = options.ignoreTrain,
+                             legendLocation = options.legendLocation,
+                             nodate = options.nodate,
+                             refResultDirData = refResultDirData, 
+                             refResultDirRocs = refResultDirRocs))
 
-            refResultDirData = refResultDirData, 
-            refResultDirRocs = refResultDirRocs,
-            )
+        views.append(partial(_drawAucCorrelation, resultDirRocs, options))
 
-    #----------
+        views.append(partial(_drawGradientMagnitudes, resultDirRocs, options))
 
-    if not options.last or options.both:
+    return views
 
-        #----------
-        # plot correlation of train and test AUC
-        #----------
+#----------------------------------------------------------------------
 
-        import plotAUCcorr
+# (view, formats) pairs to be rendered by the worker processes
+# (set before the workers are started such that they inherit them
+# including all calculated data)
+_renderTasks = None
 
-        plotAUCcorr.doPlot(resultDirRocs, addTimestamp = not options.nodate)
+def _renderTask(index):
+    # runs in a render worker: draws one view and saves it
+    # in all formats
+    #
+    # @return the messages printed while drawing (printed
+    # by the parent process in the order of the tasks)
 
-        if options.savePlots:
-            for suffix in (".png", ".pdf", ".svg"):
-                outputFname = os.path.join(inputDir, "auc-corr" + suffix)
-                pylab.savefig(outputFname)
-                print "saved figure to",outputFname
+    import cStringIO
 
+    view, formats = _renderTasks[index]
 
-        #----------
-        # plot gradient magnitudes
-        #----------
+    output = cStringIO.StringIO()
+    stdout = sys.stdout
+    sys.stdout = output
+
+    try:
+        importPylab()
+        view(savePlots = True, formats = formats)
+    finally:
+        sys.stdout = stdout
+        pylab.close('all')
 
-        plotted = plotGradientMagnitudes(inputDir, mode = 'detail')
+    return output.getvalue()
 
-        if plotted and options.savePlots:
-            for suffix in (".png", ".pdf", ".svg"):
-                outputFname = os.path.join(inputDir, "gradient-magnitude" + suffix)
-                pylab.savefig(outputFname)
-                print "saved figure to",outputFname
+#----------------------------------------------------------------------
+
+def renderViews(views, formats, numWorkers = None):
+    # draws the given views (see getViews(..)) and saves
+    # them in the given formats. Each view is drawn only once
+    # and saved in all formats from the same figure. With more than
+    # one worker, the views are distributed over worker processes
+    # (the current process must use a non-interactive backend).
+    #
+    # @param numWorkers is the maximum number of worker
+    #   processes (None for one per CPU)
+
+    global _renderTasks
+
+    import multiprocessing
+
+    tasks = [ (view, formats) for view in views ]
+
+    if numWorkers is None:
+        numWorkers = multiprocessing.cpu_count()
+
+    numWorkers = min(numWorkers, len(tasks))
+
+    if numWorkers <= 1:
+        for view in views:
+            view(savePlots = True, formats = formats)
+            pylab.close('all')
+        return
 
+    _renderTasks = tasks
+
+    # started only now such that the workers see the
+    # data calculated so far
+    pool = multiprocessing.Pool(processes = numWorkers)
+
+    try:
+        for output in pool.imap(_renderTask, range(len(tasks))):
+            sys.stdout.write(output)
+    finally:
+        pool.close()
+        pool.join()
+        _renderTasks = None
+
+#----------------------------------------------------------------------
+
+def renderPlots(resultDirRocs, options, refResultDirRocs = None):
+    # draws (and saves if requested) the plots for one directory
+
+    importPylab()
+
+    views = getViews(resultDirRocs, options, refResultDirRocs)
+
+    if options.savePlots:
+        renderViews(views, options.formats, options.renderWorkers)
+    else:
+        for view in views:
+            view(savePlots = False, formats = options.formats)
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    (options, ARGV) = parseOptions()
+
+    if options.savePlots and not 'pylab' in sys.modules:
+        # plots are only saved (also by the render workers),
+        # no display needed
+        import matplotlib
+        matplotlib.use('Agg')
+
+    if options.compare:
+        assert len(ARGV) >= 1, "usage: plotROCs.py --compare result-directory [ result-directory ... ]"
+
+        importPylab()
+
+        # weights and labels of directories with
+        # the same samples are loaded only once
+        resultDirRocsList = [ makeResultDirRocs(inputDir, options) for inputDir in ARGV ]
+
+        plotAucEvolutionMulti(resultDirRocsList, ARGV[0],
+                              ignoreTrain = options.ignoreTrain,
+                              legendLocation = options.legendLocation,
+                              savePlots = options.savePlots,
+                              formats = options.formats)
+
+        for xmax in (None, 0.05):
+            drawLastMulti(resultDirRocsList, ARGV[0], xmax = xmax,
+                          ignoreTrain = options.ignoreTrain,
+                          savePlots = options.savePlots,
+                          legendLocation = options.legendLocation,
+                          formats = options.formats,
+                          decimationTolerance = options.decimationTolerance)
+
+        if not options.savePlots:
+            pylab.show()
+
+        sys.exit(0)
+
+    assert len(ARGV) == 1, "usage: plotROCs.py result-directory"
+
+    inputDir = ARGV.pop(0)
+
+    #----------
+
+    resultDirRocs = makeResultDirRocs(inputDir, options)
+
+    importPylab()
+
+    #----------
+    # get information from reference directory
+    #----------
+    if options.refdir is not None:
+        refResultDirRocs = makeResultDirRocs(options.refdir, options)
+        resultDirRocsList = [ resultDirRocs, refResultDirRocs ]
+    else:
+        refResultDirRocs = None
+        resultDirRocsList = [ resultDirRocs ]
+
+    # calculate the missing values of all directories
+    # on one common pool of workers
+    computePlotData(resultDirRocsList, options)
+
+    renderPlots(resultDirRocs, options, refResultDirRocs)
 
     #----------
 
     if not options.savePlots:
         # show plots interactively
         pylab.show()
-
-
@@ -2,17 +2,23 @@
 
 #----------------------------------------------------------------------
 
-def addTimestamp(inputDir, x = 0.0, y = 1.07, ha = 'left', va = 'bottom'):
+def getTimestampText(inputDir):
+    # @return the timestamp text for plots of the given directory
+
+    import time, os
 
-    import pylab, time, os
+    # static variable (per directory, several directories
+    # may be plotted in the same process)
+    if not hasattr(getTimestampText, 'texts'):
+        getTimestampText.texts = {}
 
-    # static variable
-    if not hasattr(addTimestamp, 'text'):
+    if not inputDir in getTimestampText.texts:
         # make all timestamps the same during one invocation of this script
+        # (also for plots rendered by worker processes started afterwards)
 
         now = time.time()
 
-        addTimestamp.text = time.strftime("%a %d %b %Y %H:%M", time.localtime(now))
+        text = time.strftime("%a %d %b %Y %H:%M", time.localtime(now))
 
         # use the timestamp of the samples.txt file
         # as the starting point of the training
@@ -24,10 +30,19 @@ def addTimestamp(inputDir, x = 0.0, y = 1.07, ha = 'left', va = 'bottom'):
             startTime = os.path.getmtime(fname)
             deltaT = now - startTime
 
-            addTimestamp.text += " (%.1f days)" % (deltaT / 86400.)
+            text += " (%.1f days)" % (deltaT / 86400.)
+
+        getTimestampText.texts[inputDir] = text
+
+    return getTimestampText.texts[inputDir]
+
+#----------------------------------------------------------------------
+
+def addTimestamp(inputDir, x = 0.0, y = 1.07, ha = 'left', va = 'bottom'):
 
+    import pylab
 
-    pylab.gca().text(x, y, addTimestamp.text,
+    pylab.gca().text(x, y, getTimestampText(inputDir),
                      horizontalalignment = ha,
                      verticalalignment = va,
                      transform = pylab.gca().transAxes,
@@ -106,3 +121,106 @@ def readDescription(inputDir):
         return None
 
 #----------------------------------------------------------------------
+
+# default maximum deviation (in pixels of the saved figure)
+# of the decimated curves from the original ones
+defaultDecimationTolerance = 0.5
+
+#----------------------------------------------------------------------
+
+def decimationColumnWidth(xmin, xmax, tolerance, ax = None):
+    # @return the width in data units of tolerance pixels
+    # of the saved figure on the given axes (the current ones
+    # if None) when the x axis ranges from xmin to xmax
+
+    import pylab
+
+    if ax is None:
+        ax = pylab.gca()
+
+    fig = ax.get_figure()
+
+    dpi = pylab.rcParams['savefig.dpi']
+    if dpi == 'figure':
+        dpi = fig.dpi
+
+    # width of the axes in pixels
+    pixels = ax.get_position().width * fig.get_figwidth() * dpi
+
+    return (xmax - xmin) * tolerance / float(pixels)
+
+#----------------------------------------------------------------------
+
+def decimateMinMax(x, y, columnWidth):
+    # reduces a series with non-decreasing x values to the first,
+    # last, lowest and highest point (in the original order)
+    # in each column of the given width. The drawn line then
+    # deviates from the original by less than one column
+    # horizontally and covers the same range of y values
+    # in each column.
+    #
+    # @return x, y of the retained points
+
+    import numpy as np
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    if columnWidth <= 0 or len(x) <= 4:
+        return x, y
+
+    columns = np.floor((x - x[0]) / columnWidth).astype('int64')
+
+    # first and last point of each column
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    ends = np.r_[starts[1:], len(x)] - 1
+
+    if 4 * len(starts) >= len(x):
+        # nothing to gain
+        return x, y
+
+    # sorted by column, then by y: the first point of each
+    # column has the lowest y value, the last one the highest
+    order = np.lexsort((y, columns))
+
+    keep = np.unique(np.concatenate([ starts, ends, order[starts], order[ends] ]))
+
+    return x[keep], y[keep]
+
+#----------------------------------------------------------------------
+
+def decimateForPlot(x, y, xmin, xmax, tolerance = defaultDecimationTolerance, ax = None):
+    # reduces the number of points of a series with non-decreasing
+    # x values to what is visible in the saved figure of the given axes
+    # (the current ones if None) with the x axis ranging from xmin to xmax.
+    #
+    # Beyond xmax, only the first point and the points with the
+    # highest x and the lowest and highest y value are kept
+    # (the latter such that automatic axis limits do not change).
+    #
+    # @param tolerance in pixels, 0 or None to keep all points
+    #
+    # @return x, y of the retained points
+
+    import numpy as np
+
+    if not tolerance:
+        return x, y
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    numPoints = np.searchsorted(x, xmax, side = 'right') + 1
+
+    visibleX, visibleY = decimateMinMax(x[:numPoints], y[:numPoints],
+                                        decimationColumnWidth(xmin, xmax, tolerance, ax))
+
+    if numPoints >= len(x):
+        return visibleX, visibleY
+
+    extremes = np.unique([ np.argmin(y), np.argmax(y), len(x) - 1 ])
+    extremes = extremes[extremes >= numPoints]
+
+    return np.r_[visibleX, x[extremes]], np.r_[visibleY, y[extremes]]
+
+#----------------------------------------------------------------------
@@ -0,0 +1,554 @@
+#!/usr/bin/env python
+
+# numpy based calculation of (weighted) ROC curve quantities
+# without going through sklearn's roc_curve / auc and of
+# (weighted) per event metrics such as the RMSE
+
+import numpy as np
+
+#----------------------------------------------------------------------
+
+def sortedCumulativeSums(labels, outputs, weights):
+    # sorts the events by decreasing output value and returns
+    # the cumulative sum of the signal and background weights
+    # at each distinct threshold (i.e. at the last event
+    # of each group of tied output values)
+    #
+    # @return tps, fps, thresholds (all in decreasing threshold order)
+
+    if weights is None:
+        weights = np.ones(len(outputs))
+
+    # one single sort. The order within groups of tied
+    # output values does not matter as only the cumulative
+    # sums at the end of each group are used
+    order = np.argsort(outputs)[::-1]
+
+    sortedOutputs = outputs[order]
+    sortedWeights = weights[order]
+    isSignal      = labels[order] == 1
+
+    # indices of the last event of each group of equal
+    # output values
+    thresholdIndices = np.flatnonzero(sortedOutputs[1:] != sortedOutputs[:-1])
+    thresholdIndices = np.r_[thresholdIndices, len(sortedOutputs) - 1]
+
+    # accumulate in double precision, the weights are often float32
+    tps = np.cumsum(np.where(isSignal, sortedWeights, 0), dtype = 'float64')[thresholdIndices]
+    fps = np.cumsum(np.where(isSignal, 0, sortedWeights), dtype = 'float64')[thresholdIndices]
+
+    return tps, fps, sortedOutputs[thresholdIndices]
+
+#----------------------------------------------------------------------
+
+def aucFromCumulativeSums(tps, fps):
+    # trapezoidal integration of the (unnormalized) ROC curve
+    # starting at the origin. Tied output values give
+    # a single diagonal segment.
+    #
+    # works along the last axis, i.e. also for 2D arrays
+    # with one curve per row
+
+    totalSig = tps[..., -1]
+    totalBkg = fps[..., -1]
+
+    deltaFps = np.empty_like(fps)
+    deltaFps[..., 0] = fps[..., 0]
+    deltaFps[..., 1:] = fps[..., 1:] - fps[..., :-1]
+
+    # sum of the true positives at both ends of each segment
+    tpsSum = tps.copy()
+    tpsSum[..., 1:] += tps[..., :-1]
+
+    return 0.5 * (deltaFps * tpsSum).sum(axis = -1) / (totalSig * totalBkg)
+
+#----------------------------------------------------------------------
+
+def weightedAUC(labels, outputs, weights = None):
+    # calculates the area under the (weighted) ROC curve.
+    # Gives the same result as
+    #
+    #   fpr, tpr, thresholds = sklearn.metrics.roc_curve(labels, outputs, sample_weight = weights)
+    #   sklearn.metrics.auc(fpr, tpr)
+    #
+    # but with a single sort and without building the curve arrays
+
+    tps, fps, thresholds = sortedCumulativeSums(labels, outputs, weights)
+
+    return aucFromCumulativeSums(tps, fps)
+
+#----------------------------------------------------------------------
+
+def parseMetricName(metricName):
+    # splits names like 'tprAtFpr:0.01' into the type of
+    # metric and the false positive rate parameter
+    #
+    # supported metrics are
+    #
+    #   auc           area under the ROC curve
+    #   tprAtFpr:<x>  true positive rate at false positive rate x
+    #                 (linearly interpolated between the points of the curve)
+    #   pAUC:<x>      area under the ROC curve between false
+    #                 positive rates 0 and x (not normalized)
+    #
+    # and the per event metrics (see pointwiseMetricTypes)
+    # comparing the outputs to the targets
+    #
+    #   mse           mean squared error
+    #   rmse          square root of the mean squared error
+    #   mae           mean absolute error
+    #   logLoss       binary cross entropy (outputs are
+    #                 probabilities, targets 0 or 1)
+    #
+    # @return metric type, false positive rate (None for 'auc'
+    #   and the per event metrics)
+
+    if metricName == 'auc' or metricName in pointwiseMetricTypes:
+        return metricName, None
+
+    parts = metricName.split(':')
+
+    if len(parts) != 2 or not parts[0] in ('tprAtFpr', 'pAUC'):
+        raise Exception("unsupported metric '%s'" % metricName)
+
+    return parts[0], float(parts[1])
+
+#----------------------------------------------------------------------
+
+# metrics which do not need sorting (see parseMetricName)
+pointwiseMetricTypes = ('mse', 'rmse', 'mae', 'logLoss')
+
+# outputs are clipped to [logLossEpsilon, 1 - logLossEpsilon]
+# for the log loss
+logLossEpsilon = 1e-7
+
+def isPointwiseMetric(metricName):
+    return metricName in pointwiseMetricTypes
+
+#----------------------------------------------------------------------
+
+def pointwiseMetrics(targets, outputs, weights, metricNames):
+    # calculates the given per event metrics (see pointwiseMetricTypes)
+    # as weighted averages over the events
+    #
+    # @param outputs is either a 1D array with one value per event
+    #   or a 2D array with one row per set of outputs (e.g. different
+    #   epochs) for the same events
+    #
+    # @return a dict mapping from metric name to value
+    #   (or an array with the value for each row of outputs)
+
+    # accumulate in double precision
+    outputs = np.asarray(outputs, dtype = 'float64')
+    targets = np.asarray(targets, dtype = 'float64')
+
+    if weights is None:
+        weights = np.ones(outputs.shape[-1])
+
+    weights = np.asarray(weights, dtype = 'float64')
+    sumWeights = weights.sum()
+
+    def average(values):
+        # weighted mean along the event axis
+        return values.dot(weights) / sumWeights
+
+    retval = {}
+
+    if 'mse' in metricNames or 'rmse' in metricNames:
+        mse = average((outputs - targets) ** 2)
+
+        if 'mse' in metricNames:
+            retval['mse'] = mse
+        if 'rmse' in metricNames:
+            retval['rmse'] = np.sqrt(mse)
+
+    if 'mae' in metricNames:
+        retval['mae'] = average(np.abs(outputs - targets))
+
+    if 'logLoss' in metricNames:
+        probs = np.clip(outputs, logLossEpsilon, 1 - logLossEpsilon)
+        retval['logLoss'] = -average(targets * np.log(probs) + (1 - targets) * np.log(1 - probs))
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def metricsFromCumulativeSums(tps, fps, metricNames):
+    # calculates the given metrics (see parseMetricName)
+    # from the cumulative sums at the group ends of a single curve
+    # (see sortedCumulativeSums)
+    #
+    # @return a dict mapping from metric name to value
+
+    retval = {}
+
+    # normalized curve starting at the origin
+    tpr = np.r_[0, tps / tps[-1]]
+    fpr = np.r_[0, fps / fps[-1]]
+
+    # areas of the trapezoids up to each point
+    cumulativeAreas = None
+
+    for metricName in metricNames:
+        metricType, fprValue = parseMetricName(metricName)
+
+        if metricType == 'auc':
+            retval[metricName] = aucFromCumulativeSums(tps, fps)
+            continue
+
+        # fpr is non-decreasing: last point at or below the given fpr
+        # (i.e. the one with the highest tpr in case of vertical segments)
+        # and the following point
+        low = np.searchsorted(fpr, fprValue, side = 'right') - 1
+        high = min(low + 1, len(fpr) - 1)
+
+        if fpr[high] > fpr[low]:
+            tprValue = tpr[low] + (fprValue - fpr[low]) * (tpr[high] - tpr[low]) / (fpr[high] - fpr[low])
+        else:
+            tprValue = tpr[low]
+
+        if metricType == 'tprAtFpr':
+            retval[metricName] = tprValue
+
+        elif metricType == 'pAUC':
+            if cumulativeAreas is None:
+                cumulativeAreas = np.r_[0, np.cumsum(0.5 * (fpr[1:] - fpr[:-1]) * (tpr[1:] + tpr[:-1]))]
+
+            # full trapezoids up to the low point plus the part
+            # of the next one up to the given fpr
+            retval[metricName] = cumulativeAreas[low] + 0.5 * (fprValue - fpr[low]) * (tpr[low] + tprValue)
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def weightedMetrics(labels, outputs, weights, metricNames, targets = None):
+    # calculates several metrics (see parseMetricName) with
+    # a single sort (no sort if only per event metrics are requested)
+    #
+    # @param targets are compared to the outputs for the per event
+    #   metrics (the labels if None)
+    #
+    # @return a dict mapping from metric name to value
+
+    pointwiseNames = [ metricName for metricName in metricNames if isPointwiseMetric(metricName) ]
+    rankingNames   = [ metricName for metricName in metricNames if not metricName in pointwiseNames ]
+
+    retval = {}
+
+    if rankingNames:
+        tps, fps, thresholds = sortedCumulativeSums(labels, outputs, weights)
+
+        retval.update(metricsFromCumulativeSums(tps, fps, rankingNames))
+
+    if pointwiseNames:
+        if targets is None:
+            targets = labels
+
+        retval.update(pointwiseMetrics(targets, outputs, weights, pointwiseNames))
+
+    return retval
+
+#----------------------------------------------------------------------
+
+# approximate number of bytes of temporary arrays per event and row
+# needed by batchedAUCs(..)
+batchedAUCbytesPerEvent = 48
+
+def batchedAUCs(labels, outputs, weights = None):
+    # calculates the areas under the (weighted) ROC curves for several
+    # sets of outputs (e.g. different epochs) for the same events
+    # (i.e. labels and weights) in one vectorized pass
+    #
+    # @param outputs is a 2D array with one row per set of outputs
+    #   and one column per event
+    #
+    # @return an array with the AUC for each row
+
+    return batchedMetrics(labels, outputs, weights, [ 'auc' ])['auc']
+
+#----------------------------------------------------------------------
+
+def batchedMetrics(labels, outputs, weights, metricNames, targets = None):
+    # like batchedAUCs(..) but for several metrics (see parseMetricName)
+    #
+    # @param targets are compared to the outputs for the per event
+    #   metrics (the labels if None)
+    #
+    # @return a dict mapping from metric name to an array
+    #   with the value for each row
+
+    outputs = np.asarray(outputs)
+    numRows, numEvents = outputs.shape
+
+    if weights is None:
+        weights = np.ones(numEvents)
+
+    pointwiseNames = [ metricName for metricName in metricNames if isPointwiseMetric(metricName) ]
+
+    retval = {}
+
+    if pointwiseNames:
+        if targets is None:
+            targets = labels
+
+        retval.update(pointwiseMetrics(targets, outputs, weights, pointwiseNames))
+
+        metricNames = [ metricName for metricName in metricNames if not metricName in pointwiseNames ]
+
+        if not metricNames:
+            # no sorting needed
+            return retval
+
+    isSignal = labels == 1
+    sigWeights = np.where(isSignal, weights, 0).astype('float64')
+    bkgWeights = np.where(isSignal, 0, weights).astype('float64')
+
+    # one sort along the event axis for all rows,
+    # decreasing output values
+    order = np.argsort(outputs, axis = 1)[:, ::-1]
+
+    rowIndices = np.arange(numRows)[:, np.newaxis]
+    sortedOutputs = outputs[rowIndices, order]
+
+    tps = np.cumsum(sigWeights[order], axis = 1)
+    fps = np.cumsum(bkgWeights[order], axis = 1)
+
+    del order
+
+    # flag the last event of each group of tied outputs
+    isEnd = np.ones((numRows, numEvents), dtype = bool)
+    isEnd[:, :-1] = sortedOutputs[:, 1:] != sortedOutputs[:, :-1]
+
+    del sortedOutputs
+
+    # cumulative sums at the group ends of all rows, one row after the other
+    flatEnds = np.flatnonzero(isEnd)
+    del isEnd
+
+    endTps = tps.ravel()[flatEnds]
+    endFps = fps.ravel()[flatEnds]
+    endRows = flatEnds // numEvents
+
+    totalSig = tps[:, -1]
+    totalBkg = fps[:, -1]
+    del tps, fps, flatEnds
+
+    # values at the previous group end of the same row (zero
+    # for the first group of each row)
+    isFirst = np.ones(len(endRows), dtype = bool)
+    isFirst[1:] = endRows[1:] != endRows[:-1]
+
+    prevTps = np.where(isFirst, 0, np.roll(endTps, 1))
+    prevFps = np.where(isFirst, 0, np.roll(endFps, 1))
+
+    if 'auc' in metricNames:
+        # trapezoidal integration, summed per row
+        areas = np.bincount(endRows, weights = (endFps - prevFps) * (endTps + prevTps), minlength = numRows)
+
+        retval['auc'] = 0.5 * areas / (totalSig * totalBkg)
+
+    otherMetrics = [ metricName for metricName in metricNames if metricName != 'auc' ]
+
+    if otherMetrics:
+        # only the searches for the working points are done row by row
+        rowStarts = np.flatnonzero(isFirst)
+        rowEnds = np.r_[rowStarts[1:], len(endRows)]
+
+        for metricName in otherMetrics:
+            retval[metricName] = np.empty(numRows)
+
+        for row, (start, end) in enumerate(zip(rowStarts, rowEnds)):
+            rowValues = metricsFromCumulativeSums(endTps[start:end], endFps[start:end], otherMetrics)
+
+            for metricName in otherMetrics:
+                retval[metricName][row] = rowValues[metricName]
+
+    return retval
+
+#----------------------------------------------------------------------
+
+def outputHistograms(labels, outputs, weights, numBins, outputRange):
+    # (weighted) histograms of the outputs for signal (label 1)
+    # and background with equal width bins in the given range,
+    # filled with a single bincount. Outputs outside the range
+    # are counted in the first and last bin.
+    #
+    # @return sigCounts, bkgCounts
+
+    low, high = outputRange
+
+    # in double precision such that the bin boundaries agree
+    # with np.linspace(low, high, numBins + 1)
+    binIndices = np.floor((np.asarray(outputs, dtype = 'float64') - low) * (numBins / float(high - low)))
+    np.clip(binIndices, 0, numBins - 1, out = binIndices)
+
+    # signal in the upper half of the combined histogram
+    binIndices = binIndices.astype('int64') + numBins * (labels == 1)
+
+    counts = np.bincount(binIndices, weights = weights, minlength = 2 * numBins)
+
+    return counts[numBins:], counts[:numBins]
+
+#----------------------------------------------------------------------
+
+def compactROCcurve(fpr, tpr, thresholds, keepThresholds = None,
+                    minLogFpr = -6, numLogPoints = 500,
+                    numLinearPoints = 500,
+                    lowFprMax = 0.05, numLowFprPoints = 2000):
+    # reduces a full ROC curve (as returned by sklearn's roc_curve)
+    # to a subset of its points:
+    #
+    #  - points on a log-spaced grid of false positive rates
+    #    (from 10^minLogFpr to 1)
+    #  - points on a linear grid from 0 to 1
+    #  - points on a finer linear grid for the low false positive
+    #    rate region (up to lowFprMax), e.g. for zoomed plots
+    #
+    # only original points of the curve are kept (including their
+    # thresholds), so interpolating between them is the same as
+    # on the full curve as long as no point is dropped in between.
+    #
+    # @param keepThresholds is a list of cut values for which
+    #   the points on both sides of the cut are kept so that
+    #   working points can be determined exactly
+    #
+    # @return fpr, tpr, thresholds of the retained points
+
+    gridPoints = np.concatenate([
+            np.logspace(minLogFpr, 0, numLogPoints),
+            np.linspace(0, 1, numLinearPoints),
+            np.linspace(0, lowFprMax, numLowFprPoints),
+            ])
+
+    # fpr is non-decreasing. Take the first and last point
+    # with the given fpr to keep vertical segments
+    indices = [ np.searchsorted(fpr, gridPoints, side = 'left'),
+                np.searchsorted(fpr, gridPoints, side = 'right') - 1,
+                [ 0, len(fpr) - 1 ],
+                ]
+
+    if keepThresholds is not None:
+        # thresholds are in decreasing order
+        numPoints = len(thresholds)
+        for side in ('left', 'right'):
+            pos = numPoints - 1 - np.searchsorted(thresholds[::-1], keepThresholds, side = side)
+            indices += [ pos, pos + 1 ]
+
+    indices = np.unique(np.clip(np.concatenate(indices), 0, len(fpr) - 1))
+
+    return fpr[indices], tpr[indices], thresholds[indices]
+
+#----------------------------------------------------------------------
+
+def benchmarkEfficiencies(refFpr, refTpr, refThresholds, cuts, curves):
+    # determines the working points of the reference curve for the
+    # given cuts on its output value and the true positive rates
+    # of other curves at the same false positive rates
+    #
+    # @param refFpr, refTpr, refThresholds is the reference curve
+    #   (as returned by sklearn's roc_curve, i.e. thresholds
+    #   in decreasing order)
+    # @param cuts is a list of cut values on the reference output
+    # @param curves is a list of (fpr, tpr) of the curves to compare
+    #
+    # @return refFprs, refTprs, tprs where refFprs and refTprs
+    #   are arrays with the reference working point for each cut
+    #   and tprs is a list (one entry per curve) of arrays with
+    #   the true positive rates at refFprs
+
+    cuts = np.asarray(cuts, dtype = 'float64')
+
+    # increasing order for searchsorted
+    thresholdsUp = refThresholds[::-1]
+    fprUp = refFpr[::-1]
+    tprUp = refTpr[::-1]
+
+    # points on both sides of each cut, averaged
+    # in case the cut falls between two points
+    lastIndex = len(thresholdsUp) - 1
+    indexLeft  = np.minimum(np.searchsorted(thresholdsUp, cuts, side = 'left'), lastIndex)
+    indexRight = np.minimum(np.searchsorted(thresholdsUp, cuts, side = 'right'), lastIndex)
+
+    refFprs = 0.5 * (fprUp[indexLeft] + fprUp[indexRight])
+    refTprs = 0.5 * (tprUp[indexLeft] + tprUp[indexRight])
+
+    # fpr is non-decreasing along each curve
+    tprs = [ np.interp(refFprs, fpr, tpr) for fpr, tpr in curves ]
+
+    return refFprs, refTprs, tprs
+
+#----------------------------------------------------------------------
+
+def bootstrapROC(labels, outputs, weights = None, numReplicas = 200, seed = 1,
+                 fprGrid = None, maxBytes = 256 * 1024 * 1024):
+    # estimates the statistical uncertainty of the ROC curve by
+    # bootstrapping: each replica multiplies the event weights
+    # by Poisson(1) distributed random numbers.
+    #
+    # The events are sorted only once, the weighted cumulative sums
+    # for a block of replicas are calculated as one matrix
+    # (replicas x events) using the same sort order.
+    #
+    # @param fprGrid if not None, the true positive rates are also
+    #   calculated for these false positive rates for each replica
+    # @param maxBytes approximate maximum size of the temporary arrays
+    #
+    # @return aucs, tprs where aucs is the array of AUCs of the replicas
+    #   and tprs is a (replicas x len(fprGrid)) matrix (or None if
+    #   fprGrid is None)
+
+    numEvents = len(outputs)
+
+    if weights is None:
+        weights = np.ones(numEvents)
+
+    # shared sort order and group ends for all replicas
+    order = np.argsort(outputs)[::-1]
+
+    sortedOutputs = outputs[order]
+    thresholdIndices = np.flatnonzero(sortedOutputs[1:] != sortedOutputs[:-1])
+    thresholdIndices = np.r_[thresholdIndices, numEvents - 1]
+    del sortedOutputs
+
+    sortedWeights = weights[order].astype('float64')
+    isSignal      = labels[order] == 1
+    del order
+
+    randomState = np.random.RandomState(seed)
+
+    # the weights and both cumulative sums
+    blockSize = max(1, maxBytes // (3 * 8 * numEvents))
+
+    aucs = []
+
+    if fprGrid is not None:
+        tprs = []
+    else:
+        tprs = None
+
+    for start in range(0, numReplicas, blockSize):
+        thisBlockSize = min(blockSize, numReplicas - start)
+
+        replicaWeights = randomState.poisson(1., size = (thisBlockSize, numEvents)) * sortedWeights
+
+        tps = np.cumsum(np.where(isSignal, replicaWeights, 0), axis = 1)[:, thresholdIndices]
+        fps = np.cumsum(np.where(isSignal, 0, replicaWeights), axis = 1)[:, thresholdIndices]
+        del replicaWeights
+
+        aucs.append(aucFromCumulativeSums(tps, fps))
+
+        if fprGrid is not None:
+            for row in range(thisBlockSize):
+                tprs.append(np.interp(fprGrid,
+                                      np.r_[0, fps[row] / fps[row, -1]],
+                                      np.r_[0, tps[row] / tps[row, -1]]))
+
+    aucs = np.concatenate(aucs)
+
+    if tprs is not None:
+        tprs = np.array(tprs)
+
+    return aucs, tprs
+
+#----------------------------------------------------------------------
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# prints the latest train and test AUC, the epoch with the best
+# test AUC and the BDT AUC for one or more result directories
+# as JSON or tab separated values (e.g. for monitoring).
+#
+# Values are taken from the metrics cache where possible, only
+# missing values are calculated (and cached). Does not import
+# matplotlib, scipy or sklearn.
+
+import sys
+
+from ResultDirData import getResultDirData
+from ResultDirRocs import ResultDirRocs
+
+#----------------------------------------------------------------------
+
+# names of the quantities in the order of the TSV columns
+summaryFields = ('directory', 'description',
+                 'lastTrainEpoch', 'lastTrainAUC',
+                 'lastTestEpoch', 'lastTestAUC',
+                 'bestTestEpoch', 'bestTestAUC',
+                 'bdtTrainAUC', 'bdtTestAUC')
+
+#----------------------------------------------------------------------
+
+def summarizeDirectory(inputDir, options):
+    # @return a dict with the quantities listed in summaryFields
+    # (None where not available)
+
+    resultDirRocs = ResultDirRocs(getResultDirData(inputDir, options.useWeightsAfterPtEtaReweighting),
+                                  executorBackend = options.executorBackend)
+
+    mvaROC, rocValues = resultDirRocs.getAllROCs()
+
+    result = dict((field, None) for field in summaryFields)
+    result['directory'] = inputDir
+    result['description'] = resultDirRocs.getInputDirDescription()
+
+    for sample in ('train', 'test'):
+        prefix = sample[0].upper() + sample[1:]
+
+        result['bdt' + prefix + 'AUC'] = mvaROC[sample]
+
+        if rocValues[sample]:
+            lastEpoch = max(rocValues[sample].keys())
+            result['last' + prefix + 'Epoch'] = lastEpoch
+            result['last' + prefix + 'AUC'] = rocValues[sample][lastEpoch]
+
+    if rocValues['test']:
+        # earliest epoch in case of ties
+        bestEpoch = max(sorted(rocValues['test'].keys()), key = lambda epoch: rocValues['test'][epoch])
+        result['bestTestEpoch'] = bestEpoch
+        result['bestTestAUC'] = rocValues['test'][bestEpoch]
+
+    return result
+
+#----------------------------------------------------------------------
+
+def formatTSV(summaries, fout):
+    print >> fout, "\t".join(summaryFields)
+
+    for summary in summaries:
+        values = []
+
+        for field in summaryFields:
+            value = summary[field]
+
+            if value is None:
+                value = ""
+            elif isinstance(value, float):
+                value = "%.6f" % value
+            else:
+                value = str(value).replace("\t", " ")
+
+            values.append(value)
+
+        print >> fout, "\t".join(values)
+
+#----------------------------------------------------------------------
+# main
+#----------------------------------------------------------------------
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser("""
+
+      usage: %prog [options] result-directory [ result-directory ... ]
+
+      prints a summary of the AUC values of the given result directories
+
+    """
+    )
+
+    parser.add_option("--format",
+                      default = "json",
+                      choices = [ "json", "tsv" ],
+                      help="output format: json or tsv (tab separated values with a header line)",
+                      )
+
+    parser.add_option("--weights-after-pt-eta-reweighting",
+                      dest = 'useWeightsAfterPtEtaReweighting',
+                      default = False,
+                      action = "store_true",
+                      help="use weights (for training) after pt/eta reweighting",
+                      )
+
+    parser.add_option("--executor",
+                      dest = 'executorBackend',
+                      default = 'process',
+                      choices = [ 'serial', 'thread', 'process' ],
+                      help="how to run the calculation of missing AUC values: serial, thread or process",
+                      )
+
+    (options, ARGV) = parser.parse_args()
+
+    if not ARGV:
+        print >> sys.stderr,"must specify at least one result directory"
+        sys.exit(1)
+
+    # keep messages about files being read
+    # out of the summary
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    summaries = []
+    exitCode = 0
+
+    for inputDir in ARGV:
+        # problems with one directory do not stop
+        # the summary of the others
+        try:
+            summaries.append(summarizeDirectory(inputDir, options))
+        except SystemExit:
+            # the reason was printed already
+            print >> sys.stderr,"WARNING: skipping",inputDir
+            exitCode = 1
+        except Exception, ex:
+            print >> sys.stderr,"WARNING: could not summarize %s: %s" % (inputDir, str(ex))
+            exitCode = 1
+
+    sys.stdout = stdout
+
+    if options.format == 'json':
+        import json
+        json.dump(summaries, sys.stdout, indent = 2, sort_keys = True)
+        print
+    else:
+        formatTSV(summaries, sys.stdout)
+
+    sys.exit(exitCode)
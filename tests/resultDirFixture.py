@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+# creates small synthetic result directories for the tests
+
+import os, sys, shutil, tempfile
+
+import numpy as np
+
+# make the modules of the parent directory importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+#----------------------------------------------------------------------
+
+def makeResultDir(numEvents = 2000, numEpochs = 4, seed = 1):
+    # @return the name of a new temporary directory with weights, labels,
+    # BDT and network outputs for the train and test sample
+
+    outputDir = tempfile.mkdtemp(prefix = "resultdir-")
+
+    rs = np.random.RandomState(seed)
+
+    for sample in ('train', 'test'):
+        labels = (rs.rand(numEvents) < 0.4).astype('float32')
+        weights = rs.rand(numEvents).astype('float32') + 0.5
+
+        if sample == 'train':
+            np.savez(os.path.join(outputDir, "weights-labels-train.npz"),
+                     origTrainWeights = weights, trainWeight = weights, label = labels)
+        else:
+            np.savez(os.path.join(outputDir, "weights-labels-test.npz"),
+                     weight = weights, label = labels)
+
+        bdt = np.round(labels * 0.5 + rs.randn(numEvents) * 0.4, 2)
+        np.savez(os.path.join(outputDir, "roc-data-%s-mva.npz" % sample),
+                 output = bdt, weight = weights, label = labels)
+
+        for epoch in range(1, numEpochs + 1):
+            output = np.round(labels * (0.3 + 0.05 * epoch) + rs.randn(numEvents) * 0.5, 3).astype('float32')
+            np.savez(os.path.join(outputDir, "roc-data-%s-%04d.npz" % (sample, epoch)), output = output)
+
+    fout = open(os.path.join(outputDir, "samples.txt"), "w")
+    fout.write("a/GJet_rechits-train.t7\n")
+    fout.close()
+
+    return outputDir
+
+#----------------------------------------------------------------------
+
+def removeResultDir(outputDir):
+    shutil.rmtree(outputDir, ignore_errors = True)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import glob, os, subprocess, sys, unittest
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+from ResultDirData import ResultDirData
+from ResultDirRocs import ResultDirRocs
+
+scriptFname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "cleanResults.py")
+
+#----------------------------------------------------------------------
+
+class CleanResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDir = makeResultDir()
+
+    def tearDown(self):
+        removeResultDir(self.inputDir)
+
+    def runCleanResults(self, *args, **kwargs):
+        subprocess.check_call([ sys.executable, scriptFname, "--min-age", "0", "--codec", "none" ] +
+                              list(args) + kwargs.get('inputDirs', [ self.inputDir ]),
+                              stdout = open(os.devnull, "w"), stderr = subprocess.STDOUT)
+
+    def getOutputFiles(self, inputDir = None):
+        if inputDir is None:
+            inputDir = self.inputDir
+
+        return sorted(os.path.basename(fname) for fname in
+                      glob.glob(os.path.join(inputDir, "roc-data-*-0*.npz")))
+
+    #----------------------------------------
+
+    def testDeletesCachedOutputs(self):
+        ResultDirRocs(ResultDirData(self.inputDir, False), executorBackend = 'serial').getAllROCs()
+
+        self.runCleanResults()
+
+        self.assertEqual([ "roc-data-test-0004.npz", "roc-data-train-0004.npz" ], self.getOutputFiles())
+
+    #----------------------------------------
+
+    def testKeepsOutputsCachedForOtherWeights(self):
+        ResultDirRocs(ResultDirData(self.inputDir, False), executorBackend = 'serial').getAllROCs()
+
+        # the values cached so far are for other weights
+        fname = os.path.join(self.inputDir, "weights-labels-test.npz")
+        mtime = os.path.getmtime(fname)
+        os.utime(fname, (mtime + 100, mtime + 100))
+
+        outputFiles = self.getOutputFiles()
+
+        self.runCleanResults()
+
+        self.assertEqual([ fname for fname in outputFiles if fname.startswith("roc-data-test-") ],
+                         [ fname for fname in self.getOutputFiles() if fname.startswith("roc-data-test-") ])
+
+    #----------------------------------------
+
+    def testSkipsDirectoriesWithFailedCalculation(self):
+        # without output files, the missing values can not be calculated
+        for fname in glob.glob(os.path.join(self.inputDir, "roc-data-*.npz")):
+            os.unlink(fname)
+
+        for epoch in range(1, 4):
+            open(os.path.join(self.inputDir, "model-%04d.npz" % epoch), "w").close()
+
+        self.runCleanResults("--compute-missing")
+
+        self.assertEqual(3, len(glob.glob(os.path.join(self.inputDir, "model-*.npz"))))
+
+    #----------------------------------------
+
+    def testFailingDirectoryDoesNotStopOthers(self):
+        badDir = makeResultDir(seed = 2)
+
+        try:
+            # an output file which can't be read
+            fout = open(os.path.join(badDir, "roc-data-test-0002.npz"), "w")
+            fout.write("not a npz file")
+            fout.close()
+
+            badOutputFiles = self.getOutputFiles(badDir)
+
+            self.runCleanResults("--compute-missing", inputDirs = [ badDir, self.inputDir ])
+
+            # the values of the other directory are still calculated
+            self.assertEqual([ "roc-data-test-0004.npz", "roc-data-train-0004.npz" ], self.getOutputFiles())
+
+            self.assertEqual(badOutputFiles, self.getOutputFiles(badDir))
+        finally:
+            removeResultDir(badDir)
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import unittest
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+import EpochStore
+from MetricsCache import MetricsCache
+from ResultDirData import ResultDirData
+from ResultDirRocs import ResultDirRocs
+from convertToEpochStore import convertDirectory
+
+#----------------------------------------------------------------------
+
+class EpochStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        # two directories with the same contents
+        self.fileDir = makeResultDir(numEpochs = 5)
+        self.storeDir = makeResultDir(numEpochs = 5)
+
+        for sample in ('train', 'test'):
+            convertDirectory(self.storeDir, sample, 'float32', deleteOriginals = True)
+
+    def tearDown(self):
+        removeResultDir(self.fileDir)
+        removeResultDir(self.storeDir)
+
+    def getAllROCs(self, inputDir, **kwargs):
+        return ResultDirRocs(ResultDirData(inputDir, False), executorBackend = 'serial',
+                             **kwargs).getAllROCs()
+
+    #----------------------------------------
+
+    def testBatchedMatchesSingleFiles(self):
+        # the epochs of the store are read in blocks
+        mvaROC, rocValues = self.getAllROCs(self.storeDir)
+
+        expectedMvaROC, expectedRocValues = self.getAllROCs(self.fileDir, batchMemoryBudget = None)
+
+        self.assertEqual(expectedMvaROC, mvaROC)
+
+        for sample in ('train', 'test'):
+            self.assertEqual(sorted(expectedRocValues[sample].keys()), sorted(rocValues[sample].keys()))
+
+            for epoch, value in expectedRocValues[sample].items():
+                self.assertAlmostEqual(value, rocValues[sample][epoch], places = 6)
+
+    #----------------------------------------
+
+    def testIterBlocks(self):
+        store = EpochStore.EpochStore(self.storeDir, 'test')
+
+        blocks = list(store.iterBlocks([ 4, 1, 2 ], maxBytes = 2 * store.numEvents * store.dtype.itemsize))
+
+        self.assertEqual([ [ 1, 2 ], [ 4 ] ], [ blockEpochs for blockEpochs, block in blocks ])
+
+        for blockEpochs, block in blocks:
+            for epoch, row in zip(blockEpochs, block):
+                self.assertTrue((row == store.getOutputs(epoch)).all())
+
+    #----------------------------------------
+
+    def testCachedValuesOfReappendedEpochsAreStale(self):
+        store = EpochStore.EpochStore(self.storeDir, 'test')
+        cache = MetricsCache(self.storeDir, 'test-cache.sqlite')
+
+        cache.putMany([ (store.entryName(epoch), 'test', 'w', 'auc', 0.5) for epoch in (1, 2) ])
+
+        # appending another epoch keeps the cached values
+        store.append(6, store.getOutputs(1))
+        self.assertEqual(0.5, cache.get(store.entryName(1), 'test', 'w', 'auc'))
+        self.assertEqual(0.5, cache.get(store.entryName(2), 'test', 'w', 'auc'))
+
+        # appending an epoch again invalidates its value
+        store.append(1, store.getOutputs(2))
+        self.assertEqual(None, cache.get(store.entryName(1), 'test', 'w', 'auc'))
+        self.assertEqual(0.5, cache.get(store.entryName(2), 'test', 'w', 'auc'))
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import unittest
+
+# (makes the modules of the parent directory importable)
+import resultDirFixture
+
+import executors
+
+#----------------------------------------------------------------------
+
+class ExecutorsTest(unittest.TestCase):
+
+    def testOnePoolPerBackend(self):
+        executor = executors.getExecutor('thread', 2)
+
+        self.assertTrue(executor is executors.getExecutor('thread', 2))
+
+        # replaced (and the old one closed) for a different size
+        other = executors.getExecutor('thread', 3)
+
+        self.assertFalse(other is executor)
+        self.assertEqual(3, other.numWorkers)
+        self.assertEqual(1, len([ item for item in executors._executors.values()
+                                  if isinstance(item, executors.ThreadExecutor) ]))
+
+        self.assertEqual([ (0, 4) ], list(other.imapUnordered(lambda x: x * x, [ (2,) ])))
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import glob, os, subprocess, sys, unittest
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+scriptFname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "makePlots.py")
+
+#----------------------------------------------------------------------
+
+class MakePlotsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDirs = [ makeResultDir(numEvents = 800, numEpochs = 3, seed = seed) for seed in (1, 2) ]
+
+    def tearDown(self):
+        for inputDir in self.inputDirs:
+            removeResultDir(inputDir)
+
+    #----------------------------------------
+
+    def testFailingDirectoryIsSkipped(self):
+        goodDir, badDir = self.inputDirs
+
+        # an output file which can't be read
+        fout = open(os.path.join(badDir, "roc-data-test-0002.npz"), "w")
+        fout.write("not a npz file")
+        fout.close()
+
+        env = dict(os.environ)
+        env['MPLBACKEND'] = 'Agg'
+
+        proc = subprocess.Popen([ sys.executable, scriptFname, "--no-mail", "--max-workers", "2", badDir, goodDir ],
+                                stdout = open(os.devnull, "w"), stderr = subprocess.PIPE,
+                                env = env)
+        stderr = proc.communicate()[1]
+
+        self.assertEqual(0, proc.returncode, stderr)
+
+        # the failing directory is reported
+        self.assertTrue("failed to make plots for " + badDir in stderr, stderr)
+
+        # the other directory is still plotted
+        self.assertTrue(glob.glob(os.path.join(goodDir, "*.pdf")))
+        self.assertFalse(glob.glob(os.path.join(badDir, "*.pdf")))
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import glob, os, shutil, tempfile, threading, unittest
+
+import numpy as np
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+import npzIO
+from executors import getExecutor
+from ResultDirData import ResultDirData
+from ResultDirRocs import ResultDirRocs
+
+#----------------------------------------------------------------------
+
+def _readDecompressed(fname):
+    return npzIO._readDecompressed(fname, maxNumThreads = 4)
+
+#----------------------------------------------------------------------
+
+class Bz2Test(unittest.TestCase):
+
+    def setUp(self):
+        self.outputDir = tempfile.mkdtemp(prefix = "npzio-")
+
+    def tearDown(self):
+        shutil.rmtree(self.outputDir, ignore_errors = True)
+
+    def writeFile(self, data):
+        fname = os.path.join(self.outputDir, "data.npz")
+        fout = open(fname, "wb")
+        fout.write(data)
+        fout.close()
+        return fname
+
+    #----------------------------------------
+
+    def testMultiStreamRoundTrip(self):
+        data = np.random.RandomState(1).randint(0, 16, 100000).astype('uint8').tobytes()
+
+        # several streams with a shorter last one
+        fname = npzIO.compressFile(self.writeFile(data), blockSize = 30000, maxNumThreads = 4)
+
+        buf = npzIO._readDecompressed(fname, maxNumThreads = 4)
+
+        self.assertEqual(data, bytes(buf))
+
+    #----------------------------------------
+
+    def testFromThreadExecutor(self):
+        # decompressing from a task on the shared thread pool
+        # must not wait for the pool itself
+        data = np.random.RandomState(2).randint(0, 16, 100000).astype('uint8').tobytes()
+        fname = npzIO.compressFile(self.writeFile(data), blockSize = 10000, maxNumThreads = 4)
+
+        executor = getExecutor('thread', 4)
+
+        results = []
+        thread = threading.Thread(target = lambda: results.extend(
+                executor.imapUnordered(_readDecompressed, [ (fname,) ] * 8)))
+        thread.daemon = True
+        thread.start()
+        thread.join(60)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(8, len(results))
+
+        for index, buf in results:
+            self.assertEqual(data, bytes(buf))
+
+#----------------------------------------------------------------------
+
+class CompressedOutputsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDir = makeResultDir()
+
+    def tearDown(self):
+        removeResultDir(self.inputDir)
+
+    def getAllROCs(self, executorBackend):
+        return ResultDirRocs(ResultDirData(self.inputDir, False), executorBackend = executorBackend,
+                             maxNumThreads = 2).getAllROCs()
+
+    #----------------------------------------
+
+    def testThreadBackend(self):
+        expected = self.getAllROCs('serial')
+
+        os.unlink(os.path.join(self.inputDir, "metrics-cache.sqlite"))
+
+        # several bzip2 streams per file
+        for fname in glob.glob(os.path.join(self.inputDir, "roc-data-*.npz")):
+            npzIO.compressFile(fname, blockSize = 1000)
+
+        results = []
+        thread = threading.Thread(target = lambda: results.append(self.getAllROCs('thread')))
+        thread.daemon = True
+        thread.start()
+        thread.join(120)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(expected, results[0])
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
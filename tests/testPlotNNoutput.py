@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import os, unittest
+
+import numpy as np
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+from ResultDirData import ResultDirData
+from plotNNoutput import readWeightsLabels
+
+#----------------------------------------------------------------------
+
+class PlotNNoutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDir = makeResultDir()
+
+    def tearDown(self):
+        removeResultDir(self.inputDir)
+
+    #----------------------------------------
+
+    def testSameWeightsAsEvolution(self):
+        # weights after reweighting which differ from the original ones
+        fname = os.path.join(self.inputDir, "weights-labels-train.npz")
+        data = dict(np.load(fname))
+        data['trainWeight'] = data['trainWeight'] * 2
+        np.savez(fname, **data)
+
+        resultDirData = ResultDirData(self.inputDir, False)
+
+        for sample in ('train', 'test'):
+            isTrain = sample == 'train'
+            weights, labels = readWeightsLabels(self.inputDir, sample)
+
+            self.assertTrue((resultDirData.getWeights(isTrain) == weights).all())
+            self.assertTrue((resultDirData.getLabels(isTrain) == labels).all())
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
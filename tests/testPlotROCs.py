@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import os, subprocess, sys, unittest
+from functools import partial
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+import plotROCs
+
+scriptFname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "plotROCs.py")
+
+#----------------------------------------------------------------------
+
+class PlotROCsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDirs = [ makeResultDir(numEvents = 800, numEpochs = 3, seed = seed) for seed in (1, 2) ]
+
+    def tearDown(self):
+        for inputDir in self.inputDirs:
+            removeResultDir(inputDir)
+
+    def runPlotROCs(self, *args):
+        env = dict(os.environ)
+        env['MPLBACKEND'] = 'Agg'
+
+        subprocess.check_call([ sys.executable, scriptFname ] + list(args),
+                              stdout = open(os.devnull, "w"), stderr = subprocess.STDOUT,
+                              env = env)
+
+    #----------------------------------------
+
+    def testBothWithThreads(self):
+        # the full ROC curves are calculated on threads
+        self.runPlotROCs("--both", "--save-plots", "--executor", "thread", self.inputDirs[0])
+
+        self.assertTrue(os.path.exists(os.path.join(self.inputDirs[0], "last-auc.png")))
+
+    #----------------------------------------
+
+    def testCompareWithThreads(self):
+        self.runPlotROCs("--save-plots", "--executor", "thread", "--compare", *self.inputDirs)
+
+        self.assertTrue(os.path.exists(os.path.join(self.inputDirs[0], "last-auc-multi.png")))
+
+    #----------------------------------------
+
+    def testRenderViewsDrawsEachViewOnce(self):
+        outputDir = self.inputDirs[0]
+
+        plotROCs.importPylab()
+
+        views = [ partial(_countingView, outputDir, "view%d" % index) for index in range(3) ]
+
+        plotROCs.renderViews(views, [ 'png', 'svg' ], numWorkers = 2)
+
+        self.assertEqual([ "view0\n", "view1\n", "view2\n" ],
+                         sorted(open(os.path.join(outputDir, "calls.txt")).readlines()))
+
+        for index in range(3):
+            for suffix in ('png', 'svg'):
+                self.assertTrue(os.path.exists(os.path.join(outputDir, "view%d.%s" % (index, suffix))))
+
+#----------------------------------------------------------------------
+
+def _countingView(outputDir, name, savePlots, formats):
+    # view for renderViews(..) which records each time it is drawn
+    fout = open(os.path.join(outputDir, "calls.txt"), "a")
+    fout.write(name + "\n")
+    fout.close()
+
+    plotROCs.pylab.figure()
+    plotROCs.pylab.plot([ 0, 1 ], [ 0, 1 ])
+
+    if savePlots:
+        plotROCs.saveFigure(os.path.join(outputDir, name), formats)
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import os, shutil, unittest
+
+import numpy as np
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+import ResultDirData
+import npzIO
+
+#----------------------------------------------------------------------
+
+class LoadArraysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDirs = [ makeResultDir(seed = seed) for seed in (1, 2, 1) ]
+
+        # same weights and labels as in the first directory
+        # (but a different modification time)
+        for sample in ('train', 'test'):
+            fname = "weights-labels-%s.npz" % sample
+            shutil.copy(os.path.join(self.inputDirs[0], fname), os.path.join(self.inputDirs[2], fname))
+
+        # forget the files read by other tests
+        ResultDirData._loadedFiles.clear()
+        ResultDirData._loadedArrays.clear()
+
+        # count the files which are hashed
+        self.hashedFiles = []
+        self.origFileDigest = ResultDirData._fileDigest
+
+        def fileDigest(fname):
+            self.hashedFiles.append(fname)
+            return self.origFileDigest(fname)
+
+        ResultDirData._fileDigest = fileDigest
+
+    def tearDown(self):
+        ResultDirData._fileDigest = self.origFileDigest
+
+        for inputDir in self.inputDirs:
+            removeResultDir(inputDir)
+
+    #----------------------------------------
+
+    def testIdenticalFilesAreSharedDifferentOnesNotHashed(self):
+        data = [ ResultDirData.ResultDirData(inputDir, False) for inputDir in self.inputDirs ]
+
+        labels = [ item.getLabels(False) for item in data ]
+
+        # the second directory has the same file sizes as
+        # the first one but different contents
+        self.assertFalse(labels[0] is labels[1])
+        self.assertTrue(labels[0] is labels[2])
+
+        # reading the same files again does not hash them
+        numHashed = len(self.hashedFiles)
+        ResultDirData.ResultDirData(self.inputDirs[0], False).getLabels(False)
+        self.assertEqual(numHashed, len(self.hashedFiles))
+
+    #----------------------------------------
+
+    def testDifferentSizesAreNotHashed(self):
+        removeResultDir(self.inputDirs[1])
+        self.inputDirs[1] = makeResultDir(numEvents = 1000)
+
+        for inputDir in self.inputDirs[:2]:
+            ResultDirData.ResultDirData(inputDir, False).getLabels(False)
+
+        self.assertEqual([], self.hashedFiles)
+
+#----------------------------------------------------------------------
+
+class EvictionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDirs = [ makeResultDir(seed = seed) for seed in (1, 2, 1) ]
+
+        # same weights and labels in the first and last directory
+        for sample in ('train', 'test'):
+            fname = "weights-labels-%s.npz" % sample
+            shutil.copy(os.path.join(self.inputDirs[0], fname), os.path.join(self.inputDirs[2], fname))
+
+        ResultDirData._instances.clear()
+        ResultDirData._loadedFiles.clear()
+        ResultDirData._loadedArrays.clear()
+
+        self.origMaxInstances = ResultDirData.maxInstances
+        ResultDirData.maxInstances = 2
+
+    def tearDown(self):
+        ResultDirData.maxInstances = self.origMaxInstances
+        ResultDirData._instances.clear()
+
+        for inputDir in self.inputDirs:
+            removeResultDir(inputDir)
+
+    def load(self, inputDir):
+        resultDirData = ResultDirData.getResultDirData(inputDir, False)
+        resultDirData.getLabels(False)
+        return resultDirData
+
+    def getLoadedFileKeys(self):
+        return set(key[0] for key in ResultDirData._loadedArrays.keys())
+
+    #----------------------------------------
+
+    def testArraysOfEvictedDirectoriesAreReleased(self):
+        first, third = self.load(self.inputDirs[0]), self.load(self.inputDirs[2])
+
+        # same contents
+        self.assertEqual(first.fileKeys, third.fileKeys)
+        self.assertEqual(first.fileKeys, self.getLoadedFileKeys())
+
+        # evicts the first directory but its arrays are
+        # still used by the third one
+        second = self.load(self.inputDirs[1])
+        self.assertEqual(second.fileKeys | third.fileKeys, self.getLoadedFileKeys())
+
+        # evicts the third directory
+        self.load(self.inputDirs[1])
+        first = self.load(self.inputDirs[0])
+        self.assertEqual(second.fileKeys | first.fileKeys, self.getLoadedFileKeys())
+        self.assertEqual(4, len(self.getLoadedFileKeys()))
+
+#----------------------------------------------------------------------
+
+class TargetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDir = makeResultDir()
+
+        ResultDirData._loadedFiles.clear()
+        ResultDirData._loadedArrays.clear()
+
+        # count the decompressed files
+        self.decompressedFiles = []
+        self.origReadDecompressed = npzIO._readDecompressed
+
+        def readDecompressed(fname, *args, **kwargs):
+            self.decompressedFiles.append(fname)
+            return self.origReadDecompressed(fname, *args, **kwargs)
+
+        npzIO._readDecompressed = readDecompressed
+
+    def tearDown(self):
+        npzIO._readDecompressed = self.origReadDecompressed
+
+        removeResultDir(self.inputDir)
+
+    #----------------------------------------
+
+    def testTargetsAreReadWithTheLabels(self):
+        # regression training
+        fname = os.path.join(self.inputDir, "weights-labels-test.npz")
+        data = dict(np.load(fname).items())
+        data['target'] = np.arange(len(data['label']), dtype = 'float32')
+        np.savez(fname, **data)
+
+        npzIO.compressFile(fname)
+
+        resultDirData = ResultDirData.ResultDirData(self.inputDir, False)
+
+        self.assertTrue((data['target'] == resultDirData.getTargets(False)).all())
+        self.assertTrue((data['label'] == resultDirData.getLabels(False)).all())
+
+        # classification training
+        self.assertTrue(resultDirData.getTargets(True) is resultDirData.getLabels(True))
+
+        self.assertEqual([ fname + ".bz2" ], self.decompressedFiles)
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import glob, os, unittest
+
+from resultDirFixture import makeResultDir, removeResultDir
+
+from ResultDirData import ResultDirData
+from ResultDirRocs import ResultDirRocs
+from npzIO import compressFile
+
+#----------------------------------------------------------------------
+
+class WeightsVariantTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inputDir = makeResultDir()
+
+    def tearDown(self):
+        removeResultDir(self.inputDir)
+
+    def makeResultDirRocs(self):
+        return ResultDirRocs(ResultDirData(self.inputDir, False), executorBackend = 'serial')
+
+    def removeOutputs(self):
+        # removes the network outputs (but not the BDT outputs)
+        for fname in glob.glob(os.path.join(self.inputDir, "roc-data-*-0*.npz")):
+            os.unlink(fname)
+
+    #----------------------------------------
+
+    def testCachedValuesSurviveCompression(self):
+        mvaROC, rocValues = self.makeResultDirRocs().getAllROCs()
+
+        for sample in ('train', 'test'):
+            compressFile(os.path.join(self.inputDir, "weights-labels-%s.npz" % sample))
+
+        self.removeOutputs()
+
+        resultDirData = ResultDirData(self.inputDir, False)
+        self.assertTrue(resultDirData.testWeightsFname.endswith(".npz.bz2"))
+
+        newMvaROC, newRocValues = ResultDirRocs(resultDirData, executorBackend = 'serial').getAllROCs()
+
+        self.assertEqual(rocValues, newRocValues)
+        self.assertEqual(mvaROC, newMvaROC)
+
+#----------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()